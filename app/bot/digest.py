@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import select, and_, or_
+
+from app.core.models.user import User
+from app.core.models.task import Task, TaskStatus, not_in_deleted_project
+from app.core.models.note import Note
+from app.core.models.project import Project
+
+
+# ====== Лёгкие строки для рендера дайджеста ======
+@dataclass(frozen=True)
+class DigestTask:
+    title: str
+    due_at: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class DigestNote:
+    title: str
+    content: str
+
+
+@dataclass
+class DigestData:
+    tasks: list[DigestTask] = field(default_factory=list)
+    notes: list[DigestNote] = field(default_factory=list)
+    projects: list[str] = field(default_factory=list)
+
+
+# ====== Запросы ======
+def _slot_condition(now: datetime, since: Optional[datetime]):
+    """
+    Условие на (reminder_hour, reminder_minute) для минут из (since, now].
+
+    Догоняются все пропущенные минуты текущих суток, как бы долго ни шёл
+    прошлый тик: вчерашние слоты уже не наступят сегодня. Минуты группируются
+    в диапазоны внутри часа, чтобы каждый диапазон оставался range-сканом
+    по индексу слота.
+    """
+    now = now.replace(second=0, microsecond=0)
+    start = now
+    if since is not None:
+        since = since.replace(second=0, microsecond=0)
+        midnight = now.replace(hour=0, minute=0)
+        start = min(max(since + timedelta(minutes=1), midnight), now)
+
+    ranges: dict[int, list[int]] = {}
+    moment = start
+    while moment <= now:
+        ranges.setdefault(moment.hour, []).append(moment.minute)
+        moment += timedelta(minutes=1)
+
+    return or_(
+        *(
+            and_(
+                User.reminder_hour == hour,
+                User.reminder_minute.between(min(minutes), max(minutes)),
+            )
+            for hour, minutes in ranges.items()
+        )
+    )
+
+
+async def select_due_digest_users(
+    session,
+    now: datetime,
+    since: Optional[datetime] = None,
+    after_id: int = 0,
+    limit: Optional[int] = None,
+) -> list[tuple[int, int]]:
+    """
+    Пользователи (id, telegram_id), которым дайджест положен в эту минуту.
+
+    Если передан since (время прошлого успешного тика), догоняются
+    и пропущенные с тех пор минуты. Выборка идёт по индексу
+    (reminder_hour, reminder_minute, reminders_enabled), поэтому её стоимость
+    зависит от числа пользователей в слоте, а не от размера таблицы users.
+
+    after_id/limit — keyset-пагинация по users.id для обработки чанками.
+    """
+    today = now.date()
+    stmt = (
+        select(User.id, User.telegram_id)
+        .where(_slot_condition(now, since))
+        .where(User.reminders_enabled.is_(True))
+        .where(
+            or_(
+                User.last_digest_date.is_(None),
+                User.last_digest_date != today,
+            )
+        )
+        .where(User.id > after_id)
+        .order_by(User.id)
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    result = await session.execute(stmt)
+    return [(row.id, row.telegram_id) for row in result]
+
+
+async def load_digest_data(
+    session,
+    user_ids: Iterable[int],
+    today: date,
+) -> dict[int, DigestData]:
+    """
+    Данные дайджеста сразу для пачки пользователей: три запроса
+    с user_id IN (...) вместо трёх запросов на каждого пользователя.
+    Загружаются только нужные для текста колонки, без ORM-объектов.
+    """
+    user_ids = list(user_ids)
+    data: dict[int, DigestData] = {user_id: DigestData() for user_id in user_ids}
+    if not user_ids:
+        return data
+
+    yesterday = today - timedelta(days=1)
+    since = datetime(yesterday.year, yesterday.month, yesterday.day)
+
+    # Только открытые живые задачи: закрытые, архивные и из удалённых проектов не нужны
+    tasks_result = await session.execute(
+        select(Task.user_id, Task.title, Task.due_at)
+        .where(Task.user_id.in_(user_ids))
+        .where(Task.archived_at.is_(None))
+        .where(not_in_deleted_project())
+        .where(Task.status != TaskStatus.DONE)
+        .order_by(Task.user_id, Task.id)
+    )
+    for row in tasks_result:
+        data[row.user_id].tasks.append(DigestTask(row.title, row.due_at))
+
+    notes_result = await session.execute(
+        select(Note.user_id, Note.title, Note.content)
+        .where(Note.user_id.in_(user_ids))
+        .where(Note.created_at >= since)
+        .order_by(Note.user_id, Note.id)
+    )
+    for row in notes_result:
+        data[row.user_id].notes.append(DigestNote(row.title, row.content))
+
+    projects_result = await session.execute(
+        select(Project.user_id, Project.name)
+        .where(Project.user_id.in_(user_ids))
+        .where(Project.deleted_at.is_(None))
+        .order_by(Project.user_id, Project.id)
+    )
+    for row in projects_result:
+        data[row.user_id].projects.append(row.name)
+
+    return data
+
+
+# ====== Рендер ======
+def render_digest(data: DigestData, today: date) -> Optional[str]:
+    """Текст дайджеста или None, если рассказывать нечего."""
+    tasks_today = []
+    tasks_overdue = []
+    tasks_no_deadline = []
+
+    for task in data.tasks:
+        if task.due_at is None:
+            tasks_no_deadline.append(task)
+        else:
+            d = task.due_at.date()
+            if d < today:
+                tasks_overdue.append(task)
+            elif d == today:
+                tasks_today.append(task)
+
+    if not (
+        tasks_today
+        or tasks_overdue
+        or tasks_no_deadline
+        or data.notes
+        or data.projects
+    ):
+        return None
+
+    text_lines = []
+    text_lines.append("👋 <b>Доброе утро!</b>\n")
+
+    if tasks_today:
+        text_lines.append("🟠 <b>Задачи на сегодня:</b>")
+        for t in tasks_today:
+            text_lines.append(f"• {t.title}")
+        text_lines.append("")
+
+    if tasks_overdue:
+        text_lines.append("🔥 <b>Просроченные задачи:</b>")
+        for t in tasks_overdue:
+            text_lines.append(
+                f"• {t.title} — было до {t.due_at.strftime('%d.%m.%Y')}"
+            )
+        text_lines.append("")
+
+    if tasks_no_deadline:
+        text_lines.append("📝 <b>Задачи без дедлайна:</b>")
+        for t in tasks_no_deadline:
+            text_lines.append(f"• {t.title}")
+        text_lines.append("")
+
+    if data.notes:
+        text_lines.append("🧠 <b>Новые заметки со вчера:</b>")
+        for n in data.notes:
+            base = (n.content or "").strip()
+            if not base:
+                base = (n.title or "").strip()
+            if not base:
+                base = "(пустая заметка)"
+            short = base
+            if len(short) > 50:
+                short = short[:47] + "..."
+            text_lines.append(f"• {short}")
+        text_lines.append("")
+
+    if data.projects:
+        text_lines.append("📁 <b>Твои проекты:</b>")
+        for name in data.projects:
+            text_lines.append(f"• {name}")
+        text_lines.append("")
+
+    return "\n".join(text_lines).strip()
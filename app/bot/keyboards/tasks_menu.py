@@ -1,6 +1,8 @@
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import InlineKeyboardMarkup
 
+from app.bot.pagination import ListPageCb
+
 
 def tasks_menu_kb() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
@@ -10,7 +12,30 @@ def tasks_menu_kb() -> InlineKeyboardMarkup:
         callback_data="tasks:add",
     )
 
-    # нужно будет добавить ещё кнопок позже (фильтры, статусы и т.д.)
-
     builder.adjust(1)
     return builder.as_markup()
+
+
+def task_filters_kb() -> InlineKeyboardMarkup:
+    """Выбор фильтра списка задач (значения flt разбирает resolve_task_filter в routers/tasks.py)."""
+    builder = InlineKeyboardBuilder()
+
+    for text, flt in (
+        ("🟡 ToDo", "todo"),
+        ("🟠 В работе", "prog"),
+        ("🟢 Готово", "done"),
+        ("🔥 Просроченные", "overdue"),
+        ("📅 Сегодня", "today"),
+        ("🗓 Неделя", "week"),
+    ):
+        builder.button(
+            text=text,
+            callback_data=ListPageCb(section="tasks", flt=flt).pack(),
+        )
+
+    builder.button(text="📁 По проекту", callback_data="tasks:filter_projects")
+    builder.button(text="🗄 Архив", callback_data=ListPageCb(section="tasks", flt="arch").pack())
+    builder.button(text="📋 Все задачи", callback_data=ListPageCb(section="tasks").pack())
+
+    builder.adjust(3, 3, 2, 1)
+    return builder.as_markup()
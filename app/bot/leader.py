@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import update, or_
+
+from app.core.db import async_session_maker, dialect_insert
+from app.core.models.scheduler_lease import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """
+    Лидерство через строку в БД с истекающей арендой.
+
+    Лидер продлевает аренду на каждом тике; если он умер,
+    другая реплика заберёт её, как только истечёт ttl.
+    """
+
+    def __init__(self, name: str = "scheduler", ttl: timedelta = timedelta(seconds=90)) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._held_until: Optional[datetime] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._held_until is not None and datetime.utcnow() < self._held_until
+
+    async def try_acquire(self) -> bool:
+        """Захватить или продлить аренду; True, если мы лидер."""
+        now = datetime.utcnow()
+        expires_at = now + self.ttl
+
+        async with async_session_maker() as session:
+            result = await session.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name)
+                .where(
+                    or_(
+                        SchedulerLease.holder == self.holder,
+                        SchedulerLease.expires_at < now,
+                    )
+                )
+                .values(holder=self.holder, expires_at=expires_at)
+            )
+            acquired = result.rowcount == 1
+
+            if not acquired:
+                # Строки ещё нет (первый запуск) — пробуем создать
+                result = await session.execute(
+                    dialect_insert(SchedulerLease)
+                    .values(name=self.name, holder=self.holder, expires_at=expires_at)
+                    .on_conflict_do_nothing(index_elements=["name"])
+                )
+                acquired = result.rowcount == 1
+
+            await session.commit()
+
+        was_leader = self.is_leader
+        self._held_until = expires_at if acquired else None
+        if acquired != was_leader:
+            logger.info(
+                "Scheduler leadership %s (%s)",
+                "acquired" if acquired else "lost",
+                self.holder,
+            )
+        return acquired
+
+
+leader_lease = LeaderLease()
@@ -0,0 +1,4 @@
+from .db import DbSessionMiddleware, DbStats
+from .user import UserMiddleware, UserSnapshot, user_cache
+
+__all__ = ["DbSessionMiddleware", "DbStats", "UserMiddleware", "UserSnapshot", "user_cache"]
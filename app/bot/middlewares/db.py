@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.core.db import async_session_maker, engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DbStats:
+    """Сколько запросов сделал апдейт и сколько времени они заняли."""
+
+    statements: int = 0
+    db_time: float = 0.0
+
+
+# Статистика текущего апдейта; вне апдейта (планировщик) — None
+_current_stats: ContextVar[Optional[DbStats]] = ContextVar("db_stats", default=None)
+
+
+def track_db_time(engine: AsyncEngine) -> None:
+    """Повесить на движок счётчики запросов и времени для DbSessionMiddleware."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_time += time.perf_counter() - started
+
+
+track_db_time(engine)
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: одна AsyncSession на апдейт.
+
+    Сессия передаётся хендлерам (и остальным middleware) как session
+    и коммитится один раз, когда хендлер отработал; при исключении
+    всё откатывается. Число запросов и время в БД пишутся в лог,
+    а медленные апдейты (дольше SLOW_UPDATE_MS) — предупреждением.
+
+    Хендлеры, которые пишут, коммитят сами до первого вызова Telegram:
+    иначе SQLite держал бы блокировку записи на время запроса к API,
+    а «✅ Сохранено» уходило бы раньше, чем запись в БД.
+    """
+
+    def __init__(self, slow_update_ms: float = settings.slow_update_ms) -> None:
+        self.slow_update_ms = slow_update_ms
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        stats = DbStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            async with async_session_maker() as session:
+                data["session"] = session
+                data["db_stats"] = stats
+                result = await handler(event, data)
+                if session.in_transaction():
+                    await session.commit()
+            return result
+        finally:
+            _current_stats.reset(token)
+            self._log(event, stats, time.perf_counter() - started)
+
+    def _log(self, event: TelegramObject, stats: DbStats, elapsed: float) -> None:
+        update_id = getattr(event, "update_id", None)
+        elapsed_ms = elapsed * 1000
+        db_ms = stats.db_time * 1000
+
+        if elapsed_ms >= self.slow_update_ms:
+            logger.warning(
+                "Slow update %s: %.0f ms total, %.0f ms in DB (%d statements)",
+                update_id, elapsed_ms, db_ms, stats.statements,
+            )
+        else:
+            logger.debug(
+                "Update %s: %.1f ms total, %.1f ms in DB (%d statements)",
+                update_id, elapsed_ms, db_ms, stats.statements,
+            )
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User as TgUser
+from app.config import settings
+from app.core.db import async_session_maker
+from app.core.models.user import User
+from app.core.services.users import get_or_create_user
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Неизменяемый снимок строки users, который кладётся в данные хендлера."""
+
+    id: int
+    telegram_id: int
+    first_name: Optional[str]
+    last_name: Optional[str]
+    username: Optional[str]
+    reminders_enabled: bool
+    deadline_reminders_enabled: bool
+    reminder_hour: int
+    reminder_minute: int
+
+    @classmethod
+    def from_model(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            username=user.username,
+            reminders_enabled=user.reminders_enabled,
+            deadline_reminders_enabled=user.deadline_reminders_enabled,
+            reminder_hour=user.reminder_hour,
+            reminder_minute=user.reminder_minute,
+        )
+
+    def matches(self, tg_user: TgUser) -> bool:
+        """Совпадают ли имя и username с тем, что прислал Telegram."""
+        return (
+            self.first_name == tg_user.first_name
+            and self.last_name == tg_user.last_name
+            and self.username == tg_user.username
+        )
+
+
+class UserCache:
+    """
+    Ограниченный LRU-кэш telegram_id → UserSnapshot с TTL.
+
+    Кэш живёт в памяти процесса. Хендлеры, меняющие поля пользователя,
+    вызывают invalidate(); изменения из других реплик подхватятся по TTL.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 300.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: OrderedDict[int, tuple[float, UserSnapshot]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, telegram_id: int) -> Optional[UserSnapshot]:
+        item = self._items.get(telegram_id)
+        if item is None:
+            return None
+
+        expires_at, snapshot = item
+        if expires_at <= time.monotonic():
+            del self._items[telegram_id]
+            return None
+
+        self._items.move_to_end(telegram_id)
+        return snapshot
+
+    def put(self, snapshot: UserSnapshot) -> None:
+        self._items[snapshot.telegram_id] = (time.monotonic() + self.ttl, snapshot)
+        self._items.move_to_end(snapshot.telegram_id)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self, telegram_id: int) -> None:
+        self._items.pop(telegram_id, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+user_cache = UserCache(
+    maxsize=settings.user_cache_size,
+    ttl=settings.user_cache_ttl,
+)
+
+
+async def _load_or_register(session, tg_user: TgUser) -> UserSnapshot:
+    user = await get_or_create_user(
+        session,
+        telegram_id=tg_user.id,
+        first_name=tg_user.first_name,
+        last_name=tg_user.last_name,
+        username=tg_user.username,
+    )
+    snapshot = UserSnapshot.from_model(user)
+    # Коммитим сразу: снимок попадёт в кэш, даже если хендлер потом упадёт
+    await session.commit()
+    return snapshot
+
+
+class UserMiddleware(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: один раз на апдейт сопоставляет
+    Telegram-пользователя со строкой users (регистрируя новых)
+    и передаёт хендлерам user_id и user_settings.
+
+    Если раньше подключён DbSessionMiddleware, работает в его сессии.
+    """
+
+    def __init__(self, cache: UserCache = user_cache) -> None:
+        self.cache = cache
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        tg_user: Optional[TgUser] = data.get("event_from_user")
+        if tg_user is None:
+            return await handler(event, data)
+
+        snapshot = self.cache.get(tg_user.id)
+        # Сменил имя/username — обновим строку тем же upsert'ом
+        if snapshot is None or not snapshot.matches(tg_user):
+            session = data.get("session")
+            if session is not None:
+                snapshot = await _load_or_register(session, tg_user)
+            else:
+                async with async_session_maker() as session:
+                    snapshot = await _load_or_register(session, tg_user)
+            self.cache.put(snapshot)
+
+        data["user_id"] = snapshot.id
+        data["user_settings"] = snapshot
+        return await handler(event, data)
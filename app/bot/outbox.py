@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update, delete
+
+from app.bot.leader import leader_lease
+from app.bot.sender import OutboundMessage, send_pipeline
+from app.core.db import async_session_maker, dialect_insert
+from app.core.models.outbox import OutboxMessage, OutboxStatus
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Notification:
+    key: str        # ключ идемпотентности, например "digest:42:2025-01-31"
+    user_id: int
+    chat_id: int
+    text: str
+
+
+async def enqueue_notifications(session, notifications: Iterable[Notification]) -> None:
+    """
+    Записать уведомления в outbox в рамках текущей транзакции.
+
+    Повторная постановка с тем же ключом молча игнорируется,
+    поэтому вызывающий код может смело ретраить.
+    """
+    rows = [
+        {
+            "idempotency_key": n.key,
+            "user_id": n.user_id,
+            "chat_id": n.chat_id,
+            "text": n.text,
+            "status": OutboxStatus.PENDING,
+            "attempts": 0,
+            "next_attempt_at": datetime.now(),
+            "created_at": datetime.utcnow(),
+        }
+        for n in notifications
+    ]
+    if not rows:
+        return
+
+    stmt = dialect_insert(OutboxMessage).on_conflict_do_nothing(
+        index_elements=["idempotency_key"]
+    )
+    await session.execute(stmt, rows)
+
+
+class OutboxDispatcher:
+    """
+    Разбирает notification_outbox пачками и отправляет через send_pipeline.
+
+    Неудачные отправки повторяются с экспоненциальной задержкой,
+    после max_attempts сообщение помечается как failed.
+    Доставка «как минимум один раз»: если процесс упадёт между отправкой
+    и отметкой delivered, сообщение уйдёт повторно, когда истечёт claim_timeout.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 200,
+        max_attempts: int = 6,
+        base_delay: timedelta = timedelta(seconds=30),
+        keep_delivered: timedelta = timedelta(days=7),
+        claim_timeout: timedelta = timedelta(minutes=5),
+        max_drain: timedelta = timedelta(seconds=60),
+        poll_interval: timedelta = timedelta(seconds=30),
+    ) -> None:
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.keep_delivered = keep_delivered
+        self.claim_timeout = claim_timeout
+        # Один drain() короче ttl аренды лидера: остальное заберёт следующий
+        self.max_drain = max_drain
+        # Как часто лидер заглядывает в outbox без kick(): ретраи, сообщения других реплик
+        self.poll_interval = poll_interval
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+
+    # ====== Жизненный цикл ======
+    def start(self) -> None:
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    def kick(self) -> None:
+        """Разбудить цикл разбора: в outbox появились новые сообщения."""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # Kick во время drain() не теряется: событие сброшено до него
+                self._wakeup.clear()
+                delivered = 0
+                if leader_lease.is_leader:
+                    delivered = await self.drain()
+
+                # drain() мог упереться в max_drain — тогда сразу продолжаем
+                if not delivered:
+                    try:
+                        await asyncio.wait_for(
+                            self._wakeup.wait(), self.poll_interval.total_seconds()
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Outbox dispatcher iteration failed")
+                await asyncio.sleep(5)
+
+    # ====== Разбор ======
+
+    async def drain(self) -> int:
+        """
+        Отправить всё, что пора отправить; вернуть число доставленных.
+
+        Перед каждой пачкой продлеваем аренду лидера и останавливаемся,
+        если её перехватила другая реплика.
+        """
+        delivered_total = 0
+        deadline = time.monotonic() + self.max_drain.total_seconds()
+
+        # Два параллельных drain() в одном процессе только делили бы пачки между собой
+        async with self._lock:
+            while time.monotonic() < deadline:
+                if not await leader_lease.try_acquire():
+                    logger.warning("Outbox: leadership lost, drain stopped")
+                    break
+
+                batch = await self._claim()
+                if not batch:
+                    break
+
+                results, _ = await send_pipeline.send_batch(
+                    (OutboundMessage(row.chat_id, row.text) for row in batch),
+                    label="outbox",
+                )
+
+                delivered = [row.id for row, ok in zip(batch, results) if ok]
+                failed = [row.id for row, ok in zip(batch, results) if not ok]
+                await self._mark(delivered, failed)
+                delivered_total += len(delivered)
+
+                if len(batch) < self.batch_size:
+                    break
+
+        return delivered_total
+
+    async def _claim(self) -> list:
+        """
+        Забрать пачку к отправке, сдвинув её next_attempt_at на claim_timeout.
+
+        Пока срок не истёк, эти строки не видит ни один другой drain(),
+        в том числе на реплике, успевшей перехватить аренду. Если процесс
+        упадёт посреди отправки, пачка вернётся в очередь по истечении срока.
+        """
+        now = datetime.now()
+        due = (
+            select(OutboxMessage.id)
+            .where(OutboxMessage.status == OutboxStatus.PENDING)
+            .where(OutboxMessage.next_attempt_at <= now)
+            .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+            .limit(self.batch_size)
+            # На PostgreSQL параллельный захват не ждёт чужие строки; SQLite это опускает
+            .with_for_update(skip_locked=True)
+        )
+
+        async with async_session_maker() as session:
+            # Условия повторяются во внешнем UPDATE: строку, которую уже
+            # перехватил другой, он при перепроверке просто пропустит
+            result = await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(due))
+                .where(OutboxMessage.status == OutboxStatus.PENDING)
+                .where(OutboxMessage.next_attempt_at <= now)
+                .values(next_attempt_at=now + self.claim_timeout)
+                .returning(OutboxMessage.id, OutboxMessage.chat_id, OutboxMessage.text)
+                .execution_options(synchronize_session=False)
+            )
+            batch = sorted(result.all(), key=lambda row: row.id)
+            await session.commit()
+
+        return batch
+
+    async def _mark(self, delivered: list[int], failed: list[int]) -> None:
+        now = datetime.now()
+
+        async with async_session_maker() as session:
+            if delivered:
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(delivered))
+                    .values(status=OutboxStatus.DELIVERED, delivered_at=now)
+                )
+
+            if failed:
+                result = await session.execute(
+                    select(OutboxMessage.id, OutboxMessage.attempts)
+                    .where(OutboxMessage.id.in_(failed))
+                )
+                for message_id, attempts in result.all():
+                    attempts += 1
+                    values = {"attempts": attempts, "last_error": "send failed"}
+                    if attempts >= self.max_attempts:
+                        values["status"] = OutboxStatus.FAILED
+                    else:
+                        values["next_attempt_at"] = now + self.base_delay * 2 ** (attempts - 1)
+                    await session.execute(
+                        update(OutboxMessage)
+                        .where(OutboxMessage.id == message_id)
+                        .values(**values)
+                    )
+                logger.warning("Outbox: %d messages failed, will retry", len(failed))
+
+            await session.commit()
+
+    async def purge_delivered(self) -> None:
+        """Удалить давно доставленные сообщения, чтобы таблица не росла."""
+        cutoff = datetime.now() - self.keep_delivered
+        async with async_session_maker() as session:
+            await session.execute(
+                delete(OutboxMessage)
+                .where(OutboxMessage.status == OutboxStatus.DELIVERED)
+                .where(OutboxMessage.delivered_at < cutoff)
+            )
+            await session.commit()
+
+
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,238 @@
+"""
+Постраничные списки задач, заметок и проектов.
+
+Список — одно сообщение: нумерованные строки, кнопки с номерами
+(открыть карточку на месте) и кнопки листания. Листание и возврат
+к списку редактируют то же сообщение, а не шлют новые.
+
+Листание — по курсору (created_at, id), а не через OFFSET: курсор
+упакован в ListPageCb, и каждая страница — один диапазонный проход
+по индексу (owner_id, created_at), так что 500-я страница стоит
+столько же, сколько первая.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional, Sequence
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from sqlalchemy import Select, and_, exists, or_, select
+
+PAGE_SIZE = 10
+# Сколько кнопок с номерами в одном ряду
+SELECT_ROW_WIDTH = 5
+
+# Наивные datetime (как в моделях) пакуются в микросекунды от этой точки
+_EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass(frozen=True)
+class Cursor:
+    # значение ключа сортировки: обычно created_at, у списков по сроку — due_at
+    created_at: datetime
+    id: int
+
+    @classmethod
+    def of(cls, item, attr: str = "created_at") -> "Cursor":
+        return cls(getattr(item, attr), item.id)
+
+    @classmethod
+    def unpack(cls, ts: int, item_id: int) -> Optional["Cursor"]:
+        if not item_id:
+            return None
+        return cls(_EPOCH + timedelta(microseconds=ts), item_id)
+
+    @property
+    def ts(self) -> int:
+        return (self.created_at - _EPOCH) // timedelta(microseconds=1)
+
+
+class ListPageCb(CallbackData, prefix="page"):
+    section: str        # "tasks" | "notes" | "projects"
+    # "next" — строки старше курсора, "prev" — новее курсора,
+    # "from" — начиная с курсора включительно (возврат из карточки)
+    dir: str = "next"
+    ts: int = 0         # created_at курсора в микросекундах
+    id: int = 0         # id курсора; 0 — первая страница
+    # фильтр списка, например "t5" — заметки с тегом 5, "todo" — задачи ToDo;
+    # "" — без фильтра
+    flt: str = ""
+
+    @classmethod
+    def at(cls, section: str, direction: str, cursor: Cursor, flt: str = "") -> "ListPageCb":
+        return cls(section=section, dir=direction, ts=cursor.ts, id=cursor.id, flt=flt)
+
+    @property
+    def cursor(self) -> Optional[Cursor]:
+        return Cursor.unpack(self.ts, self.id)
+
+
+@dataclass
+class Page:
+    items: Sequence[Any]
+    has_prev: bool
+    has_next: bool
+    # атрибут элемента, по которому упорядочена страница (ключ курсора)
+    sort_attr: str = "created_at"
+
+    @property
+    def first(self) -> Cursor:
+        return Cursor.of(self.items[0], self.sort_attr)
+
+    @property
+    def last(self) -> Cursor:
+        return Cursor.of(self.items[-1], self.sort_attr)
+
+
+def _older(key, cursor: Cursor, inclusive: bool = False):
+    # created_at <= :ts задаёт диапазон по индексу, остальное — добивка на границе
+    created_at, item_id = key
+    same = item_id <= cursor.id if inclusive else item_id < cursor.id
+    return and_(
+        created_at <= cursor.created_at,
+        or_(created_at < cursor.created_at, same),
+    )
+
+
+def _newer(key, cursor: Cursor, inclusive: bool = False):
+    created_at, item_id = key
+    same = item_id >= cursor.id if inclusive else item_id > cursor.id
+    return and_(
+        created_at >= cursor.created_at,
+        or_(created_at > cursor.created_at, same),
+    )
+
+
+async def _probe(session, stmt: Select, condition) -> bool:
+    """Есть ли хоть одна строка за краем страницы (одна проба индекса)."""
+    return bool(await session.scalar(select(exists(stmt.where(condition)))))
+
+
+async def fetch_page(
+    session,
+    stmt: Select,
+    model,
+    direction: str = "next",
+    cursor: Optional[Cursor] = None,
+    page_size: int = PAGE_SIZE,
+    newest_first: bool = True,
+    key=None,
+) -> Page:
+    """
+    Страница списка относительно курсора.
+
+    stmt — select(model) с фильтром по владельцу, без ORDER BY.
+    Порядок — (created_at, id) по убыванию, а при newest_first=False
+    по возрастанию (подзадачи и файлы в карточке задачи).
+    key — колонки (created_at, id), по которым листать, если они не в model:
+    например, копия created_at в таблице связей, где лежит нужный индекс,
+    или (due_at, id) для списков по сроку. Значение курсора берётся
+    из одноимённого первой колонке атрибута элемента; колонка не должна быть NULL.
+    direction "upto" — страница, которая заканчивается курсором включительно.
+    Если страница опустела (удалили последние элементы) — отдаём соседнюю.
+    """
+    key = key or (model.created_at, model.id)
+    created_at, item_id = key
+    sort_attr = created_at.key
+    if newest_first:
+        forward = (created_at.desc(), item_id.desc())
+        backward = (created_at, item_id)
+        after, before = _older, _newer
+    else:
+        forward = (created_at, item_id)
+        backward = (created_at.desc(), item_id.desc())
+        after, before = _newer, _older
+
+    if direction in ("prev", "upto") and cursor is not None:
+        result = await session.execute(
+            stmt.where(before(key, cursor, inclusive=direction == "upto"))
+            .order_by(*backward)
+            .limit(page_size + 1)
+        )
+        rows = list(result.scalars().all())
+        if len(rows) < page_size:
+            # Упёрлись в начало списка — показываем первую страницу целиком
+            return await fetch_page(
+                session, stmt, model, page_size=page_size, newest_first=newest_first, key=key
+            )
+
+        items = rows[:page_size][::-1]
+        return Page(
+            items=items,
+            has_prev=len(rows) > page_size,
+            has_next=await _probe(session, stmt, after(key, Cursor.of(items[-1], sort_attr))),
+            sort_attr=sort_attr,
+        )
+
+    query = stmt
+    if cursor is not None:
+        query = query.where(after(key, cursor, inclusive=direction == "from"))
+
+    result = await session.execute(
+        query.order_by(*forward).limit(page_size + 1)
+    )
+    rows = result.scalars().all()
+
+    if not rows and cursor is not None:
+        return await fetch_page(
+            session, stmt, model, "prev", cursor, page_size, newest_first, key
+        )
+
+    items = rows[:page_size]
+    has_prev = False
+    if cursor is not None and items:
+        has_prev = await _probe(session, stmt, before(key, Cursor.of(items[0], sort_attr)))
+
+    return Page(
+        items=items,
+        has_prev=has_prev,
+        has_next=len(rows) > page_size,
+        sort_attr=sort_attr,
+    )
+
+
+def list_markup(
+    section: str,
+    page: Page,
+    open_callbacks: Sequence[str],
+    add_text: str,
+    add_callback: str,
+    flt: str = "",
+    extra_row: Sequence[InlineKeyboardButton] = (),
+) -> InlineKeyboardMarkup:
+    """
+    Клавиатура списка: номера элементов, листание и кнопка «добавить».
+    open_callbacks — callback_data для открытия каждого элемента страницы.
+    flt уходит в кнопки листания; extra_row — ряд кнопок над «добавить».
+    """
+    rows: list[list[InlineKeyboardButton]] = []
+
+    select_row: list[InlineKeyboardButton] = []
+    for number, callback_data in enumerate(open_callbacks, start=1):
+        select_row.append(InlineKeyboardButton(text=str(number), callback_data=callback_data))
+        if len(select_row) == SELECT_ROW_WIDTH:
+            rows.append(select_row)
+            select_row = []
+    if select_row:
+        rows.append(select_row)
+
+    pager: list[InlineKeyboardButton] = []
+    if page.has_prev:
+        pager.append(InlineKeyboardButton(
+            text="◀️ Назад",
+            callback_data=ListPageCb.at(section, "prev", page.first, flt).pack(),
+        ))
+    if page.has_next:
+        pager.append(InlineKeyboardButton(
+            text="Вперёд ▶️",
+            callback_data=ListPageCb.at(section, "next", page.last, flt).pack(),
+        ))
+    if pager:
+        rows.append(pager)
+    if extra_row:
+        rows.append(list(extra_row))
+
+    rows.append([InlineKeyboardButton(text=add_text, callback_data=add_callback)])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
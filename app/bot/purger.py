@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from app.core.services.purge import purge_deleted_projects
+
+logger = logging.getLogger(__name__)
+
+
+class ProjectPurger:
+    """
+    Фоновая очистка мягко удалённых проектов.
+
+    Хендлер удаления только ставит deleted_at, коммитит и зовёт kick():
+    задачи проекта удаляются чанками уже вне апдейта. Раз в несколько
+    минут планировщик вызывает purge() — он дочищает то, что не успели
+    до рестарта.
+    """
+
+    def __init__(self) -> None:
+        self._lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def purge(self) -> int:
+        """Дочистить все удалённые проекты; вернуть число удалённых задач."""
+        # Один проход за раз: следующий kick() дождётся и подхватит новые проекты
+        async with self._lock:
+            try:
+                return await purge_deleted_projects()
+            except Exception:
+                logger.exception("Project purge failed")
+                return 0
+
+    def kick(self) -> None:
+        """Запустить purge() в фоне, не дожидаясь его."""
+        task = asyncio.create_task(self.purge())
+        # Держим ссылку, иначе задачу может собрать GC
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+project_purger = ProjectPurger()
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update
+
+from app.bot.outbox import Notification, enqueue_notifications, outbox_dispatcher
+from app.core.db import async_session_maker
+from app.core.models.task import Task, TaskStatus, not_in_deleted_project
+from app.core.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ReminderKind:
+    flag: str              # флаг на Task: напоминание уже отправлено
+    offset: timedelta      # за сколько до дедлайна напоминать
+    left_text: str         # "остался 1 день" и т.п.
+
+
+REMINDER_KINDS: tuple[ReminderKind, ...] = (
+    ReminderKind("remind_1day_sent", timedelta(days=1), "остался <b>1 день</b>"),
+    ReminderKind("remind_3h_sent", timedelta(hours=3), "осталось <b>3 часа</b>"),
+    ReminderKind("remind_1h_sent", timedelta(hours=1), "остался <b>1 час</b>"),
+)
+
+# Напоминание, опоздавшее не больше чем на столько, всё ещё отправляем
+# (как окно ±5 минут у старого поминутного сканера).
+FIRE_TOLERANCE = timedelta(minutes=5)
+
+# Как часто подтягивать из БД дедлайны, попадающие в горизонт напоминаний.
+# Это страховка на случай рестарта и задач, изменённых мимо хуков роутеров.
+REFILL_INTERVAL = timedelta(minutes=30)
+
+MAX_OFFSET = max(kind.offset for kind in REMINDER_KINDS)
+
+
+class ReminderEngine:
+    """
+    Событийный движок напоминаний о дедлайнах.
+
+    Держит ближайшие моменты срабатывания (due_at - offset) в min-heap
+    и просыпается только тогда, когда подходит время первого из них.
+    Роутеры сообщают об изменениях задач через schedule()/unschedule().
+    """
+
+    def __init__(self) -> None:
+        # (fire_at, seq, task_id, kind_index, generation)
+        self._heap: list[tuple[datetime, int, int, int, int]] = []
+        # task_id -> [generation, сколько записей этого поколения ещё в куче]
+        self._live: dict[int, list[int]] = {}
+        self._seq = 0
+        self._generation = 0
+        self._wakeup = asyncio.Event()
+        self._next_refill: Optional[datetime] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    # ====== Публичное API для роутеров ======
+    def schedule(
+        self,
+        task_id: int,
+        due_at: Optional[datetime],
+        now: Optional[datetime] = None,
+    ) -> None:
+        """Запланировать (или перепланировать) напоминания для задачи."""
+        if due_at is None:
+            self.unschedule(task_id)
+            return
+
+        now = now or datetime.now()
+        self._generation += 1
+        generation = self._generation
+        pushed = 0
+
+        for kind_index, kind in enumerate(REMINDER_KINDS):
+            fire_at = due_at - kind.offset
+            if fire_at + FIRE_TOLERANCE < now:
+                continue
+            self._seq += 1
+            heapq.heappush(
+                self._heap, (fire_at, self._seq, task_id, kind_index, generation)
+            )
+            pushed += 1
+
+        if pushed:
+            self._live[task_id] = [generation, pushed]
+        else:
+            self._live.pop(task_id, None)
+        self._wakeup.set()
+
+    def unschedule(self, task_id: int) -> None:
+        """Отменить напоминания задачи (записи в куче отбросятся лениво)."""
+        self._live.pop(task_id, None)
+
+    # ====== Жизненный цикл ======
+    def start(self) -> None:
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                now = datetime.now()
+                if self._next_refill is None or now >= self._next_refill:
+                    await self.refill(now)
+
+                await self.fire_due(datetime.now())
+
+                timeout = self._seconds_until_next(datetime.now())
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Reminder engine iteration failed")
+                await asyncio.sleep(5)
+
+    def _seconds_until_next(self, now: datetime) -> float:
+        wake_at = self._next_refill or now
+        if self._heap and self._heap[0][0] < wake_at:
+            wake_at = self._heap[0][0]
+        return max((wake_at - now).total_seconds(), 0.0)
+
+    # ====== Загрузка из БД ======
+    async def refill(self, now: datetime) -> None:
+        """Подтянуть задачи, чьи напоминания попадают в ближайший горизонт."""
+        horizon_end = now + MAX_OFFSET + REFILL_INTERVAL + FIRE_TOLERANCE
+
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(Task.id, Task.due_at)
+                .join(User, User.id == Task.user_id)
+                .where(Task.due_at > now)
+                .where(Task.due_at <= horizon_end)
+                .where(Task.status != TaskStatus.DONE)
+                .where(Task.archived_at.is_(None))
+                # Иначе refill вернул бы напоминания, снятые при удалении проекта
+                .where(not_in_deleted_project())
+                .where(User.deadline_reminders_enabled.is_(True))
+            )
+            rows = result.all()
+
+        # Перестраиваем кучу с нуля: старые записи всё равно перекрываются
+        self._heap.clear()
+        self._live.clear()
+        for task_id, due_at in rows:
+            self.schedule(task_id, due_at, now)
+
+        self._next_refill = now + REFILL_INTERVAL
+        logger.info("Reminder engine refilled: %d tasks, %d entries", len(rows), len(self._heap))
+
+    # ====== Срабатывание ======
+    def _pop_due(self, now: datetime) -> list[tuple[int, int]]:
+        due: list[tuple[int, int]] = []
+
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, _, task_id, kind_index, generation = heapq.heappop(self._heap)
+
+            live = self._live.get(task_id)
+            if live is None or live[0] != generation:
+                continue  # задача перепланирована или удалена
+
+            live[1] -= 1
+            if live[1] <= 0:
+                del self._live[task_id]
+
+            if now - fire_at > FIRE_TOLERANCE:
+                continue  # проспали окно — как и раньше, не шлём
+
+            due.append((task_id, kind_index))
+
+        return due
+
+    async def fire_due(self, now: datetime) -> None:
+        due = self._pop_due(now)
+        if not due:
+            return
+
+        task_ids = {task_id for task_id, _ in due}
+        notifications: list[Notification] = []
+        flagged: dict[str, list[int]] = {}
+
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(Task, User.telegram_id, User.deadline_reminders_enabled)
+                .join(User, User.id == Task.user_id)
+                .where(Task.id.in_(task_ids))
+                .where(not_in_deleted_project())
+            )
+            loaded = {task.id: (task, tg_id, enabled) for task, tg_id, enabled in result.all()}
+
+            for task_id, kind_index in due:
+                row = loaded.get(task_id)
+                if row is None:
+                    continue
+                task, telegram_id, enabled = row
+                kind = REMINDER_KINDS[kind_index]
+
+                if not enabled or task.status == TaskStatus.DONE or task.due_at is None:
+                    continue
+                if task.due_at <= now or getattr(task, kind.flag):
+                    continue
+
+                notifications.append(
+                    Notification(
+                        key=f"deadline:{task.id}:{kind.flag}:{task.due_at:%Y%m%d%H%M}",
+                        user_id=task.user_id,
+                        chat_id=telegram_id,
+                        text=(
+                            "⏰ <b>Напоминание по задаче</b>\n"
+                            f"До дедлайна по задаче <b>«{task.title}»</b> "
+                            f"{kind.left_text}."
+                        ),
+                    )
+                )
+                # Флаг теперь значит «поставлено в outbox»: доставку
+                # с ретраями гарантирует диспетчер
+                flagged.setdefault(kind.flag, []).append(task.id)
+
+            # Флаги — массовым UPDATE на каждый вид напоминания, а не через ORM:
+            # в карточке они не видны, так что version задачи не трогаем
+            for flag, ids in flagged.items():
+                await session.execute(
+                    update(Task)
+                    .where(Task.id.in_(ids))
+                    .values({flag: True})
+                    .execution_options(synchronize_session=False)
+                )
+
+            await enqueue_notifications(session, notifications)
+            await session.commit()
+
+        # Только будим диспетчер, а не ждём отправку: пока идёт большая рассылка,
+        # движок должен просыпаться вовремя, иначе напоминания выпадут из FIRE_TOLERANCE.
+        # Отправляет лишь лидер; остальные реплики кладут в outbox, лидер заберёт по опросу
+        if notifications:
+            outbox_dispatcher.kick()
+
+
+reminder_engine = ReminderEngine()
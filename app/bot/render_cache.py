@@ -0,0 +1,54 @@
+"""
+Кэш отрисованных карточек задач, заметок и проектов.
+
+Ключ — (сущность, id, version, вид). Любое изменение строки увеличивает
+version (см. app/core/models/versioned.py), поэтому устаревшая запись
+просто перестаёт находиться и со временем вытесняется LRU — сбрасывать
+кэш вручную не нужно. Хендлер читает из БД только version (с проверкой
+владельца) и при попадании не грузит и не форматирует карточку заново.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from aiogram.types import InlineKeyboardMarkup
+
+from app.config import settings
+
+Rendered = tuple[str, InlineKeyboardMarkup]
+
+
+class RenderCache:
+    """Ограниченный LRU-кэш (сущность, id, version, вид) → (текст, клавиатура)."""
+
+    def __init__(self, maxsize: int = 5_000) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[Hashable, Rendered] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Optional[Rendered]:
+        rendered = self._items.get(key)
+        if rendered is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._items.move_to_end(key)
+        return rendered
+
+    def put(self, key: Hashable, rendered: Rendered) -> None:
+        self._items[key] = rendered
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+render_cache = RenderCache(maxsize=settings.render_cache_size)
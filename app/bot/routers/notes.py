@@ -2,35 +2,62 @@ from __future__ import annotations
 
 from datetime import datetime
 from typing import Optional
+from html import escape
 
 from aiogram import Router, types, F
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.filters.callback_data import CallbackData
-from sqlalchemy import select
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.bot.keyboards.notes_menu import notes_menu_kb
 from app.bot.keyboards.main_menu import main_menu_kb
 from app.bot.states.note_states import NewNoteStates
-from app.core.db import async_session_maker
-from app.core.models.user import User
+from app.bot.pagination import Cursor, ListPageCb, Page, fetch_page, list_markup
+from app.bot.render_cache import Rendered, render_cache
 from app.core.models.note import Note
+from app.core.models.tag import NoteTag, Tag
+from app.core.services.tags import set_note_tags
+from app.core.tagging import parse_tags
 
 notes_router = Router()
 
 
 # ====== CallbackData для заметок ======
 class NoteActionCb(CallbackData, prefix="note"):
-    action: str  # "view", "close", "delete"
+    action: str  # "view" (открыть), "close" (к списку), "delete"
     note_id: int
 
 
+# Сколько тегов показывать в выборе тега
+TAGS_LIMIT = 40
+
+
+def tag_filter(tag_id: int) -> str:
+    """Значение ListPageCb.flt для списка заметок с тегом."""
+    return f"t{tag_id}"
+
+
+def _tag_id(flt: str) -> Optional[int]:
+    if flt.startswith("t") and flt[1:].isdigit():
+        return int(flt[1:])
+    return None
+
+
 # ====== Вспомогательные функции ======
-def format_note_short(note: Note) -> str:
-    text = f"📝 <b>{note.title}</b>"
-    if note.tags:
-        text += f"\n    🏷 <i>{note.tags}</i>"
-    return text
+def format_notes_list(page: Page, tag_name: Optional[str] = None) -> str:
+    if tag_name is None:
+        lines = ["📝 <b>Твои заметки</b>", ""]
+    else:
+        lines = [f"🏷 <b>Заметки с тегом «{escape(tag_name)}»</b>", ""]
+    for number, note in enumerate(page.items, start=1):
+        line = f"{number}. {escape(note.title)}"
+        if note.tags:
+            line += f" — 🏷 <i>{escape(note.tags)}</i>"
+        lines.append(line)
+    return "\n".join(lines)
 
 
 def format_note_full(note: Note) -> str:
@@ -41,86 +68,205 @@ def format_note_full(note: Note) -> str:
     return text
 
 
-def note_inline_kb_collapsed(note: Note):
-    """Клавиатура для свернутой заметки: Открыть + Удалить."""
+def note_inline_kb_expanded(note: Note, tags=()):
+    """Клавиатура для открытой заметки: теги (фильтр списка), К списку + Удалить."""
     builder = InlineKeyboardBuilder()
-    builder.button(
-        text="📄 Открыть",
-        callback_data=NoteActionCb(action="view", note_id=note.id).pack(),
-    )
-    builder.button(
-        text="🗑 Удалить",
-        callback_data=NoteActionCb(action="delete", note_id=note.id).pack(),
+    for tag_id, name in tags:
+        builder.button(
+            text=f"🏷 {name}",
+            callback_data=ListPageCb(section="notes", flt=tag_filter(tag_id)).pack(),
+        )
+    builder.adjust(3)
+    builder.row(
+        InlineKeyboardButton(
+            text="⬅️ К списку",
+            callback_data=NoteActionCb(action="close", note_id=note.id).pack(),
+        ),
+        InlineKeyboardButton(
+            text="🗑 Удалить",
+            callback_data=NoteActionCb(action="delete", note_id=note.id).pack(),
+        ),
     )
-    builder.adjust(2)
     return builder.as_markup()
 
 
-def note_inline_kb_expanded(note: Note):
-    """Клавиатура для развернутой заметки: Закрыть + Удалить."""
-    builder = InlineKeyboardBuilder()
-    builder.button(
-        text="🔼 Закрыть",
-        callback_data=NoteActionCb(action="close", note_id=note.id).pack(),
-    )
-    builder.button(
-        text="🗑 Удалить",
-        callback_data=NoteActionCb(action="delete", note_id=note.id).pack(),
+async def build_note_card(session, note_id: int, version: int) -> Rendered:
+    """Карточка заметки из кэша; при промахе — загрузить и отрисовать."""
+    key = ("note", note_id, version, "card")
+    rendered = render_cache.get(key)
+    if rendered is None:
+        note = await session.get(Note, note_id)
+        tags = (
+            await session.execute(
+                select(Tag.id, Tag.name)
+                .join(NoteTag, NoteTag.tag_id == Tag.id)
+                .where(NoteTag.note_id == note_id)
+                .order_by(Tag.name)
+            )
+        ).all()
+        rendered = (format_note_full(note), note_inline_kb_expanded(note, tags))
+        # Версия могла уйти вперёд между запросами — кладём под загруженную
+        render_cache.put(("note", note_id, note.version, "card"), rendered)
+    return rendered
+
+
+def _notes_list_query(user_id: int):
+    return select(Note).where(Note.user_id == user_id)
+
+
+async def build_notes_list_view(
+    session,
+    user_id: int,
+    direction: str = "next",
+    cursor: Optional[Cursor] = None,
+    flt: str = "",
+):
+    """Список заметок одним сообщением: текст и клавиатура."""
+    tag_id = _tag_id(flt)
+    if tag_id is not None:
+        return await build_tag_notes_view(session, user_id, tag_id, direction, cursor)
+
+    notes_page = await fetch_page(
+        session, _notes_list_query(user_id), Note, direction, cursor
     )
-    builder.adjust(2)
-    return builder.as_markup()
 
+    if not notes_page.items:
+        text = (
+            "У тебя пока нет заметок.\n\n"
+            "Нажми <b>«➕ Добавить заметку»</b>, чтобы создать первую."
+        )
+        return text, notes_menu_kb()
+
+    kb = list_markup(
+        "notes",
+        notes_page,
+        [NoteActionCb(action="view", note_id=note.id).pack() for note in notes_page.items],
+        add_text="➕ Добавить заметку",
+        add_callback="notes:add",
+        extra_row=[InlineKeyboardButton(text="🏷 Теги", callback_data="notes:tags")],
+    )
+    return format_notes_list(notes_page), kb
 
-# ====== Обработчик кнопки "📝 Заметки" из главного меню ======
-@notes_router.message(F.text == "📝 Заметки")
-async def handle_notes_menu(message: types.Message):
-    tg_user = message.from_user
 
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
+async def build_tag_notes_view(
+    session,
+    user_id: int,
+    tag_id: int,
+    direction: str = "next",
+    cursor: Optional[Cursor] = None,
+):
+    """
+    Заметки с тегом. Листаем по индексу note_tags (tag_id, created_at, note_id),
+    а заметки читаем только для строк страницы — цена зависит от размера
+    страницы, а не от общего числа заметок пользователя.
+    """
+    tag_name = (
+        await session.execute(
+            select(Tag.name).where(Tag.id == tag_id, Tag.user_id == user_id)
         )
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            user = User(
-                telegram_id=tg_user.id,
-                first_name=tg_user.first_name,
-                last_name=tg_user.last_name,
-                username=tg_user.username,
-            )
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
-
-        result = await session.execute(
-            select(Note)
-            .where(Note.user_id == user.id)
-            .order_by(Note.created_at.desc())
-            .limit(10)
+    ).scalar_one_or_none()
+
+    notes_page = Page(items=[], has_prev=False, has_next=False)
+    if tag_name is not None:
+        notes_page = await fetch_page(
+            session,
+            select(Note).join(NoteTag, NoteTag.note_id == Note.id).where(NoteTag.tag_id == tag_id),
+            Note,
+            direction,
+            cursor,
+            key=(NoteTag.created_at, NoteTag.note_id),
         )
-        notes = result.scalars().all()
 
-    if not notes:
-        await message.answer(
-            "У тебя пока нет заметок.\n\n"
-            "Нажми <b>«➕ Добавить заметку»</b>, чтобы создать первую.",
-            reply_markup=notes_menu_kb(),
+    back_row = [
+        InlineKeyboardButton(text="🏷 Теги", callback_data="notes:tags"),
+        InlineKeyboardButton(
+            text="📝 Все заметки", callback_data=ListPageCb(section="notes").pack()
+        ),
+    ]
+    if not notes_page.items:
+        return (
+            "Заметок с этим тегом нет.",
+            InlineKeyboardMarkup(inline_keyboard=[back_row]),
         )
-        return
 
-    await message.answer("Твои последние заметки:")
-    for note in notes:
-        await message.answer(
-            format_note_short(note),
-            reply_markup=note_inline_kb_collapsed(note),
+    kb = list_markup(
+        "notes",
+        notes_page,
+        [NoteActionCb(action="view", note_id=note.id).pack() for note in notes_page.items],
+        add_text="➕ Добавить заметку",
+        add_callback="notes:add",
+        flt=tag_filter(tag_id),
+        extra_row=back_row,
+    )
+    return format_notes_list(notes_page, tag_name), kb
+
+
+async def build_tags_view(session, user_id: int):
+    """Теги пользователя с числом заметок — выбор фильтра."""
+    result = await session.execute(
+        select(Tag.id, Tag.name, func.count(NoteTag.note_id))
+        .join(NoteTag, NoteTag.tag_id == Tag.id)
+        .where(Tag.user_id == user_id)
+        .group_by(Tag.id, Tag.name)
+        .order_by(Tag.name)
+        .limit(TAGS_LIMIT)
+    )
+    tags = result.all()
+
+    builder = InlineKeyboardBuilder()
+    for tag_id, name, count in tags:
+        builder.button(
+            text=f"🏷 {name} ({count})",
+            callback_data=ListPageCb(section="notes", flt=tag_filter(tag_id)).pack(),
         )
+    builder.adjust(2)
+    builder.row(InlineKeyboardButton(
+        text="📝 Все заметки", callback_data=ListPageCb(section="notes").pack()
+    ))
 
-    await message.answer(
-        "Меню заметок:",
-        reply_markup=notes_menu_kb(),
+    if not tags:
+        return "У заметок пока нет тегов.", builder.as_markup()
+    return "🏷 <b>Выбери тег</b>", builder.as_markup()
+
+
+# ====== Обработчик кнопки "📝 Заметки" из главного меню ======
+@notes_router.message(F.text == "📝 Заметки")
+async def handle_notes_menu(message: types.Message, user_id: int, session: AsyncSession):
+    text, kb = await build_notes_list_view(session, user_id)
+
+    await message.answer(text, reply_markup=kb)
+
+
+# ====== Листание списка заметок ======
+@notes_router.callback_query(ListPageCb.filter(F.section == "notes"))
+async def notes_page_handler(
+    callback: types.CallbackQuery,
+    callback_data: ListPageCb,
+    user_id: int,
+    session: AsyncSession,
+):
+    text, kb = await build_notes_list_view(
+        session, user_id, callback_data.dir, callback_data.cursor, callback_data.flt
     )
 
+    try:
+        await callback.message.edit_text(text, reply_markup=kb)
+    except Exception:
+        pass
+    await callback.answer()
+
+
+# ====== Выбор тега ======
+@notes_router.callback_query(F.data == "notes:tags")
+async def cb_notes_tags(callback: types.CallbackQuery, user_id: int, session: AsyncSession):
+    text, kb = await build_tags_view(session, user_id)
+
+    try:
+        await callback.message.edit_text(text, reply_markup=kb)
+    except Exception:
+        pass
+    await callback.answer()
+
 
 # ====== Создание заметки ======
 @notes_router.callback_query(F.data == "notes:add")
@@ -163,7 +309,12 @@ async def new_note_content(message: types.Message, state: FSMContext):
 
 
 @notes_router.message(NewNoteStates.waiting_for_tags)
-async def new_note_tags(message: types.Message, state: FSMContext):
+async def new_note_tags(
+    message: types.Message,
+    state: FSMContext,
+    user_id: int,
+    session: AsyncSession,
+):
     tags_raw = message.text.strip()
     tags: Optional[str] = None if tags_raw == "-" else tags_raw
 
@@ -171,35 +322,19 @@ async def new_note_tags(message: types.Message, state: FSMContext):
     title = data["title"]
     content = data["content"]
 
-    tg_user = message.from_user
-
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            user = User(
-                telegram_id=tg_user.id,
-                first_name=tg_user.first_name,
-                last_name=tg_user.last_name,
-                username=tg_user.username,
-            )
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
-
-        note = Note(
-            user_id=user.id,
-            title=title,
-            content=content,
-            tags=tags,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
-        )
-        session.add(note)
-        await session.commit()
+    note = Note(
+        user_id=user_id,
+        title=title,
+        content=content,
+        tags=tags,
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+    )
+    session.add(note)
+    # id нужен для связей с тегами
+    await session.flush()
+    await set_note_tags(session, user_id, note.id, note.created_at, parse_tags(tags))
+    await session.commit()
 
     await state.clear()
 
@@ -215,47 +350,39 @@ async def new_note_tags(message: types.Message, state: FSMContext):
 async def note_action_handler(
     callback: types.CallbackQuery,
     callback_data: NoteActionCb,
+    user_id: int,
+    session: AsyncSession,
 ):
-    tg_user = callback.from_user
-
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-        if user is None:
-            await callback.answer("Пользователь не найден.", show_alert=True)
-            return
+    # Только ключ и версия: карточка, скорее всего, уже есть в кэше
+    result = await session.execute(
+        select(Note.id, Note.created_at, Note.version)
+        .where(Note.id == callback_data.note_id, Note.user_id == user_id)
+    )
+    row = result.one_or_none()
 
-        result = await session.execute(
-            select(Note).where(Note.id == callback_data.note_id)
-        )
-        note = result.scalar_one_or_none()
-
-        if note is None or note.user_id != user.id:
-            await callback.answer("Эта заметка больше не доступна.", show_alert=True)
-            await callback.message.edit_text("❌ Заметка недоступна.")
-            return
-
-        # Открыть (развернуть)
-        if callback_data.action == "view":
-            await callback.message.edit_text(
-                format_note_full(note),
-                reply_markup=note_inline_kb_expanded(note),
-            )
-            await callback.answer()
+    if row is None:
+        await callback.answer("Эта заметка больше не доступна.", show_alert=True)
+        await callback.message.edit_text("❌ Заметка недоступна.")
+        return
 
-        # Закрыть (свернуть)
-        elif callback_data.action == "close":
-            await callback.message.edit_text(
-                format_note_short(note),
-                reply_markup=note_inline_kb_collapsed(note),
-            )
-            await callback.answer()
-
-        # Удалить
-        elif callback_data.action == "delete":
-            await session.delete(note)
-            await session.commit()
-            await callback.message.edit_text("🗑 Заметка удалена.")
-            await callback.answer("Заметка удалена ✅")
+    # Открыть карточку на месте списка
+    if callback_data.action == "view":
+        text, kb = await build_note_card(session, row.id, row.version)
+        await callback.message.edit_text(text, reply_markup=kb)
+        await callback.answer()
+
+    # Вернуться к списку — страница начинается с этого элемента
+    elif callback_data.action == "close":
+        text, kb = await build_notes_list_view(session, user_id, "from", Cursor.of(row))
+        await callback.message.edit_text(text, reply_markup=kb)
+        await callback.answer()
+
+    # Удалить и вернуться к списку.
+    # Связи с тегами — явно: на ON DELETE CASCADE в SQLite без foreign_keys надеяться нельзя
+    elif callback_data.action == "delete":
+        await session.execute(delete(Note).where(Note.id == row.id))
+        await session.execute(delete(NoteTag).where(NoteTag.note_id == row.id))
+        await session.commit()
+        text, kb = await build_notes_list_view(session, user_id, "from", Cursor.of(row))
+        await callback.message.edit_text(text, reply_markup=kb)
+        await callback.answer("Заметка удалена ✅")
@@ -2,20 +2,24 @@ from __future__ import annotations
 
 from datetime import datetime
 from typing import Optional
+from html import escape
 
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.filters.callback_data import CallbackData
-from sqlalchemy import select
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from app.core.models.task import Task, TaskStatus
 
 from app.bot.keyboards.projects_menu import projects_menu_kb
 from app.bot.keyboards.main_menu import main_menu_kb
 from app.bot.states.project_states import NewProjectStates
-from app.core.db import async_session_maker
-from app.core.models.user import User
+from app.bot.reminders import reminder_engine
+from app.bot.purger import project_purger
+from app.bot.pagination import Cursor, ListPageCb, Page, fetch_page, list_markup
+from app.bot.render_cache import Rendered, render_cache
 from app.core.models.project import Project
 
 projects_router = Router()
@@ -23,20 +27,23 @@ projects_router = Router()
 
 # ====== CallbackData для проектов ======
 class ProjectActionCb(CallbackData, prefix="proj"):
-    action: str   # "view", "close", "delete"
+    action: str   # "view" (открыть), "close" (к списку), "delete"
     project_id: int
 
 
 # ====== Форматирование текста ======
-def format_project_collapsed(project: Project) -> str:
+def format_projects_list(page: Page) -> str:
     """
-    Краткий вид проекта для списка:
-    только название + дата создания.
+    Список проектов: только название + дата создания.
     Описание показываем ТОЛЬКО в раскрытом виде.
     """
-    text = f"📁 <b>{project.name}</b>"
-    text += f"\n📅 Создан: <code>{project.created_at.strftime('%d.%m.%Y %H:%M')}</code>"
-    return text
+    lines = ["📁 <b>Твои проекты</b>", ""]
+    for number, project in enumerate(page.items, start=1):
+        lines.append(
+            f"{number}. {escape(project.name)} — "
+            f"<code>{project.created_at.strftime('%d.%m.%Y')}</code>"
+        )
+    return "\n".join(lines)
 
 
 def format_project_expanded(project: Project) -> str:
@@ -81,12 +88,12 @@ def format_project_expanded(project: Project) -> str:
 
 
 # ====== Клавиатуры ======
-def project_inline_kb_collapsed(project: Project):
-    """Клавиатура для свернутого проекта: Открыть + Удалить."""
+def project_inline_kb_expanded(project: Project):
+    """Клавиатура для раскрытого проекта: К списку + Удалить."""
     builder = InlineKeyboardBuilder()
     builder.button(
-        text="ℹ Открыть",
-        callback_data=ProjectActionCb(action="view", project_id=project.id).pack(),
+        text="⬅️ К списку",
+        callback_data=ProjectActionCb(action="close", project_id=project.id).pack(),
     )
     builder.button(
         text="🗑 Удалить",
@@ -96,71 +103,87 @@ def project_inline_kb_collapsed(project: Project):
     return builder.as_markup()
 
 
-def project_inline_kb_expanded(project: Project):
-    """Клавиатура для раскрытого проекта: Закрыть + Удалить."""
-    builder = InlineKeyboardBuilder()
-    builder.button(
-        text="🔼 Закрыть",
-        callback_data=ProjectActionCb(action="close", project_id=project.id).pack(),
+async def build_project_card(session, project_id: int, version: int) -> Rendered:
+    """
+    Карточка проекта из кэша; при промахе — загрузить с задачами и отрисовать.
+    Изменения задач проекта увеличивают Project.version (bump_versions).
+    """
+    key = ("project", project_id, version, "card")
+    rendered = render_cache.get(key)
+    if rendered is None:
+        # Архивные задачи в карточке не перечисляем
+        project = await session.get(
+            Project,
+            project_id,
+            options=[selectinload(Project.tasks.and_(Task.archived_at.is_(None)))],
+        )
+        rendered = (format_project_expanded(project), project_inline_kb_expanded(project))
+        # Версия могла уйти вперёд между запросами — кладём под загруженную
+        render_cache.put(("project", project_id, project.version, "card"), rendered)
+    return rendered
+
+
+def _projects_list_query(user_id: int):
+    return select(Project).where(Project.user_id == user_id, Project.deleted_at.is_(None))
+
+
+async def build_projects_list_view(
+    session,
+    user_id: int,
+    direction: str = "next",
+    cursor: Optional[Cursor] = None,
+):
+    """Список проектов одним сообщением: текст и клавиатура."""
+    projects_page = await fetch_page(
+        session, _projects_list_query(user_id), Project, direction, cursor
     )
-    builder.button(
-        text="🗑 Удалить",
-        callback_data=ProjectActionCb(action="delete", project_id=project.id).pack(),
+
+    if not projects_page.items:
+        text = (
+            "У тебя пока нет проектов.\n\n"
+            "Нажми <b>«➕ Создать проект»</b>, чтобы создать первый."
+        )
+        return text, projects_menu_kb()
+
+    kb = list_markup(
+        "projects",
+        projects_page,
+        [
+            ProjectActionCb(action="view", project_id=project.id).pack()
+            for project in projects_page.items
+        ],
+        add_text="➕ Создать проект",
+        add_callback="projects:add",
     )
-    builder.adjust(2)
-    return builder.as_markup()
+    return format_projects_list(projects_page), kb
 
 
 # ====== Обработчик кнопки "📁 Проекты" из главного меню ======
 @projects_router.message(F.text == "📁 Проекты")
-async def handle_projects_menu(message: types.Message):
-    tg_user = message.from_user
-
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            user = User(
-                telegram_id=tg_user.id,
-                first_name=tg_user.first_name,
-                last_name=tg_user.last_name,
-                username=tg_user.username,
-            )
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
-
-        result = await session.execute(
-            select(Project)
-            .where(Project.user_id == user.id)
-            .order_by(Project.created_at.desc())
-            .limit(10)
-        )
-        projects = result.scalars().all()
+async def handle_projects_menu(message: types.Message, user_id: int, session: AsyncSession):
+    text, kb = await build_projects_list_view(session, user_id)
 
-    if not projects:
-        await message.answer(
-            "У тебя пока нет проектов.\n\n"
-            "Нажми <b>«➕ Создать проект»</b>, чтобы создать первый.",
-            reply_markup=projects_menu_kb(),
-        )
-        return
+    await message.answer(text, reply_markup=kb)
 
-    await message.answer("Твои последние проекты:")
-    for project in projects:
-        await message.answer(
-            format_project_collapsed(project),
-            reply_markup=project_inline_kb_collapsed(project),
-        )
 
-    await message.answer(
-        "Меню проектов:",
-        reply_markup=projects_menu_kb(),
+# ====== Листание списка проектов ======
+@projects_router.callback_query(ListPageCb.filter(F.section == "projects"))
+async def projects_page_handler(
+    callback: types.CallbackQuery,
+    callback_data: ListPageCb,
+    user_id: int,
+    session: AsyncSession,
+):
+    text, kb = await build_projects_list_view(
+        session, user_id, callback_data.dir, callback_data.cursor
     )
 
+    try:
+        await callback.message.edit_text(text, reply_markup=kb)
+    except Exception:
+        pass
+    await callback.answer()
+
 
 # ====== Создание проекта ======
 @projects_router.callback_query(F.data == "projects:add")
@@ -189,40 +212,26 @@ async def new_project_name(message: types.Message, state: FSMContext):
 
 
 @projects_router.message(NewProjectStates.waiting_for_description)
-async def new_project_description(message: types.Message, state: FSMContext):
+async def new_project_description(
+    message: types.Message,
+    state: FSMContext,
+    user_id: int,
+    session: AsyncSession,
+):
     desc_raw = message.text.strip()
     description: Optional[str] = None if desc_raw == "-" else desc_raw
 
     data = await state.get_data()
     name = data["name"]
 
-    tg_user = message.from_user
-
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            user = User(
-                telegram_id=tg_user.id,
-                first_name=tg_user.first_name,
-                last_name=tg_user.last_name,
-                username=tg_user.username,
-            )
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
-
-        project = Project(
-            user_id=user.id,
-            name=name,
-            description=description,
-            created_at=datetime.utcnow(),
-        )
-        session.add(project)
-        await session.commit()
+    project = Project(
+        user_id=user_id,
+        name=name,
+        description=description,
+        created_at=datetime.utcnow(),
+    )
+    session.add(project)
+    await session.commit()
 
     await state.clear()
 
@@ -238,49 +247,59 @@ async def new_project_description(message: types.Message, state: FSMContext):
 async def project_action_handler(
     callback: types.CallbackQuery,
     callback_data: ProjectActionCb,
+    user_id: int,
+    session: AsyncSession,
 ):
-    tg_user = callback.from_user
+    # Только ключ и версия: карточка, скорее всего, уже есть в кэше
+    result = await session.execute(
+        select(Project.id, Project.created_at, Project.version)
+        .where(Project.id == callback_data.project_id, Project.user_id == user_id)
+        .where(Project.deleted_at.is_(None))
+    )
+    row = result.one_or_none()
 
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-        if user is None:
-            await callback.answer("Пользователь не найден.", show_alert=True)
-            return
-
-        result = await session.execute(
-            select(Project)
-            .options(selectinload(Project.tasks))
-            .where(Project.id == callback_data.project_id)
+    if row is None:
+        await callback.answer("Этот проект больше не доступен.", show_alert=True)
+        await callback.message.edit_text("❌ Проект недоступен.")
+        return
+
+    # Открыть карточку на месте списка
+    if callback_data.action == "view":
+        text, kb = await build_project_card(session, row.id, row.version)
+        await callback.message.edit_text(text, reply_markup=kb)
+        await callback.answer()
+
+    # Вернуться к списку — страница начинается с этого элемента
+    elif callback_data.action == "close":
+        text, kb = await build_projects_list_view(session, user_id, "from", Cursor.of(row))
+        await callback.message.edit_text(text, reply_markup=kb)
+        await callback.answer()
+
+    # Удалить и вернуться к списку.
+    # Проект только помечается удалённым — сразу пропадает из списков,
+    # а задачи с подзадачами и файлами чанками удаляет project_purger
+    elif callback_data.action == "delete":
+        await session.execute(
+            update(Project)
+            .where(Project.id == row.id)
+            .values(deleted_at=datetime.utcnow(), version=Project.version + 1)
         )
-        project = result.scalar_one_or_none()
-
-        if project is None or project.user_id != user.id:
-            await callback.answer("Этот проект больше не доступен.", show_alert=True)
-            await callback.message.edit_text("❌ Проект недоступен.")
-            return
-
-        # Развернуть
-        if callback_data.action == "view":
-            await callback.message.edit_text(
-                format_project_expanded(project),
-                reply_markup=project_inline_kb_expanded(project),
+        # Напоминания есть только у открытых задач с дедлайном — снимаем их сразу
+        reminder_task_ids = (
+            await session.execute(
+                select(Task.id)
+                .where(Task.project_id == row.id)
+                .where(Task.due_at.is_not(None))
+                .where(Task.status != TaskStatus.DONE)
+                .where(Task.archived_at.is_(None))
             )
-            await callback.answer()
+        ).scalars().all()
+        # Очистка идёт в своих сессиях — пометка должна быть уже видна
+        await session.commit()
+        project_purger.kick()
+        for task_id in reminder_task_ids:
+            reminder_engine.unschedule(task_id)
 
-        # Свернуть
-        elif callback_data.action == "close":
-            await callback.message.edit_text(
-                format_project_collapsed(project),
-                reply_markup=project_inline_kb_collapsed(project),
-            )
-            await callback.answer()
-
-        # Удалить
-        elif callback_data.action == "delete":
-            await session.delete(project)
-            await session.commit()
-            await callback.message.edit_text("🗑 Проект удалён.")
-            await callback.answer("Проект удалён ✅")
+        text, kb = await build_projects_list_view(session, user_id, "from", Cursor.of(row))
+        await callback.message.edit_text(text, reply_markup=kb)
+        await callback.answer("Проект удалён ✅")
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import re
+from html import escape, unescape
+
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.bot.pagination import SELECT_ROW_WIDTH
+from app.bot.routers.notes import NoteActionCb
+from app.bot.routers.projects import ProjectActionCb
+from app.bot.routers.tasks import TaskActionCb
+from app.core.services.search import SearchHit, search
+
+search_router = Router()
+
+# Сколько результатов показывать в инлайн-режиме (@bot запрос)
+INLINE_LIMIT = 20
+
+KIND_EMOJI = {
+    "task": "📌",
+    "note": "📝",
+    "project": "📁",
+}
+
+
+def _open_callback(hit: SearchHit) -> str:
+    """Кнопка результата открывает обычную карточку задачи / заметки / проекта."""
+    if hit.kind == "task":
+        return TaskActionCb(action="open", task_id=hit.id).pack()
+    if hit.kind == "note":
+        return NoteActionCb(action="view", note_id=hit.id).pack()
+    return ProjectActionCb(action="view", project_id=hit.id).pack()
+
+
+def _plain(snippet_html: str) -> str:
+    return unescape(re.sub(r"</?b>", "", snippet_html))
+
+
+def format_search_results(query: str, hits: list[SearchHit]) -> str:
+    lines = [f"🔎 <b>Поиск:</b> {escape(query)}", ""]
+    for number, hit in enumerate(hits, start=1):
+        lines.append(f"{number}. {KIND_EMOJI[hit.kind]} <b>{escape(hit.title)}</b>")
+        if hit.snippet.strip():
+            lines.append(f"<i>{hit.snippet}</i>")
+    return "\n".join(lines)
+
+
+def search_results_kb(hits: list[SearchHit]):
+    builder = InlineKeyboardBuilder()
+    for number, hit in enumerate(hits, start=1):
+        builder.button(text=str(number), callback_data=_open_callback(hit))
+    builder.adjust(SELECT_ROW_WIDTH)
+    return builder.as_markup()
+
+
+# ====== /search <слова> ======
+@search_router.message(Command("search"))
+async def cmd_search(
+    message: types.Message,
+    command: CommandObject,
+    user_id: int,
+    session: AsyncSession,
+):
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer(
+            "Напиши, что искать, например: <code>/search отчёт квартал</code>\n\n"
+            "Ищу по задачам, заметкам и проектам."
+        )
+        return
+
+    hits = await search(session, user_id, query)
+    if not hits:
+        await message.answer(f"🔎 По запросу <b>{escape(query)}</b> ничего не нашлось.")
+        return
+
+    await message.answer(
+        format_search_results(query, hits),
+        reply_markup=search_results_kb(hits),
+    )
+
+
+# ====== Инлайн-режим: @bot слова ======
+@search_router.inline_query()
+async def inline_search(
+    inline_query: types.InlineQuery,
+    user_id: int,
+    session: AsyncSession,
+):
+    hits = await search(session, user_id, inline_query.query, limit=INLINE_LIMIT)
+
+    results = [
+        types.InlineQueryResultArticle(
+            id=f"{hit.kind}:{hit.id}",
+            title=f"{KIND_EMOJI[hit.kind]} {hit.title}",
+            description=_plain(hit.snippet) or None,
+            input_message_content=types.InputTextMessageContent(
+                message_text=(
+                    f"{KIND_EMOJI[hit.kind]} <b>{escape(hit.title)}</b>\n\n{hit.snippet}"
+                ).strip(),
+            ),
+        )
+        for hit in hits
+    ]
+    # Результаты у каждого свои — Telegram не должен отдавать их другим
+    await inline_query.answer(results, cache_time=5, is_personal=True)
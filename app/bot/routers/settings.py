@@ -4,11 +4,10 @@ from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.filters.callback_data import CallbackData
-from sqlalchemy import select
-
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.bot.keyboards.main_menu import main_menu_kb
+from app.bot.middlewares import UserSnapshot, user_cache
 from app.bot.states.settings_states import SettingsStates
-from app.core.db import async_session_maker
 from app.core.models.user import User
 
 
@@ -23,7 +22,7 @@ class SettingsCb(CallbackData, prefix="settings"):
     action: str
 
 
-def _build_settings_text(user: User) -> str:
+def _build_settings_text(user: User | UserSnapshot) -> str:
     digest_status = "включён ✅" if user.reminders_enabled else "выключен ❌"
     deadline_enabled = getattr(user, "deadline_reminders_enabled", True)
     deadlines_status = "включены ✅" if deadline_enabled else "выключены ❌"
@@ -40,7 +39,7 @@ def _build_settings_text(user: User) -> str:
     )
 
 
-def _build_settings_kb(user: User):
+def _build_settings_kb(user: User | UserSnapshot):
     builder = InlineKeyboardBuilder()
 
     # Переключатель ежедневного дайджеста
@@ -80,28 +79,10 @@ def _build_settings_kb(user: User):
 
 # ====== Обработчик кнопки "⚙️ Настройки" из главного меню ======
 @settings_router.message(F.text == "⚙️ Настройки")
-async def handle_settings_menu(message: types.Message):
-    tg_user = message.from_user
-
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            user = User(
-                telegram_id=tg_user.id,
-                first_name=tg_user.first_name,
-                last_name=tg_user.last_name,
-                username=tg_user.username,
-            )
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
-
-        text = _build_settings_text(user)
-        kb = _build_settings_kb(user)
+async def handle_settings_menu(message: types.Message, user_settings: UserSnapshot):
+    # Снимок настроек уже загружен UserMiddleware — в БД не ходим
+    text = _build_settings_text(user_settings)
+    kb = _build_settings_kb(user_settings)
 
     await message.answer(text, reply_markup=kb)
 
@@ -112,58 +93,63 @@ async def settings_action_handler(
     callback: types.CallbackQuery,
     callback_data: SettingsCb,
     state: FSMContext,
+    user_id: int,
+    session: AsyncSession,
 ):
     tg_user = callback.from_user
 
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
+    user = await session.get(User, user_id)
 
-        if user is None:
-            await callback.answer("Пользователь не найден.", show_alert=True)
-            return
+    if user is None:
+        await callback.answer("Пользователь не найден.", show_alert=True)
+        return
 
-        # Переключить ежедневный дайджест
-        if callback_data.action == "toggle_digest":
-            user.reminders_enabled = not user.reminders_enabled
-            await session.commit()
-            await session.refresh(user)
+    # Переключить ежедневный дайджест
+    if callback_data.action == "toggle_digest":
+        user.reminders_enabled = not user.reminders_enabled
+        # Кэш сбрасываем только после коммита, иначе параллельный апдейт
+        # успеет закэшировать старые настройки
+        await session.commit()
+        user_cache.invalidate(tg_user.id)
 
-            text = _build_settings_text(user)
-            kb = _build_settings_kb(user)
+        text = _build_settings_text(user)
+        kb = _build_settings_kb(user)
 
-            await callback.message.edit_text(text, reply_markup=kb)
-            await callback.answer("Настройки дайджеста обновлены ✅")
+        await callback.message.edit_text(text, reply_markup=kb)
+        await callback.answer("Настройки дайджеста обновлены ✅")
 
-        # Переключить напоминания по дедлайнам
-        elif callback_data.action == "toggle_deadlines":
-            current = getattr(user, "deadline_reminders_enabled", True)
-            user.deadline_reminders_enabled = not current
-            await session.commit()
-            await session.refresh(user)
+    # Переключить напоминания по дедлайнам
+    elif callback_data.action == "toggle_deadlines":
+        current = getattr(user, "deadline_reminders_enabled", True)
+        user.deadline_reminders_enabled = not current
+        await session.commit()
+        user_cache.invalidate(tg_user.id)
 
-            text = _build_settings_text(user)
-            kb = _build_settings_kb(user)
+        text = _build_settings_text(user)
+        kb = _build_settings_kb(user)
 
-            await callback.message.edit_text(text, reply_markup=kb)
-            await callback.answer("Настройки напоминаний о дедлайнах обновлены ✅")
+        await callback.message.edit_text(text, reply_markup=kb)
+        await callback.answer("Настройки напоминаний о дедлайнах обновлены ✅")
 
-        # Изменить время дайджеста
-        elif callback_data.action == "change_time":
-            await state.set_state(SettingsStates.waiting_for_reminder_time)
-            await callback.message.answer(
-                "Введи время напоминания в формате <code>ЧЧ:ММ</code>\n"
-                "Например: <b>09:00</b> или <b>18:30</b>.",
-                reply_markup=main_menu_kb(),
-            )
-            await callback.answer()
+    # Изменить время дайджеста
+    elif callback_data.action == "change_time":
+        await state.set_state(SettingsStates.waiting_for_reminder_time)
+        await callback.message.answer(
+            "Введи время напоминания в формате <code>ЧЧ:ММ</code>\n"
+            "Например: <b>09:00</b> или <b>18:30</b>.",
+            reply_markup=main_menu_kb(),
+        )
+        await callback.answer()
 
 
 # ====== Ввод времени напоминаний ======
 @settings_router.message(SettingsStates.waiting_for_reminder_time)
-async def set_reminder_time(message: types.Message, state: FSMContext):
+async def set_reminder_time(
+    message: types.Message,
+    state: FSMContext,
+    user_id: int,
+    session: AsyncSession,
+):
     tg_user = message.from_user
     raw = message.text.strip()
 
@@ -186,33 +172,18 @@ async def set_reminder_time(message: types.Message, state: FSMContext):
         )
         return
 
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            user = User(
-                telegram_id=tg_user.id,
-                first_name=tg_user.first_name,
-                last_name=tg_user.last_name,
-                username=tg_user.username,
-            )
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
-
-        user.reminder_hour = hour
-        user.reminder_minute = minute
-        user.reminders_enabled = True
-        user.last_digest_date = None
+    user = await session.get(User, user_id)
 
-        await session.commit()
-        await session.refresh(user)
+    user.reminder_hour = hour
+    user.reminder_minute = minute
+    user.reminders_enabled = True
+    user.last_digest_date = None
 
-        text = _build_settings_text(user)
-        kb = _build_settings_kb(user)
+    await session.commit()
+    user_cache.invalidate(tg_user.id)
+
+    text = _build_settings_text(user)
+    kb = _build_settings_kb(user)
 
     await state.clear()
     await message.answer(
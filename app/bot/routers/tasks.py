@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from datetime import datetime, date
+from dataclasses import dataclass
+from datetime import datetime, date, timedelta
 from typing import Optional
 from html import escape
 
@@ -8,15 +9,20 @@ from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.filters.callback_data import CallbackData
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from sqlalchemy import Select, case, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, load_only
 
-from app.bot.keyboards.tasks_menu import tasks_menu_kb
+from app.bot.keyboards.tasks_menu import task_filters_kb, tasks_menu_kb
 from app.bot.keyboards.main_menu import main_menu_kb
 from app.bot.states.task_states import NewTaskStates, TaskFileStates, SubTaskStates
-from app.core.db import async_session_maker
-from app.core.models.user import User
-from app.core.models.task import Task, TaskStatus
+from app.bot.reminders import reminder_engine
+from app.bot.pagination import Cursor, ListPageCb, Page, fetch_page, list_markup
+from app.bot.render_cache import Rendered, render_cache
+from app.core.services.subtasks import add_subtask, delete_subtask, toggle_subtask
+from app.core.services.versions import bump_versions
+from app.core.models.task import Task, TaskStatus, not_in_deleted_project
 from app.core.models.project import Project
 from app.core.models.task_file import TaskFile
 from app.core.models.subtask import SubTask
@@ -34,13 +40,29 @@ class TaskActionCb(CallbackData, prefix="task"):
     #  - "subtasks"     — открыть список подзадач
     #  - "add_subtask"  — добавить новую подзадачу
     #  - "back_to_task" — вернуться к карточке задачи
+    #  - "open"         — открыть карточку из списка
+    #  - "list"         — вернуться к списку задач
     action: str
     task_id: int
+    # фильтр списка, из которого открыта карточка (ListPageCb.flt):
+    # «к списку» и удаление возвращают в тот же отфильтрованный список
+    flt: str = ""
+
+    @classmethod
+    def unpack(cls, value: str) -> "TaskActionCb":
+        # Кнопки карточек, отправленных до появления flt, — без последнего поля
+        if value.count(cls.__separator__) == 2:
+            value += cls.__separator__
+        return super().unpack(value)
 
 
 class TaskFileCb(CallbackData, prefix="tfile"):
     action: str   # "download" | "delete"
     file_id: int
+    # окно списка, из которого нажата кнопка (см. ChildWindowCb)
+    ts: int = 0
+    anchor: int = 0
+    pos: int = 0
 
 
 class SubTaskCb(CallbackData, prefix="subt"):
@@ -48,6 +70,25 @@ class SubTaskCb(CallbackData, prefix="subt"):
     # "delete" — удалить подзадачу
     action: str
     subtask_id: int
+    # окно списка, из которого нажата кнопка (см. ChildWindowCb)
+    ts: int = 0
+    anchor: int = 0
+    pos: int = 0
+
+
+# ====== Листание подзадач и файлов внутри карточки задачи ======
+class ChildWindowCb(CallbackData, prefix="tw"):
+    kind: str     # "s" — подзадачи, "f" — файлы
+    task_id: int
+    dir: str      # "next" | "prev"
+    ts: int       # курсор (created_at, id) — как в ListPageCb
+    id: int
+    pos: int      # номер первой строки окна, с нуля
+
+
+# Сколько подзадач/файлов показывать за раз: по две кнопки на строку,
+# так клавиатура остаётся компактной при любом числе дочерних строк
+CHILD_WINDOW = 8
 
 
 # ====== CallbackData для выбора проекта при создании задачи ======
@@ -55,6 +96,101 @@ class TaskProjectCb(CallbackData, prefix="tproj"):
     project_id: int  # 0 - без проекта
 
 
+STATUS_EMOJI = {
+    TaskStatus.TODO: "🟡",
+    TaskStatus.IN_PROGRESS: "🟠",
+    TaskStatus.DONE: "🟢",
+}
+
+
+# ====== Фильтры списка задач ======
+# Значение ListPageCb.flt -> статус; "p<id>" — задачи проекта;
+# overdue / today / week — незакрытые задачи по сроку, ближайшие первыми;
+# arch — архив (задачи, закрытые дольше ARCHIVE_AFTER_DAYS дней)
+STATUS_FILTERS = {
+    "todo": TaskStatus.TODO,
+    "prog": TaskStatus.IN_PROGRESS,
+    "done": TaskStatus.DONE,
+}
+STATUS_TITLES = {
+    TaskStatus.TODO: "🟡 <b>Задачи: ToDo</b>",
+    TaskStatus.IN_PROGRESS: "🟠 <b>Задачи: в работе</b>",
+    TaskStatus.DONE: "🟢 <b>Задачи: готово</b>",
+}
+DEADLINE_FILTERS = ("overdue", "today", "week")
+OPEN_STATUSES = (TaskStatus.TODO, TaskStatus.IN_PROGRESS)
+# Сколько проектов предлагать в фильтре «По проекту»
+FILTER_PROJECTS_LIMIT = 30
+
+
+@dataclass(frozen=True)
+class TaskListFilter:
+    title: str
+    stmt: Select
+    # None — обычный порядок (created_at, id), новые первыми
+    key: Optional[tuple] = None
+    newest_first: bool = True
+
+
+async def resolve_task_filter(
+    session, user_id: int, flt: str, now: datetime
+) -> Optional[TaskListFilter]:
+    """
+    Запрос для фильтра списка задач; None — фильтр неизвестен или чужой.
+
+    У каждого фильтра свой индекс: сроки — (user_id, status, due_at),
+    статус — (user_id, status, created_at), проект — (user_id, project_id,
+    created_at), архив — (user_id, archived_at). Читаются только подходящие
+    задачи, а не все задачи пользователя; все фильтры, кроме архива, —
+    только по живым задачам.
+    """
+    if flt == "arch":
+        return TaskListFilter(
+            "🗄 <b>Архив задач</b>",
+            select(Task)
+            .where(Task.user_id == user_id, Task.archived_at.is_not(None))
+            .where(not_in_deleted_project()),
+            key=(Task.archived_at, Task.id),
+        )
+
+    base = _tasks_list_query(user_id)
+
+    if flt in STATUS_FILTERS:
+        status = STATUS_FILTERS[flt]
+        return TaskListFilter(STATUS_TITLES[status], base.where(Task.status == status))
+
+    if flt.startswith("p") and flt[1:].isdigit():
+        project_name = (
+            await session.execute(
+                select(Project.name).where(
+                    Project.id == int(flt[1:]),
+                    Project.user_id == user_id,
+                    Project.deleted_at.is_(None),
+                )
+            )
+        ).scalar_one_or_none()
+        if project_name is None:
+            return None
+        return TaskListFilter(
+            f"📁 <b>Задачи проекта «{escape(project_name)}»</b>",
+            base.where(Task.project_id == int(flt[1:])),
+        )
+
+    today = datetime(now.year, now.month, now.day)
+    deadlines = {
+        "overdue": ("🔥 <b>Просроченные задачи</b>", None, now),
+        "today": ("📅 <b>Задачи на сегодня</b>", today, today + timedelta(days=1)),
+        "week": ("🗓 <b>Задачи на неделю</b>", today, today + timedelta(days=7)),
+    }
+    if flt not in DEADLINE_FILTERS:
+        return None
+
+    title, start, end = deadlines[flt]
+    stmt = base.where(Task.status.in_(OPEN_STATUSES), Task.due_at < end)
+    stmt = stmt.where(Task.due_at >= start) if start else stmt.where(Task.due_at.is_not(None))
+    return TaskListFilter(title, stmt, key=(Task.due_at, Task.id), newest_first=False)
+
+
 # ====== Вспомогательные функции ======
 def format_task_text(task: Task) -> str:
     status_map = {
@@ -82,13 +218,14 @@ def format_task_text(task: Task) -> str:
     if getattr(task, "due_at", None):
         lines.append(f"Дедлайн: <code>{task.due_at.strftime('%d.%m.%Y')}</code>")
 
-    # Прогресс по подзадачам
-    if hasattr(task, "subtasks"):
-        subs = task.subtasks or []
-        if subs:
-            done = sum(1 for s in subs if s.is_done)
-            total = len(subs)
-            lines.append(f"Подзадачи: <b>{done}/{total}</b> выполнено")
+    if task.archived_at:
+        lines.append(f"🗄 В архиве с <code>{task.archived_at.strftime('%d.%m.%Y')}</code>")
+
+    # Прогресс по подзадачам — из счётчиков, без чтения subtasks
+    if task.subtasks_total:
+        lines.append(
+            f"Подзадачи: <b>{task.subtasks_done}/{task.subtasks_total}</b> выполнено"
+        )
 
     # Описание
     if getattr(task, "description", None):
@@ -98,15 +235,16 @@ def format_task_text(task: Task) -> str:
     return "\n".join(lines)
 
 
-def task_inline_kb(task: Task):
+def task_inline_kb(task: Task, flt: str = ""):
     builder = InlineKeyboardBuilder()
 
-    # Кнопка смены статуса
+    # Кнопка смены статуса (карточка перерисуется с тем же фильтром)
     builder.button(
         text="🔄 Статус",
         callback_data=TaskActionCb(
             action="cycle",
             task_id=task.id,
+            flt=flt,
         ).pack(),
     )
 
@@ -116,6 +254,7 @@ def task_inline_kb(task: Task):
         callback_data=TaskActionCb(
             action="delete",
             task_id=task.id,
+            flt=flt,
         ).pack(),
     )
 
@@ -137,10 +276,121 @@ def task_inline_kb(task: Task):
         ).pack(),
     )
 
-    # две кнопки в первой строке, две во второй
-    builder.adjust(2, 2)
+    # возврат к списку задач
+    builder.button(
+        text="⬅️ К списку",
+        callback_data=TaskActionCb(
+            action="list",
+            task_id=task.id,
+            flt=flt,
+        ).pack(),
+    )
+
+    # две кнопки в первой строке, две во второй, «к списку» — отдельно
+    builder.adjust(2, 2, 1)
     return builder.as_markup()
 
+
+def format_tasks_list(page: Page, title: str = "📋 <b>Твои задачи</b>") -> str:
+    lines = [title, ""]
+    for number, task in enumerate(page.items, start=1):
+        line = f"{number}. {STATUS_EMOJI.get(task.status, '⚪')} {escape(task.title)}"
+        if task.due_at:
+            line += f" — до <code>{task.due_at.strftime('%d.%m.%Y')}</code>"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _tasks_list_query(user_id: int):
+    # Архивные задачи — только в «🗄 Архив»; задачи удалённых проектов ждут очистки
+    return (
+        select(Task)
+        .where(Task.user_id == user_id, Task.archived_at.is_(None))
+        .where(not_in_deleted_project())
+    )
+
+
+async def build_tasks_list_view(
+    session,
+    user_id: int,
+    direction: str = "next",
+    cursor: Optional[Cursor] = None,
+    flt: str = "",
+):
+    """Список задач одним сообщением: текст и клавиатура."""
+    if flt:
+        return await build_filtered_tasks_view(session, user_id, flt, direction, cursor)
+
+    tasks_page = await fetch_page(
+        session, _tasks_list_query(user_id), Task, direction, cursor
+    )
+
+    if not tasks_page.items:
+        text = (
+            "У тебя пока нет задач.\n\n"
+            "Нажми <b>«➕ Добавить задачу»</b>, чтобы создать первую."
+        )
+        return text, tasks_menu_kb()
+
+    kb = list_markup(
+        "tasks",
+        tasks_page,
+        [TaskActionCb(action="open", task_id=task.id).pack() for task in tasks_page.items],
+        add_text="➕ Добавить задачу",
+        add_callback="tasks:add",
+        extra_row=[InlineKeyboardButton(text="🔎 Фильтры", callback_data="tasks:filters")],
+    )
+    return format_tasks_list(tasks_page), kb
+
+
+async def build_filtered_tasks_view(
+    session,
+    user_id: int,
+    flt: str,
+    direction: str = "next",
+    cursor: Optional[Cursor] = None,
+):
+    """Отфильтрованный список задач (статус, проект или срок)."""
+    task_filter = await resolve_task_filter(session, user_id, flt, datetime.now())
+
+    tasks_page = Page(items=[], has_prev=False, has_next=False)
+    if task_filter is not None:
+        tasks_page = await fetch_page(
+            session,
+            task_filter.stmt,
+            Task,
+            direction,
+            cursor,
+            newest_first=task_filter.newest_first,
+            key=task_filter.key,
+        )
+
+    back_row = [
+        InlineKeyboardButton(text="🔎 Фильтры", callback_data="tasks:filters"),
+        InlineKeyboardButton(
+            text="📋 Все задачи", callback_data=ListPageCb(section="tasks").pack()
+        ),
+    ]
+    if not tasks_page.items:
+        return (
+            "Задач по этому фильтру нет.",
+            InlineKeyboardMarkup(inline_keyboard=[back_row]),
+        )
+
+    kb = list_markup(
+        "tasks",
+        tasks_page,
+        [
+            TaskActionCb(action="open", task_id=task.id, flt=flt).pack()
+            for task in tasks_page.items
+        ],
+        add_text="➕ Добавить задачу",
+        add_callback="tasks:add",
+        flt=flt,
+        extra_row=back_row,
+    )
+    return format_tasks_list(tasks_page, task_filter.title), kb
+
 def cancel_only_kb() -> types.ReplyKeyboardMarkup:
     return types.ReplyKeyboardMarkup(
         keyboard=[[types.KeyboardButton(text="❌ Отмена")]],
@@ -148,24 +398,90 @@ def cancel_only_kb() -> types.ReplyKeyboardMarkup:
         one_time_keyboard=False,
     )
 
-async def build_subtasks_view(session, task: Task):
-    result = await session.execute(
-        select(SubTask)
-        .where(SubTask.task_id == task.id)
-        .order_by(SubTask.created_at)
+async def _load_child_window(session, model, task_id: int, direction, cursor, pos):
+    """Окно дочерних строк задачи (старые сверху) и номер его первой строки."""
+    window = await fetch_page(
+        session,
+        select(model).where(model.task_id == task_id),
+        model,
+        direction,
+        cursor,
+        page_size=CHILD_WINDOW,
+        newest_first=False,
     )
-    subtasks = result.scalars().all()
+    if not window.has_prev:
+        pos = 0
+    return window, pos
+
+
+def _child_nav_row(kind: str, task_id: int, window: Page, pos: int):
+    buttons = []
+    if window.has_prev:
+        first = Cursor.of(window.items[0])
+        buttons.append(types.InlineKeyboardButton(
+            text="◀️ Назад",
+            callback_data=ChildWindowCb(
+                kind=kind, task_id=task_id, dir="prev",
+                ts=first.ts, id=first.id, pos=max(pos - CHILD_WINDOW, 0),
+            ).pack(),
+        ))
+    if window.has_next:
+        last = Cursor.of(window.items[-1])
+        buttons.append(types.InlineKeyboardButton(
+            text="Вперёд ▶️",
+            callback_data=ChildWindowCb(
+                kind=kind, task_id=task_id, dir="next",
+                ts=last.ts, id=last.id, pos=pos + len(window.items),
+            ).pack(),
+        ))
+    return buttons
+
+
+def _window_range(pos: int, window: Page) -> str:
+    if not window.has_prev and not window.has_next:
+        return ""
+    return f" · показаны {pos + 1}–{pos + len(window.items)}"
+
+
+async def build_subtasks_view(
+    session,
+    task: Task,
+    direction: str = "next",
+    cursor: Optional[Cursor] = None,
+    pos: Optional[int] = 0,
+):
+    """
+    Окно подзадач: COUNT для заголовка и только видимые строки.
+    pos=None — окно заканчивается курсором (только что добавленная подзадача).
+    """
+    total, done = (await session.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(case((SubTask.is_done, 1), else_=0)), 0),
+        ).where(SubTask.task_id == task.id)
+    )).one()
+
+    from_end = pos is None
+    window, pos = await _load_child_window(
+        session, SubTask, task.id, direction, cursor, pos or 0
+    )
+    if from_end and window.has_prev:
+        pos = total - len(window.items)
 
     lines = [
         f"☑️ <b>Подзадачи для задачи:</b>\n<b>{escape(task.title)}</b>",
         "",
     ]
 
-    if not subtasks:
+    if not window.items:
         lines.append("Пока нет подзадач.\n")
         lines.append("Нажми «➕ Добавить подзадачу» или отправь текст новой подзадачи.")
     else:
-        for idx, s in enumerate(subtasks, start=1):
+        lines.append(
+            f"Выполнено: <b>{done}/{total}</b>{_window_range(pos, window)}"
+        )
+        lines.append("")
+        for idx, s in enumerate(window.items, start=pos + 1):
             status = "✅" if s.is_done else "⬜️"
             lines.append(f"{idx}. {status} {escape(s.title)}")
 
@@ -173,64 +489,79 @@ async def build_subtasks_view(session, task: Task):
 
     builder = InlineKeyboardBuilder()
 
-    # Кнопки для существующих подзадач
-    for s in subtasks:
+    # Кнопки только для видимых подзадач; окно запоминаем в callback,
+    # чтобы после переключения/удаления перерисовать то же окно
+    anchor = Cursor.of(window.items[0]) if window.items else None
+    for s in window.items:
         status = "✅" if s.is_done else "⬜️"
         short = s.title
         if len(short) > 20:
             short = short[:17] + "..."
 
-        builder.button(
-            text=f"{status} {short}",
-            callback_data=SubTaskCb(
-                action="toggle",
-                subtask_id=s.id,
-            ).pack(),
-        )
-        builder.button(
-            text="🗑",
-            callback_data=SubTaskCb(
-                action="delete",
-                subtask_id=s.id,
-            ).pack(),
+        builder.row(
+            types.InlineKeyboardButton(
+                text=f"{status} {short}",
+                callback_data=SubTaskCb(
+                    action="toggle",
+                    subtask_id=s.id,
+                    ts=anchor.ts,
+                    anchor=anchor.id,
+                    pos=pos,
+                ).pack(),
+            ),
+            types.InlineKeyboardButton(
+                text="🗑",
+                callback_data=SubTaskCb(
+                    action="delete",
+                    subtask_id=s.id,
+                    ts=anchor.ts,
+                    anchor=anchor.id,
+                    pos=pos,
+                ).pack(),
+            ),
         )
 
+    nav = _child_nav_row("s", task.id, window, pos)
+    if nav:
+        builder.row(*nav)
+
     # Кнопка добавления новой подзадачи
-    builder.button(
+    builder.row(types.InlineKeyboardButton(
         text="➕ Добавить подзадачу",
         callback_data=TaskActionCb(
             action="add_subtask",
             task_id=task.id,
         ).pack(),
-    )
+    ))
 
     # Кнопка "Назад к задаче"
-    builder.button(
+    builder.row(types.InlineKeyboardButton(
         text="⬅️ Назад к задаче",
         callback_data=TaskActionCb(
             action="back_to_task",
             task_id=task.id,
         ).pack(),
-    )
-
-    if subtasks:
-        # подзадачи идут парами (toggle/delete), потом "добавить", потом "назад"
-        builder.adjust(2, 1, 1)
-    else:
-        # только "добавить" и "назад"
-        builder.adjust(1, 1)
+    ))
 
     return text, builder.as_markup()
 
-async def build_task_files_view(session, task_id: int):
-    result = await session.execute(
-        select(TaskFile)
-        .where(TaskFile.task_id == task_id)
-        .order_by(TaskFile.created_at)
+
+async def build_task_files_view(
+    session,
+    task_id: int,
+    direction: str = "next",
+    cursor: Optional[Cursor] = None,
+    pos: Optional[int] = 0,
+):
+    """
+    Окно файлов задачи: COUNT для заголовка и только видимые строки.
+    pos=None — окно заканчивается курсором (только что прикреплённый файл).
+    """
+    total = await session.scalar(
+        select(func.count()).where(TaskFile.task_id == task_id)
     )
-    files = result.scalars().all()
 
-    if not files:
+    if not total:
         text = (
             "📎 <b>Файлы задачи</b>\n\n"
             "У этой задачи пока нет прикреплённых файлов.\n\n"
@@ -248,99 +579,128 @@ async def build_task_files_view(session, task_id: int):
         builder.adjust(1)
         return text, builder.as_markup()
 
-    lines = ["📎 <b>Файлы задачи</b>\n"]
-    for idx, f in enumerate(files, start=1):
-        lines.append(f"{idx}. {f.file_name}")
+    from_end = pos is None
+    window, pos = await _load_child_window(
+        session, TaskFile, task_id, direction, cursor, pos or 0
+    )
+    if from_end and window.has_prev:
+        pos = total - len(window.items)
+
+    lines = [f"📎 <b>Файлы задачи</b> ({total}){_window_range(pos, window)}\n"]
+    for idx, f in enumerate(window.items, start=pos + 1):
+        lines.append(f"{idx}. {escape(f.file_name)}")
     text = "\n".join(lines)
 
     builder = InlineKeyboardBuilder()
-    for f in files:
+    anchor = Cursor.of(window.items[0])
+    for f in window.items:
         short = f.file_name
         if len(short) > 20:
             short = short[:17] + "..."
-        builder.button(
-            text=f"📥 {short}",
-            callback_data=TaskFileCb(
-                action="download",
-                file_id=f.id,
-            ).pack(),
-        )
-        builder.button(
-            text=f"🗑 {short}",
-            callback_data=TaskFileCb(
-                action="delete",
-                file_id=f.id,
-            ).pack(),
+        builder.row(
+            types.InlineKeyboardButton(
+                text=f"📥 {short}",
+                callback_data=TaskFileCb(
+                    action="download",
+                    file_id=f.id,
+                ).pack(),
+            ),
+            types.InlineKeyboardButton(
+                text=f"🗑 {short}",
+                callback_data=TaskFileCb(
+                    action="delete",
+                    file_id=f.id,
+                    ts=anchor.ts,
+                    anchor=anchor.id,
+                    pos=pos,
+                ).pack(),
+            ),
         )
 
-    builder.button(
+    nav = _child_nav_row("f", task_id, window, pos)
+    if nav:
+        builder.row(*nav)
+
+    builder.row(types.InlineKeyboardButton(
         text="📎 Прикрепить файл",
         callback_data=TaskActionCb(
             action="attach",
             task_id=task_id,
         ).pack(),
-    )
+    ))
 
-    builder.adjust(2, 1)
     return text, builder.as_markup()
 
 # ====== Кнопка "📋 Задачи" из главного меню ======
 @tasks_router.message(F.text == "📋 Задачи")
-async def handle_tasks_menu(message: types.Message):
-    tg_user = message.from_user
+async def handle_tasks_menu(message: types.Message, user_id: int, session: AsyncSession):
+    text, kb = await build_tasks_list_view(session, user_id)
 
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            user = User(
-                telegram_id=tg_user.id,
-                first_name=tg_user.first_name,
-                last_name=tg_user.last_name,
-                username=tg_user.username,
-            )
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
+    await message.answer(text, reply_markup=kb)
 
-        result = await session.execute(
-            select(Task)
-            .options(
-                selectinload(Task.project),
-                selectinload(Task.subtasks),
-            )
-            .where(Task.user_id == user.id)
-            .order_by(Task.created_at.desc())
-            .limit(10)
-        )
-        tasks = result.scalars().all()
 
-    if not tasks:
-        text = (
-            "У тебя пока нет задач.\n\n"
-            "Нажми <b>«➕ Добавить задачу»</b>, чтобы создать первую."
-        )
-        await message.answer(
-            text,
-            reply_markup=tasks_menu_kb(),
-        )
-        return
+# ====== Листание списка задач ======
+@tasks_router.callback_query(ListPageCb.filter(F.section == "tasks"))
+async def tasks_page_handler(
+    callback: types.CallbackQuery,
+    callback_data: ListPageCb,
+    user_id: int,
+    session: AsyncSession,
+):
+    text, kb = await build_tasks_list_view(
+        session, user_id, callback_data.dir, callback_data.cursor, callback_data.flt
+    )
 
-    await message.answer("Твои последние задачи:")
+    try:
+        await callback.message.edit_text(text, reply_markup=kb)
+    except Exception:
+        # "message is not modified" — просто игнорируем
+        pass
+    await callback.answer()
 
-    for task in tasks:
-        await message.answer(
-            format_task_text(task),
-            reply_markup=task_inline_kb(task),
+
+# ====== Фильтры списка задач ======
+@tasks_router.callback_query(F.data == "tasks:filters")
+async def cb_task_filters(callback: types.CallbackQuery):
+    try:
+        await callback.message.edit_text(
+            "🔎 <b>Какие задачи показать?</b>",
+            reply_markup=task_filters_kb(),
         )
+    except Exception:
+        pass
+    await callback.answer()
 
-    await message.answer(
-        "Меню задач:",
-        reply_markup=tasks_menu_kb(),
+
+@tasks_router.callback_query(F.data == "tasks:filter_projects")
+async def cb_task_filter_projects(
+    callback: types.CallbackQuery,
+    user_id: int,
+    session: AsyncSession,
+):
+    result = await session.execute(
+        select(Project.id, Project.name)
+        .where(Project.user_id == user_id, Project.deleted_at.is_(None))
+        .order_by(Project.created_at.desc())
+        .limit(FILTER_PROJECTS_LIMIT)
     )
+    projects = result.all()
+
+    builder = InlineKeyboardBuilder()
+    for project_id, name in projects:
+        builder.button(
+            text=f"📁 {name}",
+            callback_data=ListPageCb(section="tasks", flt=f"p{project_id}").pack(),
+        )
+    builder.adjust(2)
+    builder.row(InlineKeyboardButton(text="⬅️ К фильтрам", callback_data="tasks:filters"))
+
+    text = "📁 <b>Выбери проект</b>" if projects else "У тебя пока нет проектов."
+    try:
+        await callback.message.edit_text(text, reply_markup=builder.as_markup())
+    except Exception:
+        pass
+    await callback.answer()
 
 
 # ====== Создание задачи ======
@@ -370,39 +730,25 @@ async def new_task_title(message: types.Message, state: FSMContext):
 
 
 @tasks_router.message(NewTaskStates.waiting_for_description)
-async def new_task_description(message: types.Message, state: FSMContext):
+async def new_task_description(
+    message: types.Message,
+    state: FSMContext,
+    user_id: int,
+    session: AsyncSession,
+):
     desc_raw = message.text.strip()
     description: Optional[str] = None if desc_raw == "-" else desc_raw
 
     await state.update_data(description=description)
 
-    tg_user = message.from_user
-
     # Проверяем, есть ли у пользователя проекты
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            user = User(
-                telegram_id=tg_user.id,
-                first_name=tg_user.first_name,
-                last_name=tg_user.last_name,
-                username=tg_user.username,
-            )
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
-
-        result = await session.execute(
-            select(Project)
-            .where(Project.user_id == user.id)
-            .order_by(Project.created_at.desc())
-            .limit(10)
-        )
-        projects = result.scalars().all()
+    result = await session.execute(
+        select(Project)
+        .where(Project.user_id == user_id, Project.deleted_at.is_(None))
+        .order_by(Project.created_at.desc())
+        .limit(10)
+    )
+    projects = result.scalars().all()
 
     # Если проектов нет — пропускаем шаг выбора и сразу спрашиваем дедлайн
     if not projects:
@@ -458,7 +804,12 @@ async def choose_task_project(
 
 # ====== Дедлайн ======
 @tasks_router.message(NewTaskStates.waiting_for_due_date)
-async def new_task_due_date(message: types.Message, state: FSMContext):
+async def new_task_due_date(
+    message: types.Message,
+    state: FSMContext,
+    user_id: int,
+    session: AsyncSession,
+):
     due_raw = message.text.strip()
 
     due_at: Optional[datetime] = None
@@ -493,35 +844,22 @@ async def new_task_due_date(message: types.Message, state: FSMContext):
     description = data["description"]
     project_id: Optional[int] = data.get("project_id")
 
-    tg_user = message.from_user
+    task = Task(
+        user_id=user_id,
+        project_id=project_id,
+        title=title,
+        description=description,
+        status=TaskStatus.TODO,
+        due_at=due_at,
+    )
+    session.add(task)
+    await session.flush()
+    # Задача появится в карточке проекта
+    await bump_versions(session, Project, [project_id])
+    # Фиксируем до ответа и до планирования напоминаний
+    await session.commit()
 
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            user = User(
-                telegram_id=tg_user.id,
-                first_name=tg_user.first_name,
-                last_name=tg_user.last_name,
-                username=tg_user.username,
-            )
-            session.add(user)
-            await session.commit()
-            await session.refresh(user)
-
-        task = Task(
-            user_id=user.id,
-            project_id=project_id,
-            title=title,
-            description=description,
-            status=TaskStatus.TODO,
-            due_at=due_at,
-        )
-        session.add(task)
-        await session.commit()
+    reminder_engine.schedule(task.id, task.due_at)
 
     await state.clear()
 
@@ -532,120 +870,213 @@ async def new_task_due_date(message: types.Message, state: FSMContext):
     )
 
 
-# ====== Обработка инлайн-кнопок "🔁 Статус" и "🗑 Удалить" ======
+# ====== Что загружать для каждого действия над задачей ======
+# Владелец проверяется прямо в WHERE, а грузится только то, что нужно действию:
+#  - смене статуса — задача целиком и проект одним JOIN'ом;
+#  - открытию карточки — только версия (карточка берётся из render_cache);
+#  - списку подзадач — заголовок; возврату к списку — курсор по ключу фильтра;
+#  - файлам, прикреплению и добавлению подзадачи — только факт владения.
+# "delete" ничего не грузит: DELETE ... WHERE id AND user_id RETURNING и DELETE детей.
+TASK_ACTION_LOAD_PLANS = {
+    "cycle": (joinedload(Task.project),),
+    "open": (load_only(Task.id, Task.version),),
+    "back_to_task": (load_only(Task.id, Task.version),),
+    "subtasks": (load_only(Task.id, Task.title),),
+    "list": (load_only(Task.id, Task.created_at, Task.due_at, Task.archived_at),),
+    "files": (load_only(Task.id),),
+    "attach": (load_only(Task.id),),
+    "add_subtask": (load_only(Task.id),),
+}
+
+
+def _render_task_card(task: Task, flt: str = "") -> Rendered:
+    rendered = (format_task_text(task), task_inline_kb(task, flt))
+    # Клавиатура зависит от фильтра списка — он часть ключа
+    render_cache.put(("task", task.id, task.version, "card", flt), rendered)
+    return rendered
+
+
+async def build_task_card(session, task_id: int, version: int, flt: str = "") -> Rendered:
+    """Карточка задачи из кэша; при промахе — загрузить с проектом и отрисовать."""
+    rendered = render_cache.get(("task", task_id, version, "card", flt))
+    if rendered is None:
+        # В сессии задача может быть загружена частично (load_only) — дочитываем
+        task = await session.get(
+            Task, task_id, options=[joinedload(Task.project)], populate_existing=True
+        )
+        rendered = _render_task_card(task, flt)
+    return rendered
+
+
+def _list_cursor(item, flt: str) -> Optional[Cursor]:
+    """Курсор «начать список с этой задачи» по ключу сортировки фильтра."""
+    attr = "created_at"
+    if flt == "arch":
+        attr = "archived_at"
+    elif flt in DEADLINE_FILTERS:
+        attr = "due_at"
+    # Задача уже выпала из фильтра (вернулась из архива, снят срок) — с начала списка
+    if getattr(item, attr) is None:
+        return None
+    return Cursor.of(item, attr)
+
+
+async def _task_unavailable(callback: types.CallbackQuery) -> None:
+    await callback.answer("Эта задача больше не существует.", show_alert=True)
+    try:
+        await callback.message.edit_text("❌ Задача недоступна.")
+    except Exception:
+        pass
+
+
+# ====== Обработка инлайн-кнопок карточки задачи ======
 @tasks_router.callback_query(TaskActionCb.filter())
 async def task_action_handler(
     callback: types.CallbackQuery,
     callback_data: TaskActionCb,
     state: FSMContext,
+    user_id: int,
+    session: AsyncSession,
 ):
-    tg_user = callback.from_user
-
-    async with async_session_maker() as session:
+    # Удаление задачи — и сразу обратно к той же странице списка.
+    # Подзадачи и файлы удаляем явно, как и purge_deleted_projects: ON DELETE CASCADE
+    # в SQLite работает только при PRAGMA foreign_keys=ON (см. SQLITE_FOREIGN_KEYS)
+    if callback_data.action == "delete":
         result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
+            delete(Task)
+            .where(Task.id == callback_data.task_id, Task.user_id == user_id)
+            # Задачи удалённого проекта уже в руках purger
+            .where(not_in_deleted_project())
+            .returning(Task.id, Task.created_at, Task.due_at, Task.archived_at, Task.project_id)
         )
-        user = result.scalar_one_or_none()
-        if user is None:
-            await callback.answer("Пользователь не найден в системе.", show_alert=True)
+        row = result.one_or_none()
+        if row is None:
+            await _task_unavailable(callback)
             return
 
-        result = await session.execute(
-            select(Task)
-            .options(
-                selectinload(Task.project),
-                selectinload(Task.subtasks),
-            )
-            .where(Task.id == callback_data.task_id)
+        await session.execute(delete(SubTask).where(SubTask.task_id == callback_data.task_id))
+        await session.execute(delete(TaskFile).where(TaskFile.task_id == callback_data.task_id))
+
+        await bump_versions(session, Project, [row.project_id])
+        await session.commit()
+
+        reminder_engine.unschedule(callback_data.task_id)
+
+        text, kb = await build_tasks_list_view(
+            session, user_id, "from", _list_cursor(row, callback_data.flt), callback_data.flt
         )
-        task = result.scalar_one_or_none()
+        try:
+            await callback.message.edit_text(text, reply_markup=kb)
+        except Exception:
+            pass
+        await callback.answer("Задача удалена ✅")
+        return
 
-        if task is None or task.user_id != user.id:
-            await callback.answer("Эта задача больше не существует.", show_alert=True)
-            try:
-                await callback.message.edit_text("❌ Задача недоступна.")
-            except Exception:
-                pass
-            return
+    plan = TASK_ACTION_LOAD_PLANS.get(callback_data.action)
+    if plan is None:
+        await callback.answer()
+        return
 
-        # Смена статуса
-        if callback_data.action == "cycle":
-            if task.status == TaskStatus.TODO:
-                task.status = TaskStatus.IN_PROGRESS
-            elif task.status == TaskStatus.IN_PROGRESS:
-                task.status = TaskStatus.DONE
-            else:
-                task.status = TaskStatus.TODO
+    result = await session.execute(
+        select(Task)
+        .options(*plan)
+        .where(Task.id == callback_data.task_id, Task.user_id == user_id)
+        .where(not_in_deleted_project())
+    )
+    task = result.scalar_one_or_none()
 
-            await session.commit()
-            await session.refresh(task)
+    if task is None:
+        await _task_unavailable(callback)
+        return
 
-            await callback.message.edit_text(
-                format_task_text(task),
-                reply_markup=task_inline_kb(task),
-            )
-            await callback.answer("Статус обновлён ✅")
+    # Смена статуса
+    if callback_data.action == "cycle":
+        if task.status == TaskStatus.TODO:
+            task.status = TaskStatus.IN_PROGRESS
+        elif task.status == TaskStatus.IN_PROGRESS:
+            task.status = TaskStatus.DONE
+            task.completed_at = datetime.utcnow()
+        else:
+            # Снова в работу — и обратно из архива, если задача уже там
+            task.status = TaskStatus.TODO
+            task.completed_at = None
+            task.archived_at = None
+
+        # UPDATE ... RETURNING version — новая карточка сразу ляжет в кэш
+        await session.flush()
+        # Статус задачи виден в карточке проекта
+        await bump_versions(session, Project, [task.project_id])
+        # Карточка новой версии ляжет в кэш и уйдёт пользователю только после commit
+        await session.commit()
 
-        # Удаление задачи
-        elif callback_data.action == "delete":
-            await session.delete(task)
-            await session.commit()
-            try:
-                await callback.message.edit_text(" Задача удалена.")
-            except Exception:
-                pass
-            await callback.answer("Задача удалена ✅")
-
-        # Показать список файлов
-        elif callback_data.action == "files":
-            text, kb = await build_task_files_view(session, task.id)
-            await callback.message.answer(text, reply_markup=kb)
-            await callback.answer()
-
-        # Начать прикрепление файла
-        elif callback_data.action == "attach":
-            await state.set_state(TaskFileStates.waiting_for_file)
-            await state.update_data(task_id=task.id)
-            await callback.message.answer(
-                "Отправь файл (документ или фото) <b>одним сообщением</b>, "
-                "чтобы прикрепить его к этой задаче.\n\n"
-                "Если передумал — нажми кнопку <b>«❌ Отмена»</b> "
-                "или отправь команду <code>/cancel</code>.",
-                reply_markup=cancel_only_kb(),
-            )
-            await callback.answer()
-
-        # Показать подзадачи
-        elif callback_data.action == "subtasks":
-            text, kb = await build_subtasks_view(session, task)
-            await callback.message.answer(text, reply_markup=kb)
-            await callback.answer()
-
-        # Начать добавление новой подзадачи
-        elif callback_data.action == "add_subtask":
-            await state.set_state(SubTaskStates.waiting_for_title)
-            await state.update_data(task_id=task.id)
-
-            await callback.message.answer(
-                "Введи текст новой подзадачи для этой задачи.\n\n"
-                "Например: <b>Сделать черновик отчёта</b>",
-                reply_markup=main_menu_kb(),
-            )
-            await callback.answer()
+        if task.status == TaskStatus.DONE:
+            reminder_engine.unschedule(task.id)
+        else:
+            reminder_engine.schedule(task.id, task.due_at)
 
-        # Вернуться к карточке задачи
-        elif callback_data.action == "back_to_task":
-            # task у нас уже загружен выше через select(...) и selectinload(...)
-            await callback.message.edit_text(
-                format_task_text(task),
-                reply_markup=task_inline_kb(task),
-            )
-            await callback.answer()
+        text, kb = _render_task_card(task, callback_data.flt)
+        await callback.message.edit_text(text, reply_markup=kb)
+        await callback.answer("Статус обновлён ✅")
+
+    # Показать список файлов
+    elif callback_data.action == "files":
+        text, kb = await build_task_files_view(session, task.id)
+        await callback.message.answer(text, reply_markup=kb)
+        await callback.answer()
+
+    # Начать прикрепление файла
+    elif callback_data.action == "attach":
+        await state.set_state(TaskFileStates.waiting_for_file)
+        await state.update_data(task_id=task.id)
+        await callback.message.answer(
+            "Отправь файл (документ или фото) <b>одним сообщением</b>, "
+            "чтобы прикрепить его к этой задаче.\n\n"
+            "Если передумал — нажми кнопку <b>«❌ Отмена»</b> "
+            "или отправь команду <code>/cancel</code>.",
+            reply_markup=cancel_only_kb(),
+        )
+        await callback.answer()
+
+    # Показать подзадачи
+    elif callback_data.action == "subtasks":
+        text, kb = await build_subtasks_view(session, task)
+        await callback.message.answer(text, reply_markup=kb)
+        await callback.answer()
+
+    # Начать добавление новой подзадачи
+    elif callback_data.action == "add_subtask":
+        await state.set_state(SubTaskStates.waiting_for_title)
+        await state.update_data(task_id=task.id)
+
+        await callback.message.answer(
+            "Введи текст новой подзадачи для этой задачи.\n\n"
+            "Например: <b>Сделать черновик отчёта</b>",
+            reply_markup=main_menu_kb(),
+        )
+        await callback.answer()
+
+    # Открыть карточку из списка / вернуться к карточке задачи
+    elif callback_data.action in ("open", "back_to_task"):
+        text, kb = await build_task_card(session, task.id, task.version, callback_data.flt)
+        await callback.message.edit_text(text, reply_markup=kb)
+        await callback.answer()
+
+    # Вернуться к списку, из которого открыли карточку, — страница начинается с этого элемента
+    elif callback_data.action == "list":
+        text, kb = await build_tasks_list_view(
+            session, user_id, "from", _list_cursor(task, callback_data.flt), callback_data.flt
+        )
+        await callback.message.edit_text(text, reply_markup=kb)
+        await callback.answer()
 
 
 @tasks_router.message(SubTaskStates.waiting_for_title)
-async def handle_new_subtask(message: types.Message, state: FSMContext):
-    tg_user = message.from_user
+async def handle_new_subtask(
+    message: types.Message,
+    state: FSMContext,
+    user_id: int,
+    session: AsyncSession,
+):
     title = (message.text or "").strip()
 
     if not title:
@@ -666,58 +1097,39 @@ async def handle_new_subtask(message: types.Message, state: FSMContext):
         )
         return
 
-    async with async_session_maker() as session:
-        # находим пользователя
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-        if user is None:
-            await message.answer("Пользователь не найден.")
-            await state.clear()
-            return
-
-        # находим задачу
-        result = await session.execute(
-            select(Task)
-            .options(selectinload(Task.subtasks))
-            .where(Task.id == task_id)
-        )
-        task = result.scalar_one_or_none()
-
-        if task is None or task.user_id != user.id:
-            await message.answer(
-                "Эта задача больше не существует или тебе недоступна."
-            )
-            await state.clear()
-            return
+    # находим задачу (карточка могла остаться открытой после удаления проекта)
+    result = await session.execute(
+        select(Task).where(Task.id == task_id).where(not_in_deleted_project())
+    )
+    task = result.scalar_one_or_none()
 
-        subtask = SubTask(
-            task_id=task.id,
-            user_id=user.id,
-            title=title,
-            is_done=False,
+    if task is None or task.user_id != user_id:
+        await message.answer(
+            "Эта задача больше не существует или тебе недоступна."
         )
-        session.add(subtask)
-        await session.commit()
+        await state.clear()
+        return
 
-        # Обновляем задачу с подзадачами
-        result = await session.execute(
-            select(Task)
-            .options(selectinload(Task.subtasks))
-            .where(Task.id == task.id)
-        )
-        task = result.scalar_one()
+    # Подзадача и счётчик задачи — в одной транзакции
+    subtask = await add_subtask(session, task.id, user_id, title)
+    await session.commit()
 
-        text, kb = await build_subtasks_view(session, task)
+    # Показываем окно, которое заканчивается новой подзадачей
+    text, kb = await build_subtasks_view(
+        session, task, "upto", Cursor.of(subtask), pos=None
+    )
 
     await state.clear()
     await message.answer("✅ Подзадача добавлена.")
     await message.answer(text, reply_markup=kb)
 
 @tasks_router.message(SubTaskStates.waiting_for_title)
-async def handle_new_subtask(message: types.Message, state: FSMContext):
-    tg_user = message.from_user
+async def handle_new_subtask(
+    message: types.Message,
+    state: FSMContext,
+    user_id: int,
+    session: AsyncSession,
+):
     title = (message.text or "").strip()
 
     if not title:
@@ -738,50 +1150,27 @@ async def handle_new_subtask(message: types.Message, state: FSMContext):
         )
         return
 
-    async with async_session_maker() as session:
-        # находим пользователя
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-        if user is None:
-            await message.answer("Пользователь не найден.")
-            await state.clear()
-            return
-
-        # находим задачу
-        result = await session.execute(
-            select(Task)
-            .options(selectinload(Task.subtasks))
-            .where(Task.id == task_id)
-        )
-        task = result.scalar_one_or_none()
-
-        if task is None or task.user_id != user.id:
-            await message.answer(
-                "Эта задача больше не существует или тебе недоступна."
-            )
-            await state.clear()
-            return
+    # находим задачу (карточка могла остаться открытой после удаления проекта)
+    result = await session.execute(
+        select(Task).where(Task.id == task_id).where(not_in_deleted_project())
+    )
+    task = result.scalar_one_or_none()
 
-        subtask = SubTask(
-            task_id=task.id,
-            user_id=user.id,
-            title=title,
-            is_done=False,
+    if task is None or task.user_id != user_id:
+        await message.answer(
+            "Эта задача больше не существует или тебе недоступна."
         )
-        session.add(subtask)
-        await session.commit()
+        await state.clear()
+        return
 
-        # Обновляем задачу с подзадачами
-        result = await session.execute(
-            select(Task)
-            .options(selectinload(Task.subtasks))
-            .where(Task.id == task.id)
-        )
-        task = result.scalar_one()
+    # Подзадача и счётчик задачи — в одной транзакции
+    subtask = await add_subtask(session, task.id, user_id, title)
+    await session.commit()
 
-        text, kb = await build_subtasks_view(session, task)
+    # Показываем окно, которое заканчивается новой подзадачей
+    text, kb = await build_subtasks_view(
+        session, task, "upto", Cursor.of(subtask), pos=None
+    )
 
     await state.clear()
     await message.answer("✅ Подзадача добавлена.")
@@ -791,74 +1180,63 @@ async def handle_new_subtask(message: types.Message, state: FSMContext):
 async def subtask_action_handler(
     callback: types.CallbackQuery,
     callback_data: SubTaskCb,
+    user_id: int,
+    session: AsyncSession,
 ):
-    tg_user = callback.from_user
+    # Переключение/удаление вместе с проверкой владельца и правкой
+    # счётчиков задачи — атомарно, без предварительного SELECT
+    task_id = None
+    if callback_data.action == "toggle":
+        task_id = await toggle_subtask(session, callback_data.subtask_id, user_id)
+    elif callback_data.action == "delete":
+        task_id = await delete_subtask(session, callback_data.subtask_id, user_id)
+    await session.commit()
 
-    async with async_session_maker() as session:
-        # пользователь
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-        if user is None:
-            await callback.answer("Пользователь не найден.", show_alert=True)
-            return
-
-        # подзадача
-        result = await session.execute(
-            select(SubTask).where(SubTask.id == callback_data.subtask_id)
-        )
-        subtask = result.scalar_one_or_none()
-        if subtask is None or subtask.user_id != user.id:
-            await callback.answer(
-                "Эта подзадача больше не существует или тебе недоступна.",
-                show_alert=True,
-            )
-            return
-
-        task_id = subtask.task_id
-
-        # переключение статуса
-        if callback_data.action == "toggle":
-            subtask.is_done = not subtask.is_done
-            await session.commit()
-
-        # удаление
-        elif callback_data.action == "delete":
-            await session.delete(subtask)
-            await session.commit()
-
-        # после изменения подзадачи — обновляем список
-        result = await session.execute(
-            select(Task)
-            .options(selectinload(Task.subtasks))
-            .where(Task.id == task_id)
+    if task_id is None:
+        await callback.answer(
+            "Эта подзадача больше не существует или тебе недоступна.",
+            show_alert=True,
         )
-        task = result.scalar_one_or_none()
+        return
 
-        if task is None:
-            try:
-                await callback.message.edit_text(
-                    "☑️ Подзадачи недоступны (задача была удалена)."
-                )
-            except Exception:
-                pass
-            await callback.answer("Подзадача обновлена.")
-            return
+    # после изменения подзадачи — перерисовываем то же окно списка
+    result = await session.execute(
+        select(Task).where(Task.id == task_id)
+    )
+    task = result.scalar_one_or_none()
 
-        text, kb = await build_subtasks_view(session, task)
+    if task is None:
         try:
-            await callback.message.edit_text(text, reply_markup=kb)
+            await callback.message.edit_text(
+                "☑️ Подзадачи недоступны (задача была удалена)."
+            )
         except Exception:
-            # если Telegram скажет "message is not modified" — просто игнорируем
             pass
+        await callback.answer("Подзадача обновлена.")
+        return
 
-        await callback.answer("Подзадача обновлена ✅")
+    text, kb = await build_subtasks_view(
+        session,
+        task,
+        "from",
+        Cursor.unpack(callback_data.ts, callback_data.anchor),
+        callback_data.pos,
+    )
+    try:
+        await callback.message.edit_text(text, reply_markup=kb)
+    except Exception:
+        # если Telegram скажет "message is not modified" — просто игнорируем
+        pass
 
-@tasks_router.message(TaskFileStates.waiting_for_file)
-async def handle_task_file_upload(message: types.Message, state: FSMContext):
-    tg_user = message.from_user
+    await callback.answer("Подзадача обновлена ✅")
 
+@tasks_router.message(TaskFileStates.waiting_for_file)
+async def handle_task_file_upload(
+    message: types.Message,
+    state: FSMContext,
+    user_id: int,
+    session: AsyncSession,
+):
     # --- Обработка отмены ---
     if message.text:
         raw = message.text.strip()
@@ -911,41 +1289,35 @@ async def handle_task_file_upload(message: types.Message, state: FSMContext):
         )
         return
 
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
-        )
-        user = result.scalar_one_or_none()
-        if user is None:
-            await message.answer("Пользователь не найден в системе.")
-            await state.clear()
-            return
-
-        result = await session.execute(
-            select(Task).where(Task.id == task_id)
+    # Файл к задаче удалённого проекта остался бы сиротой после очистки
+    result = await session.execute(
+        select(Task).where(Task.id == task_id).where(not_in_deleted_project())
+    )
+    task = result.scalar_one_or_none()
+    if task is None or task.user_id != user_id:
+        await message.answer(
+            "Эта задача больше не существует или тебе недоступна."
         )
-        task = result.scalar_one_or_none()
-        if task is None or task.user_id != user.id:
-            await message.answer(
-                "Эта задача больше не существует или тебе недоступна."
-            )
-            await state.clear()
-            return
+        await state.clear()
+        return
 
-        task_file = TaskFile(
-            task_id=task.id,
-            user_id=user.id,
-            telegram_file_id=file_id,
-            telegram_unique_id=unique_id,
-            file_name=file_name,
-            mime_type=mime_type,
-            file_size=size,
-            file_kind=file_kind,
-        )
-        session.add(task_file)
-        await session.commit()
+    task_file = TaskFile(
+        task_id=task.id,
+        user_id=user_id,
+        telegram_file_id=file_id,
+        telegram_unique_id=unique_id,
+        file_name=file_name,
+        mime_type=mime_type,
+        file_size=size,
+        file_kind=file_kind,
+    )
+    session.add(task_file)
+    await session.commit()
 
-        text, kb = await build_task_files_view(session, task.id)
+    # Показываем окно, которое заканчивается новым файлом
+    text, kb = await build_task_files_view(
+        session, task.id, "upto", Cursor.of(task_file), pos=None
+    )
 
     await state.clear()
     await message.answer(
@@ -958,73 +1330,100 @@ async def handle_task_file_upload(message: types.Message, state: FSMContext):
 async def task_file_action_handler(
     callback: types.CallbackQuery,
     callback_data: TaskFileCb,
+    user_id: int,
+    session: AsyncSession,
 ):
-    tg_user = callback.from_user
-
-    async with async_session_maker() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == tg_user.id)
+    result = await session.execute(
+        select(TaskFile).where(TaskFile.id == callback_data.file_id)
+    )
+    file = result.scalar_one_or_none()
+    if file is None or file.user_id != user_id:
+        await callback.answer(
+            "Файл больше не существует или тебе недоступен.",
+            show_alert=True,
         )
-        user = result.scalar_one_or_none()
-        if user is None:
-            await callback.answer(
-                "Пользователь не найден в системе.",
-                show_alert=True,
-            )
-            return
+        return
 
-        result = await session.execute(
-            select(TaskFile).where(TaskFile.id == callback_data.file_id)
-        )
-        file = result.scalar_one_or_none()
-        if file is None or file.user_id != user.id:
-            await callback.answer(
-                "Файл больше не существует или тебе недоступен.",
-                show_alert=True,
+    # Скачать файл
+    if callback_data.action == "download":
+        await callback.answer()
+        if file.file_kind == "photo":
+            await callback.message.answer_photo(
+                file.telegram_file_id,
+                caption=f"📎 {file.file_name}",
+            )
+        else:
+            await callback.message.answer_document(
+                file.telegram_file_id,
+                caption=f"📎 {file.file_name}",
             )
-            return
-
-        # Скачать файл
-        if callback_data.action == "download":
-            await callback.answer()
-            if file.file_kind == "photo":
-                await callback.message.answer_photo(
-                    file.telegram_file_id,
-                    caption=f"📎 {file.file_name}",
-                )
-            else:
-                await callback.message.answer_document(
-                    file.telegram_file_id,
-                    caption=f"📎 {file.file_name}",
-                )
 
-        # Удалить файл
-        elif callback_data.action == "delete":
-            task_id = file.task_id
-            await session.delete(file)
-            await session.commit()
+    # Удалить файл
+    elif callback_data.action == "delete":
+        task_id = file.task_id
+        await session.delete(file)
+        await session.commit()
 
-            # Пытаемся обновить список файлов
-            result_task = await session.execute(
-                select(Task).where(Task.id == task_id)
-            )
-            task = result_task.scalar_one_or_none()
-
-            if task is None:
-                try:
-                    await callback.message.edit_text(
-                        "📎 Файлы задачи недоступны (задача удалена)."
-                    )
-                except Exception:
-                    pass
-                await callback.answer("Файл удалён ✅")
-                return
+        # Пытаемся обновить список файлов
+        result_task = await session.execute(
+            select(Task).where(Task.id == task_id)
+        )
+        task = result_task.scalar_one_or_none()
 
-            text, kb = await build_task_files_view(session, task.id)
+        if task is None:
             try:
-                await callback.message.edit_text(text, reply_markup=kb)
+                await callback.message.edit_text(
+                    "📎 Файлы задачи недоступны (задача удалена)."
+                )
             except Exception:
-                # если текст/клавиатура не изменились — игнорируем
                 pass
-
             await callback.answer("Файл удалён ✅")
+            return
+
+        text, kb = await build_task_files_view(
+            session,
+            task.id,
+            "from",
+            Cursor.unpack(callback_data.ts, callback_data.anchor),
+            callback_data.pos,
+        )
+        try:
+            await callback.message.edit_text(text, reply_markup=kb)
+        except Exception:
+            # если текст/клавиатура не изменились — игнорируем
+            pass
+
+        await callback.answer("Файл удалён ✅")
+
+
+# ====== Листание подзадач / файлов ======
+@tasks_router.callback_query(ChildWindowCb.filter())
+async def child_window_handler(
+    callback: types.CallbackQuery,
+    callback_data: ChildWindowCb,
+    user_id: int,
+    session: AsyncSession,
+):
+    result = await session.execute(
+        select(Task).where(Task.id == callback_data.task_id)
+    )
+    task = result.scalar_one_or_none()
+    if task is None or task.user_id != user_id:
+        await callback.answer("Эта задача больше не существует.", show_alert=True)
+        return
+
+    cursor = Cursor.unpack(callback_data.ts, callback_data.id)
+    if callback_data.kind == "s":
+        text, kb = await build_subtasks_view(
+            session, task, callback_data.dir, cursor, callback_data.pos
+        )
+    else:
+        text, kb = await build_task_files_view(
+            session, task.id, callback_data.dir, cursor, callback_data.pos
+        )
+
+    try:
+        await callback.message.edit_text(text, reply_markup=kb)
+    except Exception:
+        pass
+    await callback.answer()
@@ -1,222 +1,216 @@
-from datetime import datetime, date, timedelta
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from sqlalchemy import select
+from sqlalchemy import update
 from aiogram import Bot
 
+from app.bot.leader import leader_lease
+from app.bot.digest import load_digest_data, render_digest, select_due_digest_users
+from app.bot.reminders import reminder_engine
+from app.bot.outbox import Notification, enqueue_notifications, outbox_dispatcher
+from app.bot.purger import project_purger
+from app.bot.sender import send_pipeline
 from app.core.db import async_session_maker
+from app.core.services.archive import archive_done_tasks
+from app.core.services.subtasks import repair_subtask_counters
 from app.core.models.user import User
-from app.core.models.task import Task, TaskStatus
-from app.core.models.note import Note
-from app.core.models.project import Project
+
+
+logger = logging.getLogger(__name__)
+
+TICK_INTERVAL = timedelta(minutes=1)
+
+# Сколько пользователей дайджеста обрабатываем за одну сессию/транзакцию
+DIGEST_CHUNK_SIZE = 500
+
+
+class TickGuard:
+    """
+    Защита периодической задачи от наслоения тиков.
+
+    Пока тик идёт, следующие пропускаются; как только он закончился,
+    следующий запускается в обычное время. Пропущенные минуты дайджеста
+    догоняются по since, так что долгий тик лишь задерживает рассылку.
+    """
+
+    def __init__(self, name: str, interval: timedelta) -> None:
+        self.name = name
+        self.interval = interval.total_seconds()
+        self.running = False
+        self.last_duration = 0.0
+
+    async def run(self, func, *args) -> None:
+        if self.running:
+            logger.warning("Tick %s skipped: previous one is still running", self.name)
+            return
+
+        self.running = True
+        started = time.monotonic()
+        try:
+            await func(*args)
+        finally:
+            self.running = False
+            self.last_duration = time.monotonic() - started
+            if self.last_duration > self.interval:
+                logger.warning(
+                    "Tick %s took %.1fs (> %.0fs)",
+                    self.name,
+                    self.last_duration,
+                    self.interval,
+                )
+
+
+tick_guard = TickGuard("scheduler", TICK_INTERVAL)
+
+# Минута, до которой (включительно) дайджесты уже разосланы этим лидером
+_last_digest_at: Optional[datetime] = None
 
 
 def setup_scheduler(bot: Bot):
     scheduler = AsyncIOScheduler(timezone="Europe/Moscow")
 
-    # Запускаем джоб каждые 1 минуту
+    # Минутный тик: один экземпляр за раз, пропущенные запуски схлопываются
     scheduler.add_job(
-        daily_digest,
+        tick_guard.run,
         trigger="interval",
-        minutes=1,
-        args=[bot],
+        seconds=TICK_INTERVAL.total_seconds(),
+        args=[scheduler_tick],
+        coalesce=True,
+        max_instances=1,
+        misfire_grace_time=30,
+    )
+
+    # Раз в сутки чистим давно доставленные уведомления
+    scheduler.add_job(
+        outbox_dispatcher.purge_delivered,
+        trigger="cron",
+        hour=4,
+        minute=30,
+        coalesce=True,
+        max_instances=1,
+    )
+
+    # И сверяем денормализованные счётчики подзадач с таблицей subtasks
+    scheduler.add_job(
+        repair_subtask_counters,
+        trigger="cron",
+        hour=4,
+        minute=45,
+        coalesce=True,
+        max_instances=1,
+    )
+
+    # Дочищаем удалённые проекты, если фоновая очистка прервалась рестартом
+    scheduler.add_job(
+        project_purger.purge,
+        trigger="interval",
+        minutes=10,
+        coalesce=True,
+        max_instances=1,
+    )
+
+    # И уносим в архив давно закрытые задачи
+    scheduler.add_job(
+        archive_done_tasks,
+        trigger="cron",
+        hour=5,
+        minute=0,
+        coalesce=True,
+        max_instances=1,
     )
 
     scheduler.start()
 
+    # Все исходящие рассылки идут через общий пул с rate limit
+    send_pipeline.start(bot)
+
+    # Outbox разбирается своим циклом, а не внутри минутного тика:
+    # долгая рассылка не задерживает ни тик, ни напоминания
+    outbox_dispatcher.start()
+
+    # Напоминания о дедлайнах живут в отдельном событийном движке
+    reminder_engine.start()
+
+
+async def scheduler_tick():
+    """Тик планировщика: рассылает только реплика, держащая аренду лидера."""
+    global _last_digest_at
+
+    if not await leader_lease.try_acquire():
+        _last_digest_at = None
+        return
+
+    now = datetime.now().replace(second=0, microsecond=0)
+    # Новый лидер догоняет минуты, которые мог не обработать прежний
+    since = _last_digest_at or now - (leader_lease.ttl + TICK_INTERVAL)
+    await daily_digest(now, since=since)
+    _last_digest_at = now
 
-async def daily_digest(bot: Bot):
-    today = date.today()
-    yesterday = today - timedelta(days=1)
-    now = datetime.now()
+    # Отправка — в цикле диспетчера; тик лишь будит его
+    outbox_dispatcher.kick()
+
+
+async def daily_digest(now: Optional[datetime] = None, since: Optional[datetime] = None):
+    """
+    Разослать дайджесты пользователям, чей слот наступил.
+
+    Пользователи обрабатываются чанками по DIGEST_CHUNK_SIZE с keyset-пагинацией
+    по users.id; на каждый чанк — своя короткая сессия и свой commit,
+    так что память и время удержания блокировки не растут с числом пользователей.
+    """
+    now = now or datetime.now()
+    after_id = 0
+
+    while True:
+        users = await _digest_chunk(now, since, after_id)
+        if len(users) < DIGEST_CHUNK_SIZE:
+            break
+        after_id = users[-1][0]
+
+
+async def _digest_chunk(
+    now: datetime,
+    since: Optional[datetime],
+    after_id: int,
+) -> list[tuple[int, int]]:
+    today = now.date()
 
     async with async_session_maker() as session:
-        result = await session.execute(select(User))
-        users = result.scalars().all()
-
-        for user in users:
-            # Настройки пользователя
-            digest_enabled = getattr(user, "reminders_enabled", True)
-            deadline_enabled = getattr(user, "deadline_reminders_enabled", True)
-            reminder_hour = getattr(user, "reminder_hour", 9)
-            reminder_minute = getattr(user, "reminder_minute", 0)
-            last_digest_date = getattr(user, "last_digest_date", None)
-
-            # ------ общие данные: задачи, заметки, проекты ------
-            tasks_result = await session.execute(
-                select(Task).where(Task.user_id == user.id)
-            )
-            tasks = tasks_result.scalars().all()
-
-            tasks_today = []
-            tasks_overdue = []
-            tasks_no_deadline = []
-
-            for task in tasks:
-                if task.due_at is None:
-                    tasks_no_deadline.append(task)
-                else:
-                    d = task.due_at.date()
-                    if d < today:
-                        tasks_overdue.append(task)
-                    elif d == today:
-                        tasks_today.append(task)
-
-            notes_result = await session.execute(
-                select(Note)
-                .where(Note.user_id == user.id)
-                .where(
-                    Note.created_at >= datetime(
-                        yesterday.year, yesterday.month, yesterday.day
+        users = await select_due_digest_users(
+            session, now, since, after_id=after_id, limit=DIGEST_CHUNK_SIZE
+        )
+        if not users:
+            return users
+
+        digest_data = await load_digest_data(
+            session, (user_id for user_id, _ in users), today
+        )
+
+        notifications: list[Notification] = []
+        for user_id, telegram_id in users:
+            text = render_digest(digest_data[user_id], today)
+            if text:
+                notifications.append(
+                    Notification(
+                        key=f"digest:{user_id}:{today.isoformat()}",
+                        user_id=user_id,
+                        chat_id=telegram_id,
+                        text=text,
                     )
                 )
-            )
-            notes = notes_result.scalars().all()
 
-            projects_result = await session.execute(
-                select(Project).where(Project.user_id == user.id)
+        # Дайджест в outbox и отметка last_digest_date — одна транзакция:
+        # после рестарта он не потеряется и не уйдёт второй раз
+        if notifications:
+            await enqueue_notifications(session, notifications)
+            await session.execute(
+                update(User)
+                .where(User.id.in_([n.user_id for n in notifications]))
+                .values(last_digest_date=today)
             )
-            projects = projects_result.scalars().all()
-
-            # ------ Ежедневный дайджест ------
-            if digest_enabled:
-                if (
-                    last_digest_date != today
-                    and now.hour == reminder_hour
-                    and now.minute == reminder_minute
-                ):
-                    if (
-                        tasks_today
-                        or tasks_overdue
-                        or tasks_no_deadline
-                        or notes
-                        or projects
-                    ):
-                        text_lines = []
-                        text_lines.append("👋 <b>Доброе утро!</b>\n")
-
-                        if tasks_today:
-                            text_lines.append("🟠 <b>Задачи на сегодня:</b>")
-                            for t in tasks_today:
-                                text_lines.append(f"• {t.title}")
-                            text_lines.append("")
-
-                        if tasks_overdue:
-                            text_lines.append("🔥 <b>Просроченные задачи:</b>")
-                            for t in tasks_overdue:
-                                text_lines.append(
-                                    f"• {t.title} — было до {t.due_at.strftime('%d.%m.%Y')}"
-                                )
-                            text_lines.append("")
-
-                        if tasks_no_deadline:
-                            text_lines.append("📝 <b>Задачи без дедлайна:</b>")
-                            for t in tasks_no_deadline:
-                                text_lines.append(f"• {t.title}")
-                            text_lines.append("")
-
-                        if notes:
-                            text_lines.append("🧠 <b>Новые заметки со вчера:</b>")
-                            for n in notes:
-                                base = (n.content or "").strip()
-                                if not base:
-                                    base = (n.title or "").strip()
-                                if not base:
-                                    base = "(пустая заметка)"
-                                short = base
-                                if len(short) > 50:
-                                    short = short[:47] + "..."
-                                text_lines.append(f"• {short}")
-                            text_lines.append("")
-
-                        if projects:
-                            text_lines.append("📁 <b>Твои проекты:</b>")
-                            for p in projects:
-                                text_lines.append(f"• {p.name}")
-                            text_lines.append("")
-
-                        full_text = "\n".join(text_lines).strip()
-
-                        try:
-                            await bot.send_message(user.telegram_id, full_text)
-                        except Exception:
-                            pass
-                        else:
-                            user.last_digest_date = today
-
-            # ------ Напоминания о дедлайнах задач ------
-            if deadline_enabled:
-                for task in tasks:
-                    if task.due_at is None:
-                        continue
-                    if task.status == TaskStatus.DONE:
-                        continue
-
-                    delta = task.due_at - now
-                    delta_minutes = delta.total_seconds() / 60
-
-                    if delta_minutes <= 0:
-                        continue
-
-                    def in_window(target_minutes: int, tolerance: int = 5) -> bool:
-                        return (
-                            target_minutes - tolerance
-                            <= delta_minutes
-                            <= target_minutes + tolerance
-                        )
-
-                    # за 1 день
-                    if (
-                        in_window(24 * 60)
-                        and not task.remind_1day_sent
-                    ):
-                        try:
-                            await bot.send_message(
-                                user.telegram_id,
-                                (
-                                    "⏰ <b>Напоминание по задаче</b>\n"
-                                    f"До дедлайна по задаче <b>«{task.title}»</b> "
-                                    "остался <b>1 день</b>."
-                                ),
-                            )
-                        except Exception:
-                            pass
-                        task.remind_1day_sent = True
-
-                    # за 3 часа
-                    if (
-                        in_window(3 * 60)
-                        and not task.remind_3h_sent
-                    ):
-                        try:
-                            await bot.send_message(
-                                user.telegram_id,
-                                (
-                                    "⏰ <b>Напоминание по задаче</b>\n"
-                                    f"До дедлайна по задаче <b>«{task.title}»</b> "
-                                    "осталось <b>3 часа</b>."
-                                ),
-                            )
-                        except Exception:
-                            pass
-                        task.remind_3h_sent = True
-
-                    # за 1 час
-                    if (
-                        in_window(60)
-                        and not task.remind_1h_sent
-                    ):
-                        try:
-                            await bot.send_message(
-                                user.telegram_id,
-                                (
-                                    "⏰ <b>Напоминание по задаче</b>\n"
-                                    f"До дедлайна по задаче <b>«{task.title}»</b> "
-                                    "остался <b>1 час</b>."
-                                ),
-                            )
-                        except Exception:
-                            pass
-                        task.remind_1h_sent = True
-
             await session.commit()
+
+    return users
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OutboundMessage:
+    chat_id: int
+    text: str
+
+
+@dataclass
+class BatchReport:
+    label: str
+    total: int
+    sent: int
+    failed: int
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        return self.sent / self.elapsed if self.elapsed > 0 else float(self.sent)
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def is_idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class SendPipeline:
+    """
+    Пул воркеров для исходящих сообщений (дайджесты, напоминания).
+
+    Соблюдает общий лимит Telegram (~30 msg/s) и лимит на один чат,
+    переживает RetryAfter и не держит сессию БД на время отправки:
+    планировщик просто ставит сообщения в очередь и ждёт отчёт.
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        global_rate: float = 30.0,
+        per_chat_rate: float = 1.0,
+        max_attempts: int = 3,
+        queue_size: int = 10_000,
+    ) -> None:
+        self.workers = workers
+        self.per_chat_rate = per_chat_rate
+        self.max_attempts = max_attempts
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: dict[int, TokenBucket] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._paused_until = 0.0
+        self._bot: Optional[Bot] = None
+        self._tasks: list[asyncio.Task] = []
+
+    # ====== Жизненный цикл ======
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        self._tasks = [t for t in self._tasks if not t.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ====== Постановка в очередь ======
+    async def send(self, message: OutboundMessage) -> bool:
+        """Отправить одно сообщение через пул; True, если доставлено."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((message, future))
+        return await future
+
+    async def send_batch(
+        self,
+        messages: Iterable[OutboundMessage],
+        label: str = "batch",
+    ) -> tuple[list[bool], BatchReport]:
+        """Отправить пачку сообщений и вернуть статус по каждому + отчёт."""
+        started = time.monotonic()
+        messages = list(messages)
+        results = await asyncio.gather(*(self.send(m) for m in messages))
+
+        sent = sum(1 for ok in results if ok)
+        report = BatchReport(
+            label=label,
+            total=len(messages),
+            sent=sent,
+            failed=len(messages) - sent,
+            elapsed=time.monotonic() - started,
+        )
+        if report.total:
+            logger.info(
+                "Send batch %s: %d/%d sent, %d failed in %.2fs (%.1f msg/s)",
+                report.label,
+                report.sent,
+                report.total,
+                report.failed,
+                report.elapsed,
+                report.rate,
+            )
+        return list(results), report
+
+    # ====== Воркеры ======
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10_000:
+                self._chats = {
+                    cid: b for cid, b in self._chats.items() if not b.is_idle()
+                }
+            bucket = TokenBucket(self.per_chat_rate, 1)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _worker(self) -> None:
+        while True:
+            message, future = await self._queue.get()
+            try:
+                ok = await self._deliver(message)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.set_result(False)
+                raise
+            except Exception:
+                logger.exception("Unexpected error while sending to %s", message.chat_id)
+                ok = False
+            finally:
+                self._queue.task_done()
+            if not future.done():
+                future.set_result(ok)
+
+    async def _deliver(self, message: OutboundMessage) -> bool:
+        for attempt in range(1, self.max_attempts + 1):
+            # RetryAfter от Telegram касается всего бота, а не одного чата
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+            await self._chat_bucket(message.chat_id).acquire()
+            await self._global.acquire()
+
+            try:
+                await self._bot.send_message(message.chat_id, message.text)
+                return True
+            except TelegramRetryAfter as e:
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + e.retry_after
+                )
+                logger.warning("Flood control: retry after %ss", e.retry_after)
+            except (TelegramNetworkError, TelegramServerError):
+                await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                # Бот заблокирован, чат не найден и т.п. — повторять бессмысленно
+                logger.info("Send to %s failed: %s", message.chat_id, e)
+                return False
+
+        return False
+
+
+send_pipeline = SendPipeline()
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -7,6 +9,41 @@ class Settings(BaseSettings):
     database_url: str = Field("sqlite+aiosqlite:///./app.db", alias="DATABASE_URL")
     env: str = Field("dev", alias="ENV")
 
+    # ====== Пул соединений (PostgreSQL) ======
+    db_pool_size: int = Field(10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(20, alias="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(30, alias="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(1800, alias="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(True, alias="DB_POOL_PRE_PING")
+    db_statement_cache_size: int = Field(100, alias="DB_STATEMENT_CACHE_SIZE")
+
+    # ====== Кэш пользователей (UserMiddleware) ======
+    user_cache_size: int = Field(10_000, alias="USER_CACHE_SIZE")
+    user_cache_ttl: float = Field(300, alias="USER_CACHE_TTL")
+
+    # ====== Кэш отрисованных карточек ======
+    render_cache_size: int = Field(5_000, alias="RENDER_CACHE_SIZE")
+
+    # ====== Сессия на апдейт (DbSessionMiddleware) ======
+    # Апдейты дольше этого порога логируются предупреждением
+    slow_update_ms: float = Field(500, alias="SLOW_UPDATE_MS")
+
+    # ====== Архив задач ======
+    # Задачи в статусе DONE дольше стольких дней уходят в архив
+    archive_after_days: int = Field(30, alias="ARCHIVE_AFTER_DAYS")
+
+    # ====== Профиль хранилища SQLite ======
+    # durable | balanced | fast (см. app/core/sqlite_profile.py)
+    sqlite_profile: str = Field("balanced", alias="SQLITE_PROFILE")
+    # Точечные переопределения PRAGMA поверх профиля
+    sqlite_journal_mode: Optional[str] = Field(None, alias="SQLITE_JOURNAL_MODE")
+    sqlite_synchronous: Optional[str] = Field(None, alias="SQLITE_SYNCHRONOUS")
+    sqlite_cache_size: Optional[int] = Field(None, alias="SQLITE_CACHE_SIZE")
+    sqlite_mmap_size: Optional[int] = Field(None, alias="SQLITE_MMAP_SIZE")
+    sqlite_temp_store: Optional[str] = Field(None, alias="SQLITE_TEMP_STORE")
+    sqlite_busy_timeout: Optional[int] = Field(None, alias="SQLITE_BUSY_TIMEOUT")
+    sqlite_foreign_keys: Optional[bool] = Field(None, alias="SQLITE_FOREIGN_KEYS")
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,4 +1,9 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
@@ -6,13 +11,50 @@ from sqlalchemy.ext.asyncio import (
 
 from app.config import settings
 from app.core.models import Base
+from app.core.migrations import run_migrations
+from app.core.sqlite_profile import apply_profile, resolve_profile
 
-# Движок для SQLite (async)
-engine = create_async_engine(
-    settings.database_url,
-    echo=False,          # можно поменять на True для отладки SQL
-    future=True,
-)
+
+def create_engine_from_settings(settings) -> AsyncEngine:
+    """
+    Движок под выбранный бэкенд.
+
+    SQLite (aiosqlite) — с профилем PRAGMA на каждое соединение,
+    PostgreSQL (asyncpg) — с настраиваемым пулом соединений.
+    """
+    url = make_url(settings.database_url)
+
+    if url.get_backend_name() == "postgresql":
+        return create_async_engine(
+            url,
+            echo=False,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+            # 0 — если между ботом и БД стоит pgbouncer в transaction-режиме
+            connect_args={"statement_cache_size": settings.db_statement_cache_size},
+        )
+
+    engine = create_async_engine(
+        url,
+        echo=False,          # можно поменять на True для отладки SQL
+        future=True,
+    )
+
+    # PRAGMA профиля хранилища применяются к каждому новому соединению
+    if engine.dialect.name == "sqlite":
+        sqlite_profile = resolve_profile(settings)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _apply_sqlite_profile(dbapi_connection, connection_record):
+            apply_profile(dbapi_connection, sqlite_profile)
+
+    return engine
+
+
+engine = create_engine_from_settings(settings)
 
 # Фабрика сессий
 async_session_maker = async_sessionmaker(
@@ -22,7 +64,15 @@ async_session_maker = async_sessionmaker(
 )
 
 
+def dialect_insert(model):
+    """INSERT с поддержкой ON CONFLICT для текущего бэкенда (SQLite или PostgreSQL)."""
+    if engine.dialect.name == "postgresql":
+        return pg_insert(model)
+    return sqlite_insert(model)
+
+
 async def init_db() -> None:
-    """Создаёт таблицы в БД, если их ещё нет."""
+    """Создаёт таблицы в БД, если их ещё нет, и применяет миграции."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
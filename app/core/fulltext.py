@@ -0,0 +1,122 @@
+"""
+Схема полнотекстового поиска по задачам, заметкам и проектам.
+
+SQLite: одна FTS5-таблица search_index на все три сущности.
+  rowid = id * 4 + kind, так что строка индекса однозначно указывает
+  на исходную строку без отдельной колонки; owner — токен "u<user_id>",
+  по нему MATCH сразу пересекает постинги пользователя с постингами слов,
+  не перебирая чужие документы. Индекс поддерживают триггеры.
+
+PostgreSQL: FTS5 нет — в каждой таблице генерируемая колонка
+  search_vector (tsvector, STORED) с GIN-индексом; её СУБД обновляет сама,
+  а ts_rank читает готовый вектор, не разбирая текст заново.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+KIND_TASK = 1
+KIND_NOTE = 2
+KIND_PROJECT = 3
+KIND_SHIFT = 4  # rowid = id * KIND_SHIFT + kind
+
+
+@dataclass(frozen=True)
+class Indexed:
+    kind: int
+    name: str           # "task" | "note" | "project"
+    table: str
+    # SQL-выражения заголовка и текста; {p} — префикс строки ("new." в триггере)
+    title: str
+    body: str
+    columns: str        # при изменении каких колонок переиндексировать
+    # Условие «строка видна в поиске» по колонкам самой таблицы ("" — всегда):
+    # индекс держит и скрытые строки, отсекаются они при выборке
+    live: str = ""
+
+    def document(self, p: str = "") -> tuple[str, str]:
+        return self.title.format(p=p), self.body.format(p=p)
+
+
+INDEXED: tuple[Indexed, ...] = (
+    Indexed(
+        KIND_TASK, "task", "tasks",
+        title="{p}title",
+        body="coalesce({p}description, '')",
+        columns="title, description, user_id",
+        # Архив ищется только через «🗄 Архив», как и в списках;
+        # задачи удалённого проекта не видны, пока их не дочистит purger
+        live=(
+            "tasks.archived_at IS NULL AND NOT EXISTS ("
+            "SELECT 1 FROM projects p "
+            "WHERE p.id = tasks.project_id AND p.deleted_at IS NOT NULL)"
+        ),
+    ),
+    Indexed(
+        KIND_NOTE, "note", "notes",
+        title="{p}title",
+        body="coalesce({p}content, '') || ' ' || coalesce({p}tags, '')",
+        columns="title, content, tags, user_id",
+    ),
+    Indexed(
+        KIND_PROJECT, "project", "projects",
+        title="{p}name",
+        body="coalesce({p}description, '')",
+        columns="name, description, user_id",
+        live="projects.deleted_at IS NULL",
+    ),
+)
+
+BY_KIND = {item.kind: item for item in INDEXED}
+
+
+def _row(item: Indexed, p: str) -> str:
+    """rowid, title, body, owner для строки триггера (p="new.") или бэкфилла (p="")."""
+    title, body = item.document(p)
+    return f"{p}id * {KIND_SHIFT} + {item.kind}, {title}, {body}, 'u' || {p}user_id"
+
+
+def sqlite_ddl() -> list[str]:
+    """FTS5-таблица, триггеры синхронизации и заливка уже существующих строк."""
+    ddl = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "title, body, owner, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    ]
+    for item in INDEXED:
+        rowid = f"old.id * {KIND_SHIFT} + {item.kind}"
+        ddl += [
+            f"CREATE TRIGGER IF NOT EXISTS {item.table}_search_ai "
+            f"AFTER INSERT ON {item.table} BEGIN "
+            f"INSERT INTO search_index (rowid, title, body, owner) "
+            f"VALUES ({_row(item, 'new.')}); END",
+
+            f"CREATE TRIGGER IF NOT EXISTS {item.table}_search_ad "
+            f"AFTER DELETE ON {item.table} BEGIN "
+            f"DELETE FROM search_index WHERE rowid = {rowid}; END",
+
+            f"CREATE TRIGGER IF NOT EXISTS {item.table}_search_au "
+            f"AFTER UPDATE OF {item.columns} ON {item.table} BEGIN "
+            f"DELETE FROM search_index WHERE rowid = {rowid}; "
+            f"INSERT INTO search_index (rowid, title, body, owner) "
+            f"VALUES ({_row(item, 'new.')}); END",
+
+            f"INSERT INTO search_index (rowid, title, body, owner) "
+            f"SELECT {_row(item, '')} FROM {item.table} "
+            f"WHERE id * {KIND_SHIFT} + {item.kind} NOT IN (SELECT rowid FROM search_index)",
+        ]
+    return ddl
+
+
+def postgresql_ddl() -> list[str]:
+    """Колонки search_vector и GIN-индексы по ним (PostgreSQL 12+)."""
+    ddl = []
+    for item in INDEXED:
+        title, body = item.document()
+        ddl += [
+            f"ALTER TABLE {item.table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('simple', {title} || ' ' || {body})) STORED",
+            f"CREATE INDEX IF NOT EXISTS ix_{item.table}_search "
+            f"ON {item.table} USING gin (search_vector)",
+        ]
+    return ddl
@@ -0,0 +1,248 @@
+"""
+Лёгкий версионный раннер миграций.
+
+create_all() создаёт только недостающие таблицы, а новые индексы и колонки
+в уже существующих базах не появляются. Здесь лежат пронумерованные шаги,
+которые доводят живую базу до текущей схемы; применённые версии
+записываются в schema_migrations. Каждый шаг идемпотентен, потому что
+на свежей базе create_all() уже создал всё сам.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    inspect,
+    insert,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection
+
+from app.core import fulltext, tagging
+
+logger = logging.getLogger(__name__)
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def create_indexes(*ddl: str) -> Callable[[Connection], None]:
+    """Шаг миграции из набора CREATE INDEX IF NOT EXISTS (работает и в SQLite, и в PostgreSQL)."""
+    return execute(*ddl)
+
+
+def add_column(table: str, column: str, ddl: str) -> Callable[[Connection], None]:
+    """
+    Шаг миграции ALTER TABLE ... ADD COLUMN.
+
+    SQLite не умеет ADD COLUMN IF NOT EXISTS, поэтому наличие колонки
+    проверяем сами (на свежей базе её уже создал create_all()).
+    """
+
+    def _apply(conn: Connection) -> None:
+        columns = {c["name"] for c in inspect(conn).get_columns(table)}
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+    return _apply
+
+
+def steps(*funcs: Callable[[Connection], None]) -> Callable[[Connection], None]:
+    """Несколько шагов в одной миграции, по порядку."""
+
+    def _apply(conn: Connection) -> None:
+        for func in funcs:
+            func(conn)
+
+    return _apply
+
+
+def per_dialect(**by_dialect: Callable[[Connection], None]) -> Callable[[Connection], None]:
+    """Шаг, разный для SQLite и PostgreSQL (per_dialect(sqlite=..., postgresql=...))."""
+
+    def _apply(conn: Connection) -> None:
+        step = by_dialect.get(conn.dialect.name)
+        if step is not None:
+            step(conn)
+
+    return _apply
+
+
+def partial_indexes(where: str, *indexes: tuple[str, str]) -> Callable[[Connection], None]:
+    """
+    Пересоздать индексы (имя, "таблица (колонки)") частичными: ... WHERE where.
+
+    Индекс с тем же именем мог остаться полным от прошлых миграций,
+    поэтому сначала DROP INDEX IF EXISTS.
+    """
+    ddl = []
+    for name, target in indexes:
+        ddl += [
+            f"DROP INDEX IF EXISTS {name}",
+            f"CREATE INDEX {name} ON {target} WHERE {where}",
+        ]
+    return execute(*ddl)
+
+
+def _mark_done_tasks_completed(conn: Connection) -> None:
+    # Когда закрыты старые задачи, неизвестно — считаем от момента миграции
+    conn.execute(
+        text("UPDATE tasks SET completed_at = :now WHERE status = 'DONE' AND completed_at IS NULL"),
+        {"now": datetime.utcnow()},
+    )
+
+
+def execute(*sql: str) -> Callable[[Connection], None]:
+    """Шаг миграции из произвольных SQL-выражений (например, бэкфилл данных)."""
+
+    def _apply(conn: Connection) -> None:
+        for statement in sql:
+            conn.execute(text(statement))
+
+    return _apply
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(
+        1,
+        "composite indexes for hot list queries",
+        create_indexes(
+            "CREATE INDEX IF NOT EXISTS ix_users_digest_slot "
+            "ON users (reminder_hour, reminder_minute, reminders_enabled)",
+            "CREATE INDEX IF NOT EXISTS ix_tasks_user_created ON tasks (user_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_tasks_project_id ON tasks (project_id)",
+            "CREATE INDEX IF NOT EXISTS ix_tasks_due_at ON tasks (due_at)",
+            "CREATE INDEX IF NOT EXISTS ix_notes_user_created ON notes (user_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_projects_user_created ON projects (user_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_subtasks_task_created ON subtasks (task_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_task_files_task_created ON task_files (task_id, created_at)",
+        ),
+    ),
+    Migration(
+        2,
+        "subtask progress counters on tasks",
+        steps(
+            add_column("tasks", "subtasks_total", "INTEGER NOT NULL DEFAULT 0"),
+            add_column("tasks", "subtasks_done", "INTEGER NOT NULL DEFAULT 0"),
+            execute(
+                "UPDATE tasks SET "
+                "subtasks_total = (SELECT COUNT(*) FROM subtasks WHERE subtasks.task_id = tasks.id), "
+                "subtasks_done = (SELECT COUNT(*) FROM subtasks "
+                "WHERE subtasks.task_id = tasks.id AND subtasks.is_done)"
+            ),
+        ),
+    ),
+    Migration(
+        3,
+        "row versions for card render cache",
+        steps(
+            add_column("tasks", "version", "INTEGER NOT NULL DEFAULT 1"),
+            add_column("notes", "version", "INTEGER NOT NULL DEFAULT 1"),
+            add_column("projects", "version", "INTEGER NOT NULL DEFAULT 1"),
+        ),
+    ),
+    Migration(
+        4,
+        "full-text search over tasks, notes and projects",
+        per_dialect(
+            sqlite=execute(*fulltext.sqlite_ddl()),
+            postgresql=execute(*fulltext.postgresql_ddl()),
+        ),
+    ),
+    Migration(
+        5,
+        "normalized note tags",
+        # таблицы tags / note_tags уже создал create_all(), осталось залить данные
+        tagging.backfill_note_tags,
+    ),
+    Migration(
+        6,
+        "indexes for task list filters",
+        create_indexes(
+            "CREATE INDEX IF NOT EXISTS ix_tasks_user_status_due "
+            "ON tasks (user_id, status, due_at)",
+            "CREATE INDEX IF NOT EXISTS ix_tasks_user_status_created "
+            "ON tasks (user_id, status, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_tasks_user_project_created "
+            "ON tasks (user_id, project_id, created_at)",
+        ),
+    ),
+    Migration(
+        7,
+        "task archive: completed_at, archived_at and partial live-task indexes",
+        steps(
+            add_column("tasks", "completed_at", "TIMESTAMP"),
+            add_column("tasks", "archived_at", "TIMESTAMP"),
+            _mark_done_tasks_completed,
+            partial_indexes(
+                "archived_at IS NULL",
+                ("ix_tasks_user_created", "tasks (user_id, created_at)"),
+                ("ix_tasks_user_status_due", "tasks (user_id, status, due_at)"),
+                ("ix_tasks_user_status_created", "tasks (user_id, status, created_at)"),
+                ("ix_tasks_user_project_created", "tasks (user_id, project_id, created_at)"),
+                ("ix_tasks_due_at", "tasks (due_at)"),
+                ("ix_tasks_status_completed", "tasks (status, completed_at)"),
+            ),
+            partial_indexes(
+                "archived_at IS NOT NULL",
+                ("ix_tasks_user_archived", "tasks (user_id, archived_at)"),
+            ),
+        ),
+    ),
+    Migration(
+        8,
+        "soft delete of projects",
+        steps(
+            add_column("projects", "deleted_at", "TIMESTAMP"),
+            execute(
+                "CREATE INDEX IF NOT EXISTS ix_projects_deleted "
+                "ON projects (deleted_at) WHERE deleted_at IS NOT NULL"
+            ),
+        ),
+    ),
+]
+
+
+def run_migrations(conn: Connection) -> None:
+    """Применить все ещё не применённые миграции (вызывается через run_sync)."""
+    _metadata.create_all(conn)
+
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+
+        logger.info("Applying migration %d: %s", migration.version, migration.description)
+        migration.apply(conn)
+        conn.execute(
+            insert(schema_migrations).values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow(),
+            )
+        )
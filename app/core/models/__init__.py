@@ -11,4 +11,7 @@ from .task import Task
 from .note import Note
 from .project import Project
 from .task_file import TaskFile
-from .subtask import SubTask
\ No newline at end of file
+from .subtask import SubTask
+from .outbox import OutboxMessage
+from .scheduler_lease import SchedulerLease
+from .tag import Tag, NoteTag
@@ -3,14 +3,19 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import Base
+from .versioned import Versioned
 
 
-class Note(Base):
+class Note(Versioned, Base):
     __tablename__ = "notes"
+    __table_args__ = (
+        # Список заметок пользователя: WHERE user_id = ? ORDER BY created_at DESC
+        Index("ix_notes_user_created", "user_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
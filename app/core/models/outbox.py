@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+from enum import Enum as PyEnum
+
+from sqlalchemy import BigInteger, ForeignKey, Index, Enum as SAEnum
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import Base
+
+
+class OutboxStatus(PyEnum):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+
+
+class OutboxMessage(Base):
+    """Исходящее уведомление, ожидающее доставки (дайджест, напоминание)."""
+
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        # Выборка очередной пачки для диспетчера
+        Index("ix_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    # Ключ идемпотентности: одно и то же уведомление не попадёт в очередь дважды
+    idempotency_key: Mapped[str] = mapped_column(unique=True)
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        index=True,
+    )
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    text: Mapped[str]
+
+    status: Mapped[OutboxStatus] = mapped_column(
+        SAEnum(OutboxStatus),
+        default=OutboxStatus.PENDING,
+    )
+    attempts: Mapped[int] = mapped_column(default=0)
+    # Время планировщика (локальное), как и due_at у задач
+    next_attempt_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    last_error: Mapped[Optional[str]] = mapped_column(default=None)
+
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    delivered_at: Mapped[Optional[datetime]] = mapped_column(default=None)
@@ -3,14 +3,26 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional, List
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import Base
+from .versioned import Versioned
 
 
-class Project(Base):
+class Project(Versioned, Base):
     __tablename__ = "projects"
+    __table_args__ = (
+        # Список проектов пользователя: WHERE user_id = ? ORDER BY created_at DESC
+        Index("ix_projects_user_created", "user_id", "created_at"),
+        # Очередь фоновой очистки удалённых проектов
+        Index(
+            "ix_projects_deleted",
+            "deleted_at",
+            sqlite_where=text("deleted_at IS NOT NULL"),
+            postgresql_where=text("deleted_at IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
@@ -23,6 +35,9 @@ class Project(Base):
     description: Mapped[Optional[str]]
 
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    # Мягкое удаление: проект сразу скрыт, а задачи с подзадачами и файлами
+    # чанками удаляет фоновая очистка (app/bot/purger.py)
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(default=None)
 
     user = relationship("User", back_populates="projects")
 
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import Base
+
+
+class SchedulerLease(Base):
+    """Аренда лидерства планировщика: рассылки делает только одна реплика."""
+
+    __tablename__ = "scheduler_leases"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    holder: Mapped[str]
+    # UTC: реплики могут жить на разных машинах
+    expires_at: Mapped[datetime]
@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import List
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import Base
@@ -11,6 +11,10 @@ from . import Base
 
 class SubTask(Base):
     __tablename__ = "subtasks"
+    __table_args__ = (
+        # Дочерние строки карточки задачи: WHERE task_id = ? ORDER BY created_at
+        Index("ix_subtasks_task_created", "task_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
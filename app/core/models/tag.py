@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import Base
+
+
+class Tag(Base):
+    """Тег пользователя; name хранится нормализованным (см. app/core/tagging.py)."""
+
+    __tablename__ = "tags"
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_tags_user_name"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+    )
+    name: Mapped[str]
+
+
+class NoteTag(Base):
+    """Связь заметка — тег."""
+
+    __tablename__ = "note_tags"
+    __table_args__ = (
+        # Заметки с тегом: WHERE tag_id = ? ORDER BY created_at DESC, note_id DESC
+        Index("ix_note_tags_tag_created", "tag_id", "created_at", "note_id"),
+    )
+
+    # Первичный ключ начинается с note_id — по нему же каскадное удаление заметки
+    note_id: Mapped[int] = mapped_column(
+        ForeignKey("notes.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    tag_id: Mapped[int] = mapped_column(
+        ForeignKey("tags.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    # Копия notes.created_at: листание по тегу идёт целиком по индексу связей
+    created_at: Mapped[datetime]
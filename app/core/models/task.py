@@ -4,10 +4,11 @@ from datetime import datetime
 from typing import Optional
 from enum import Enum as PyEnum
 
-from sqlalchemy import ForeignKey, Enum as SAEnum
+from sqlalchemy import ForeignKey, Index, Enum as SAEnum, exists, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import Base
+from .versioned import Versioned
 
 
 class TaskStatus(PyEnum):
@@ -16,8 +17,34 @@ class TaskStatus(PyEnum):
     DONE = "done"
 
 
-class Task(Base):
+def _partial_index(name: str, *columns: str, where: str) -> Index:
+    return Index(name, *columns, sqlite_where=text(where), postgresql_where=text(where))
+
+
+# Рабочие индексы — частичные, только по живым задачам: архив их не раздувает,
+# а запросы с archived_at IS NULL не касаются архивных строк вовсе
+_LIVE = "archived_at IS NULL"
+
+
+class Task(Versioned, Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Список задач пользователя: WHERE user_id = ? ORDER BY created_at DESC
+        _partial_index("ix_tasks_user_created", "user_id", "created_at", where=_LIVE),
+        # Фильтры по сроку (просроченные / сегодня / неделя):
+        # WHERE user_id = ? AND status IN (...) AND due_at BETWEEN ... ORDER BY due_at
+        _partial_index("ix_tasks_user_status_due", "user_id", "status", "due_at", where=_LIVE),
+        # Фильтр по статусу: WHERE user_id = ? AND status = ? ORDER BY created_at DESC
+        _partial_index("ix_tasks_user_status_created", "user_id", "status", "created_at", where=_LIVE),
+        # Фильтр по проекту: WHERE user_id = ? AND project_id = ? ORDER BY created_at DESC
+        _partial_index("ix_tasks_user_project_created", "user_id", "project_id", "created_at", where=_LIVE),
+        # Выборка ближайших дедлайнов движком напоминаний
+        _partial_index("ix_tasks_due_at", "due_at", where=_LIVE),
+        # Кандидаты в архив: WHERE status = DONE AND completed_at < ?
+        _partial_index("ix_tasks_status_completed", "status", "completed_at", where=_LIVE),
+        # Просмотр архива: WHERE user_id = ? ORDER BY archived_at DESC
+        _partial_index("ix_tasks_user_archived", "user_id", "archived_at", where="archived_at IS NOT NULL"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
@@ -30,6 +57,7 @@ class Task(Base):
     project_id: Mapped[Optional[int]] = mapped_column(
         ForeignKey("projects.id", ondelete="SET NULL"),
         nullable=True,
+        index=True,
     )
 
     title: Mapped[str]
@@ -43,6 +71,12 @@ class Task(Base):
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
     due_at: Mapped[Optional[datetime]] = mapped_column(default=None)
 
+    # ====== Архив ======
+    # Когда задача стала DONE; через ARCHIVE_AFTER_DAYS её уносит в архив
+    completed_at: Mapped[Optional[datetime]] = mapped_column(default=None)
+    # Не NULL — задача в архиве: списки, дайджест и напоминания её не видят
+    archived_at: Mapped[Optional[datetime]] = mapped_column(default=None)
+
     # связи
     user = relationship("User", back_populates="tasks")
     project = relationship("Project", back_populates="tasks")
@@ -57,6 +91,13 @@ class Task(Base):
         cascade="all, delete-orphan",
     )
 
+    # ====== Счётчики подзадач ======
+    # Денормализованы, чтобы карточка задачи рисовалась без чтения subtasks.
+    # Меняются в одной транзакции с подзадачами (app/core/services/subtasks.py),
+    # раз в сутки сверяются repair_subtask_counters()
+    subtasks_total: Mapped[int] = mapped_column(default=0)
+    subtasks_done: Mapped[int] = mapped_column(default=0)
+
     # ====== Напоминания по дедлайнам ======
     # Отправлено ли напоминание за 1 день до дедлайна
     remind_1day_sent: Mapped[bool] = mapped_column(default=False)
@@ -64,3 +105,20 @@ class Task(Base):
     remind_3h_sent: Mapped[bool] = mapped_column(default=False)
     # Отправлено ли напоминание за 1 час
     remind_1h_sent: Mapped[bool] = mapped_column(default=False)
+
+
+def not_in_deleted_project():
+    """
+    Условие «задача не в удалённом проекте».
+
+    Проект удаляется мягко, его задачи фоновая очистка дочищает позже;
+    до тех пор они не должны попадать ни в списки, ни в дайджест,
+    ни в напоминания. Проверка — по первичному ключу проекта на каждую
+    прочитанную задачу, так что дёшева для постраничных запросов.
+    """
+    from .project import Project
+
+    return ~exists().where(
+        Project.id == Task.project_id,
+        Project.deleted_at.is_not(None),
+    )
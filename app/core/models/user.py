@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime, date
 from typing import Optional, List
 
-from sqlalchemy import BigInteger
+from sqlalchemy import BigInteger, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from . import Base
@@ -11,6 +11,15 @@ from . import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Выборка пользователей, чей дайджест пора отправить в текущую минуту
+        Index(
+            "ix_users_digest_slot",
+            "reminder_hour",
+            "reminder_minute",
+            "reminders_enabled",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from sqlalchemy import FetchedValue, event
+from sqlalchemy.orm import Mapped, mapped_column, object_session
+
+
+class Versioned:
+    """
+    Примесь с номером версии строки.
+
+    version растёт на каждом UPDATE через ORM: в SET уходит
+    version = version + 1, а новое значение возвращается через RETURNING,
+    так что два параллельных апдейта не получат одинаковую версию.
+    Массовые update() мимо ORM должны увеличивать version сами.
+    По версии ключуется кэш отрисованных карточек (app/bot/render_cache.py).
+    """
+
+    __mapper_args__ = {"eager_defaults": True}
+
+    version: Mapped[int] = mapped_column(default=1, server_onupdate=FetchedValue())
+
+
+@event.listens_for(Versioned, "before_update", propagate=True)
+def _bump_version(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is not None and not session.is_modified(target, include_collections=False):
+        return
+    target.version = mapper.class_.version + 1
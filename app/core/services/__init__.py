@@ -0,0 +1,21 @@
+from .users import get_or_create_user
+from .subtasks import add_subtask, delete_subtask, repair_subtask_counters, toggle_subtask
+from .versions import bump_versions
+from .search import SearchHit, search
+from .tags import set_note_tags
+from .archive import archive_done_tasks
+from .purge import purge_deleted_projects
+
+__all__ = [
+    "get_or_create_user",
+    "add_subtask",
+    "toggle_subtask",
+    "delete_subtask",
+    "repair_subtask_counters",
+    "bump_versions",
+    "SearchHit",
+    "search",
+    "set_note_tags",
+    "archive_done_tasks",
+    "purge_deleted_projects",
+]
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.core.db import async_session_maker
+from app.core.models.project import Project
+from app.core.models.task import Task, TaskStatus
+from app.core.services.versions import bump_versions
+
+logger = logging.getLogger(__name__)
+
+# Сколько задач уносит в архив одна транзакция archive_done_tasks()
+ARCHIVE_CHUNK_SIZE = 2_000
+
+
+async def archive_done_tasks(
+    now: Optional[datetime] = None,
+    after_days: int = settings.archive_after_days,
+) -> int:
+    """
+    Унести в архив задачи, которые в статусе DONE дольше after_days дней.
+
+    Массовый UPDATE ... SET archived_at чанками по ARCHIVE_CHUNK_SIZE,
+    каждый чанк — короткая транзакция. Кандидаты выбираются по частичному
+    индексу (status, completed_at) живых задач. Версии задач и их проектов
+    увеличиваются: карточка задачи показывает архив, а карточка проекта
+    архивные задачи больше не перечисляет. Возвращает число задач.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=after_days)
+
+    candidates = (
+        select(Task.id)
+        .where(Task.archived_at.is_(None))
+        .where(Task.status == TaskStatus.DONE)
+        .where(Task.completed_at < cutoff)
+        .limit(ARCHIVE_CHUNK_SIZE)
+    )
+
+    archived = 0
+    while True:
+        async with async_session_maker() as session:
+            result = await session.execute(
+                update(Task)
+                .where(Task.id.in_(candidates.scalar_subquery()))
+                .values(archived_at=now, version=Task.version + 1)
+                .returning(Task.project_id)
+                .execution_options(synchronize_session=False)
+            )
+            project_ids = result.scalars().all()
+            await bump_versions(session, Project, project_ids)
+            await session.commit()
+
+        archived += len(project_ids)
+        if len(project_ids) < ARCHIVE_CHUNK_SIZE:
+            break
+
+    if archived:
+        logger.info("Archived %d done tasks", archived)
+    return archived
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import delete, select
+
+from app.core.db import async_session_maker
+from app.core.models.project import Project
+from app.core.models.subtask import SubTask
+from app.core.models.task import Task
+from app.core.models.task_file import TaskFile
+
+logger = logging.getLogger(__name__)
+
+# Сколько задач (с их подзадачами и файлами) удаляет одна транзакция
+PURGE_CHUNK_SIZE = 500
+
+
+async def purge_deleted_projects(chunk_size: int = PURGE_CHUNK_SIZE) -> int:
+    """
+    Дочистить мягко удалённые проекты (deleted_at IS NOT NULL).
+
+    Задачи проекта удаляются чанками по chunk_size: на каждый чанк —
+    своя короткая транзакция из set-based DELETE ... WHERE ... IN (...)
+    по подзадачам, файлам и самим задачам, так что большой проект
+    не держит блокировку записи и не грузится в память целиком.
+    Строка проекта удаляется последней. Возвращает число удалённых задач.
+    """
+    purged = 0
+    while True:
+        async with async_session_maker() as session:
+            project_id = (
+                await session.execute(
+                    select(Project.id)
+                    .where(Project.deleted_at.is_not(None))
+                    .order_by(Project.deleted_at)
+                    .limit(1)
+                )
+            ).scalar_one_or_none()
+            if project_id is None:
+                break
+
+            task_ids = (
+                await session.execute(
+                    select(Task.id).where(Task.project_id == project_id).limit(chunk_size)
+                )
+            ).scalars().all()
+
+            if task_ids:
+                await session.execute(delete(SubTask).where(SubTask.task_id.in_(task_ids)))
+                await session.execute(delete(TaskFile).where(TaskFile.task_id.in_(task_ids)))
+                await session.execute(delete(Task).where(Task.id.in_(task_ids)))
+            else:
+                await session.execute(delete(Project).where(Project.id == project_id))
+                logger.info("Purged deleted project %d", project_id)
+            await session.commit()
+
+        purged += len(task_ids)
+
+    return purged
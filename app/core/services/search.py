@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from html import escape
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import fulltext
+from app.core.db import engine
+
+SEARCH_LIMIT = 10
+# Больше слов в запросе не берём: длинный AND всё равно ничего не найдёт
+MAX_TERMS = 8
+
+_WORD = re.compile(r"\w+")
+# Маркеры совпадений в сниппете; в HTML превращаются после экранирования
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    kind: str       # "task" | "note" | "project"
+    id: int
+    title: str      # как есть, без HTML
+    snippet: str    # HTML: текст экранирован, совпадения — в <b>
+
+
+def search_terms(query: str) -> list[str]:
+    """Слова запроса; всё, кроме букв и цифр, отбрасывается (синтаксис FTS не пробрасываем)."""
+    return _WORD.findall(query.lower())[:MAX_TERMS]
+
+
+def _snippet_html(snippet: str) -> str:
+    return (
+        escape(snippet or "")
+        .replace(_MARK_START, "<b>")
+        .replace(_MARK_END, "</b>")
+    )
+
+
+async def search(
+    session: AsyncSession,
+    user_id: int,
+    query: str,
+    limit: int = SEARCH_LIMIT,
+) -> list[SearchHit]:
+    """
+    Поиск по задачам, заметкам и проектам пользователя, лучшие совпадения первыми.
+
+    Каждое слово ищется как префикс, все слова должны встретиться.
+    Архивные задачи и удалённые проекты с их задачами не ищутся
+    (условия live в app/core/fulltext.py).
+    SQLite — через FTS5 (search_index), PostgreSQL — через GIN-индексы tsvector.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    if engine.dialect.name == "postgresql":
+        return await _search_postgresql(session, user_id, terms, limit)
+    return await _search_sqlite(session, user_id, terms, limit)
+
+
+async def _search_sqlite(session, user_id: int, terms: list[str], limit: int) -> list[SearchHit]:
+    # owner:uN пересекается со словами внутри FTS5 — чужие документы не читаются;
+    # слова ищем только в title и body, чтобы "u1" не находило всё подряд
+    words = " ".join(f'"{term}"*' for term in terms)
+    match = f"owner:u{user_id} AND {{title body}}: ({words})"
+
+    # Скрытые строки (архивные задачи и т.п.) отсекаем проверкой исходной
+    # строки по первичному ключу — только для совпадений, а не для всей таблицы
+    live = "".join(
+        f"AND (search_index.rowid % {fulltext.KIND_SHIFT} != {item.kind} "
+        f"OR EXISTS (SELECT 1 FROM {item.table} "
+        f"WHERE {item.table}.id = search_index.rowid / {fulltext.KIND_SHIFT} "
+        f"AND {item.live})) "
+        for item in fulltext.INDEXED
+        if item.live
+    )
+
+    result = await session.execute(
+        text(
+            "SELECT rowid, title, "
+            "snippet(search_index, 1, :start, :end, '…', 12) "
+            "FROM search_index WHERE search_index MATCH :match "
+            + live +
+            # заголовок весит больше текста, owner в ранжировании не участвует
+            "ORDER BY bm25(search_index, 10.0, 1.0, 0.0) "
+            "LIMIT :limit"
+        ),
+        {"match": match, "start": _MARK_START, "end": _MARK_END, "limit": limit},
+    )
+
+    hits = []
+    for rowid, title, snippet in result.all():
+        item_id, kind = divmod(rowid, fulltext.KIND_SHIFT)
+        hits.append(SearchHit(
+            kind=fulltext.BY_KIND[kind].name,
+            id=item_id,
+            title=title,
+            snippet=_snippet_html(snippet),
+        ))
+    return hits
+
+
+async def _search_postgresql(session, user_id: int, terms: list[str], limit: int) -> list[SearchHit]:
+    # search_vector — генерируемая колонка с GIN-индексом (см. app/core/fulltext.py)
+    parts = []
+    for item in fulltext.INDEXED:
+        title, body = item.document()
+        parts.append(
+            f"SELECT {item.kind} AS kind, id, {title} AS title, {body} AS body, "
+            f"ts_rank(search_vector, to_tsquery('simple', :query)) AS rank "
+            f"FROM {item.table} "
+            f"WHERE user_id = :user_id AND search_vector @@ to_tsquery('simple', :query)"
+            + (f" AND {item.live}" if item.live else "")
+        )
+
+    # Сначала отбираем лучшие, и только для них считаем ts_headline
+    result = await session.execute(
+        text(
+            "SELECT kind, id, title, ts_headline('simple', body, to_tsquery('simple', :query), "
+            "'StartSel=' || :start || ', StopSel=' || :end || ', MaxWords=12, MinWords=4') "
+            "FROM (" + " UNION ALL ".join(parts) + " ORDER BY rank DESC LIMIT :limit) AS hits "
+            "ORDER BY rank DESC"
+        ),
+        {
+            "query": " & ".join(f"{term}:*" for term in terms),
+            "user_id": user_id,
+            "start": _MARK_START,
+            "end": _MARK_END,
+            "limit": limit,
+        },
+    )
+
+    return [
+        SearchHit(
+            kind=fulltext.BY_KIND[kind].name,
+            id=item_id,
+            title=title,
+            snippet=_snippet_html(snippet),
+        )
+        for kind, item_id, title, snippet in result.all()
+    ]
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import async_session_maker
+from app.core.models.subtask import SubTask
+from app.core.models.task import Task
+
+logger = logging.getLogger(__name__)
+
+# Сколько задач пересчитывает одна транзакция repair_subtask_counters()
+REPAIR_CHUNK_SIZE = 5_000
+
+
+async def add_subtask(
+    session: AsyncSession,
+    task_id: int,
+    user_id: int,
+    title: str,
+) -> SubTask:
+    """
+    Добавить подзадачу и увеличить счётчик задачи (коммит — на вызывающем).
+
+    Счётчики видны в карточке задачи, поэтому каждое их изменение
+    увеличивает и Task.version.
+    """
+    subtask = SubTask(task_id=task_id, user_id=user_id, title=title, is_done=False)
+    session.add(subtask)
+    await session.flush()
+
+    await session.execute(
+        update(Task)
+        .where(Task.id == task_id)
+        .values(subtasks_total=Task.subtasks_total + 1, version=Task.version + 1)
+    )
+    return subtask
+
+
+async def toggle_subtask(
+    session: AsyncSession,
+    subtask_id: int,
+    user_id: int,
+) -> Optional[int]:
+    """
+    Переключить выполнено/невыполнено; вернуть task_id или None,
+    если подзадачи нет или она чужая.
+
+    Флаг переворачивается одним UPDATE ... RETURNING, так что два быстрых
+    нажатия подряд не собьют subtasks_done.
+    """
+    result = await session.execute(
+        update(SubTask)
+        .where(SubTask.id == subtask_id, SubTask.user_id == user_id)
+        .values(is_done=~SubTask.is_done)
+        .returning(SubTask.task_id, SubTask.is_done)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+
+    task_id, is_done = row
+    await session.execute(
+        update(Task)
+        .where(Task.id == task_id)
+        .values(
+            subtasks_done=Task.subtasks_done + (1 if is_done else -1),
+            version=Task.version + 1,
+        )
+    )
+    return task_id
+
+
+async def delete_subtask(
+    session: AsyncSession,
+    subtask_id: int,
+    user_id: int,
+) -> Optional[int]:
+    """Удалить подзадачу и поправить счётчики; вернуть task_id или None."""
+    result = await session.execute(
+        delete(SubTask)
+        .where(SubTask.id == subtask_id, SubTask.user_id == user_id)
+        .returning(SubTask.task_id, SubTask.is_done)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+
+    task_id, was_done = row
+    await session.execute(
+        update(Task)
+        .where(Task.id == task_id)
+        .values(
+            subtasks_total=Task.subtasks_total - 1,
+            subtasks_done=Task.subtasks_done - (1 if was_done else 0),
+            version=Task.version + 1,
+        )
+    )
+    return task_id
+
+
+async def repair_subtask_counters() -> int:
+    """
+    Пересчитать subtasks_total/subtasks_done по таблице subtasks.
+
+    Страховка от рассинхрона (ручные правки БД, баги): идём по tasks.id
+    чанками, каждый чанк — отдельная короткая транзакция.
+    Возвращает число исправленных задач.
+    """
+    total_sub = (
+        select(func.count())
+        .where(SubTask.task_id == Task.id)
+        .correlate(Task)
+        .scalar_subquery()
+    )
+    done_sub = (
+        select(func.coalesce(func.sum(case((SubTask.is_done, 1), else_=0)), 0))
+        .where(SubTask.task_id == Task.id)
+        .correlate(Task)
+        .scalar_subquery()
+    )
+
+    fixed = 0
+    after_id = 0
+    while True:
+        async with async_session_maker() as session:
+            ids = (await session.execute(
+                select(Task.id)
+                .where(Task.id > after_id)
+                .order_by(Task.id)
+                .limit(REPAIR_CHUNK_SIZE)
+            )).scalars().all()
+            if not ids:
+                break
+
+            result = await session.execute(
+                update(Task)
+                .where(Task.id.between(ids[0], ids[-1]))
+                .where(
+                    (Task.subtasks_total != total_sub)
+                    | (Task.subtasks_done != done_sub)
+                )
+                .values(
+                    subtasks_total=total_sub,
+                    subtasks_done=done_sub,
+                    version=Task.version + 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+        fixed += result.rowcount or 0
+        after_id = ids[-1]
+
+    if fixed:
+        logger.warning("Subtask counters repaired for %d tasks", fixed)
+    return fixed
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import dialect_insert
+from app.core.models.tag import NoteTag, Tag
+
+
+async def set_note_tags(
+    session: AsyncSession,
+    user_id: int,
+    note_id: int,
+    created_at: datetime,
+    names: list[str],
+) -> None:
+    """
+    Привязать к новой заметке теги (имена — из tagging.parse_tags).
+
+    Недостающие теги пользователя создаются одним
+    INSERT ... ON CONFLICT DO NOTHING, связи — одним INSERT.
+    """
+    if not names:
+        return
+
+    await session.execute(
+        dialect_insert(Tag)
+        .values([{"user_id": user_id, "name": name} for name in names])
+        .on_conflict_do_nothing(index_elements=[Tag.user_id, Tag.name])
+    )
+    tag_ids = (
+        await session.execute(
+            select(Tag.id).where(Tag.user_id == user_id, Tag.name.in_(names))
+        )
+    ).scalars().all()
+
+    await session.execute(
+        insert(NoteTag),
+        [
+            {"note_id": note_id, "tag_id": tag_id, "created_at": created_at}
+            for tag_id in tag_ids
+        ],
+    )
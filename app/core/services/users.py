@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import dialect_insert
+from app.core.models.user import User
+
+
+async def get_or_create_user(
+    session: AsyncSession,
+    telegram_id: int,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    username: Optional[str] = None,
+) -> User:
+    """
+    Найти пользователя по telegram_id или зарегистрировать его.
+
+    Обычный случай — один SELECT. Если пользователя нет или у него
+    поменялись имя/username, выполняется один атомарный
+    INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... RETURNING,
+    поэтому два параллельных апдейта от нового пользователя
+    не упираются в уникальный индекс. Коммит — на стороне вызывающего.
+    """
+    result = await session.execute(
+        select(User).where(User.telegram_id == telegram_id)
+    )
+    user = result.scalar_one_or_none()
+
+    if user is not None and (
+        user.first_name == first_name
+        and user.last_name == last_name
+        and user.username == username
+    ):
+        return user
+
+    stmt = dialect_insert(User).values(
+        telegram_id=telegram_id,
+        first_name=first_name,
+        last_name=last_name,
+        username=username,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={
+            "first_name": stmt.excluded.first_name,
+            "last_name": stmt.excluded.last_name,
+            "username": stmt.excluded.username,
+        },
+    ).returning(User)
+
+    result = await session.execute(
+        stmt,
+        execution_options={"populate_existing": True},
+    )
+    return result.scalar_one()
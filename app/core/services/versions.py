@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def bump_versions(session: AsyncSession, model, ids: Iterable[Optional[int]]) -> None:
+    """
+    Увеличить version у строк model (Task, Note, Project) мимо ORM.
+
+    Нужно, когда меняется то, что рисуется в чужой карточке:
+    например, задачи проекта видны в карточке проекта.
+    None в ids пропускаются (задача без проекта).
+    """
+    ids = {item_id for item_id in ids if item_id is not None}
+    if not ids:
+        return
+
+    await session.execute(
+        update(model)
+        .where(model.id.in_(ids))
+        .values(version=model.version + 1)
+    )
@@ -0,0 +1,92 @@
+"""
+Разбор тегов заметок.
+
+Note.tags остаётся строкой «как ввёл пользователь» — её показывает карточка
+и по ней ищет полнотекстовый поиск. Для фильтрации теги раскладываются
+в tags / note_tags: одно и то же имя у пользователя — один тег,
+регистр и ведущая # не важны.
+"""
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+
+MAX_TAG_LENGTH = 64
+# Больше тегов у одной заметки не заводим
+MAX_TAGS_PER_NOTE = 20
+
+BACKFILL_BATCH = 1_000
+
+_SPACES = re.compile(r"\s+")
+
+
+def parse_tags(raw: Optional[str]) -> list[str]:
+    """'Работа, #идеи,работа' -> ['работа', 'идеи']."""
+    names: list[str] = []
+    for part in (raw or "").split(","):
+        name = _SPACES.sub(" ", part.strip().lstrip("#").strip()).lower()[:MAX_TAG_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names[:MAX_TAGS_PER_NOTE]
+
+
+def backfill_note_tags(conn: Connection) -> None:
+    """
+    Шаг миграции: разложить Note.tags уже существующих заметок по tags / note_tags.
+
+    Идёт пачками по id, так что большая таблица заметок не читается целиком.
+    ON CONFLICT DO NOTHING одинаково работает в SQLite и PostgreSQL.
+    """
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, user_id, tags, created_at FROM notes "
+                "WHERE id > :last_id AND tags IS NOT NULL "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH},
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+
+        parsed = [(row, parse_tags(row.tags)) for row in rows]
+        pairs = {(row.user_id, name) for row, names in parsed for name in names}
+        if not pairs:
+            continue
+
+        conn.execute(
+            text(
+                "INSERT INTO tags (user_id, name) VALUES (:user_id, :name) "
+                "ON CONFLICT (user_id, name) DO NOTHING"
+            ),
+            [{"user_id": user_id, "name": name} for user_id, name in pairs],
+        )
+        tag_ids = {
+            (user_id, name): tag_id
+            for tag_id, user_id, name in conn.execute(
+                text("SELECT id, user_id, name FROM tags WHERE user_id IN :user_ids")
+                .bindparams(bindparam("user_ids", expanding=True)),
+                {"user_ids": sorted({user_id for user_id, _ in pairs})},
+            )
+        }
+        conn.execute(
+            text(
+                "INSERT INTO note_tags (note_id, tag_id, created_at) "
+                "VALUES (:note_id, :tag_id, :created_at) "
+                "ON CONFLICT DO NOTHING"
+            ),
+            [
+                {
+                    "note_id": row.id,
+                    "tag_id": tag_ids[(row.user_id, name)],
+                    "created_at": row.created_at,
+                }
+                for row, names in parsed
+                for name in names
+            ],
+        )
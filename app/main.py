@@ -12,6 +12,8 @@ from app.bot.routers.tasks import tasks_router
 from app.bot.routers.notes import notes_router
 from app.bot.routers.projects import projects_router
 from app.bot.routers.settings import settings_router
+from app.bot.routers.search import search_router
+from app.bot.middlewares import DbSessionMiddleware, UserMiddleware
 from app.core.db import init_db
 
 
@@ -30,8 +32,15 @@ async def main():
 
     dp = Dispatcher()
 
+    # Одна сессия БД на апдейт: хендлеры получают её как session
+    dp.update.outer_middleware(DbSessionMiddleware())
+    # Пользователь из БД резолвится один раз на апдейт (с кэшем в памяти)
+    dp.update.outer_middleware(UserMiddleware())
+
     dp.include_routers(
         common_router,
+        # /search — раньше роутеров с FSM-состояниями, чтобы работал в любом шаге
+        search_router,
         tasks_router,
         notes_router,
         projects_router,
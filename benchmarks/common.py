@@ -0,0 +1,83 @@
+"""Общие инструменты бенчмарков: фейковый бот и счётчики запросов/строк/памяти."""
+from __future__ import annotations
+
+import resource
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class FakeBot:
+    """Вместо Telegram: просто запоминает, что и кому отправили бы."""
+
+    def __init__(self) -> None:
+        self.sent: list[tuple[int, str]] = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+@dataclass
+class PhaseStats:
+    name: str
+    elapsed: float = 0.0
+    queries: int = 0
+    rows: int = 0
+    peak_mem: int = 0
+    sends: int = 0
+    extra: dict = field(default_factory=dict)
+
+    def line(self) -> str:
+        return (
+            f"{self.name:<18} {self.elapsed * 1000:>10.1f} ms"
+            f" {self.queries:>8} q {self.rows:>10} rows"
+            f" {self.peak_mem / 1024 / 1024:>8.1f} MiB {self.sends:>8} sends"
+        )
+
+
+class DbCounter:
+    """Считает SQL-запросы на движке и строки, загруженные через сессии."""
+
+    def __init__(self, engine) -> None:
+        self.queries = 0
+        self.rows = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_query)
+        event.listen(Session, "do_orm_execute", self._on_orm_execute)
+
+    def _on_query(self, *args) -> None:
+        self.queries += 1
+
+    def _on_orm_execute(self, state):
+        if not state.is_select:
+            return None
+        # Буферизуем результат, чтобы посчитать строки, и отдаём копию дальше
+        frozen = state.invoke_statement().freeze()
+        self.rows += len(frozen.data)
+        return frozen()
+
+
+@asynccontextmanager
+async def measure(name: str, counter: DbCounter, bot: FakeBot):
+    stats = PhaseStats(name)
+    queries, rows, sends = counter.queries, counter.rows, len(bot.sent)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.elapsed = time.perf_counter() - started
+        _, stats.peak_mem = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats.queries = counter.queries - queries
+        stats.rows = counter.rows - rows
+        stats.sends = len(bot.sent) - sends
+
+
+def max_rss_mib() -> float:
+    # ru_maxrss в Linux — в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
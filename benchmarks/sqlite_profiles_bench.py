@@ -0,0 +1,176 @@
+"""
+Сравнение профилей хранилища SQLite (durable / balanced / fast) на нагрузке хендлеров.
+
+Запуск:
+
+    python -m benchmarks.sqlite_profiles_bench
+    python -m benchmarks.sqlite_profiles_bench --profiles balanced fast --seconds 20
+
+Параллельные «хендлеры» читают списки, создают задачи/заметки/подзадачи
+и меняют статусы, а рядом крутится тик дайджеста с крупными записями —
+ровно та ситуация, в которой раньше ловили "database is locked".
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_PROFILES = ("durable", "balanced", "fast")
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--profiles", nargs="+", default=list(DEFAULT_PROFILES))
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--workers", type=int, default=16, help="параллельных хендлеров")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+async def _run_single(args) -> None:
+    profile = args.profiles[0]
+    workdir = tempfile.mkdtemp(prefix="pwb-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    os.environ["SQLITE_PROFILE"] = profile
+    os.environ.setdefault("BOT_TOKEN", "0:bench")
+
+    from sqlalchemy import select, update
+    from sqlalchemy.exc import OperationalError
+
+    from app.bot.scheduler import daily_digest
+    from app.core.db import async_session_maker, engine, init_db
+    from app.core.models.note import Note
+    from app.core.services.subtasks import add_subtask as add_subtask_with_counter
+    from app.core.models.task import Task, TaskStatus
+    from app.core.models.user import User
+
+    from benchmarks.synthetic import DIGEST_AT, WorkspaceShape, generate_workspace
+
+    await init_db()
+    await generate_workspace(engine, WorkspaceShape(users=args.users))
+
+    latencies: dict[str, list[float]] = {}
+    errors = {"locked": 0, "other": 0}
+    deadline = time.perf_counter() + args.seconds
+
+    async def list_tasks(session, user_id):
+        await session.execute(
+            select(Task)
+            .where(Task.user_id == user_id)
+            .order_by(Task.created_at.desc())
+            .limit(10)
+        )
+
+    async def create_task(session, user_id):
+        session.add(Task(user_id=user_id, title="Новая задача", status=TaskStatus.TODO))
+        await session.commit()
+
+    async def cycle_status(session, user_id):
+        result = await session.execute(
+            select(Task).where(Task.user_id == user_id).limit(1)
+        )
+        task = result.scalar_one_or_none()
+        if task is not None:
+            task.status = TaskStatus.DONE if task.status != TaskStatus.DONE else TaskStatus.TODO
+            await session.commit()
+
+    async def create_note(session, user_id):
+        session.add(Note(user_id=user_id, title="Заметка", content="Текст"))
+        await session.commit()
+
+    async def add_subtask(session, user_id):
+        result = await session.execute(
+            select(Task.id).where(Task.user_id == user_id).limit(1)
+        )
+        task_id = result.scalar_one_or_none()
+        if task_id is not None:
+            await add_subtask_with_counter(session, task_id, user_id, "Шаг")
+            await session.commit()
+
+    operations = [
+        (list_tasks, 0.4),
+        (create_task, 0.2),
+        (cycle_status, 0.2),
+        (create_note, 0.1),
+        (add_subtask, 0.1),
+    ]
+
+    async def handler_worker(seed: int):
+        rng = random.Random(seed)
+        funcs, weights = zip(*operations)
+        while time.perf_counter() < deadline:
+            op = rng.choices(funcs, weights)[0]
+            user_id = rng.randint(1, args.users)
+            started = time.perf_counter()
+            try:
+                async with async_session_maker() as session:
+                    await op(session, user_id)
+            except OperationalError as e:
+                errors["locked" if "locked" in str(e) else "other"] += 1
+                continue
+            latencies.setdefault(op.__name__, []).append(time.perf_counter() - started)
+
+    async def digest_writer():
+        # Тик с крупной записью: сбрасываем отметки и заново «рассылаем» слот 09:00
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with async_session_maker() as session:
+                    await session.execute(update(User).values(last_digest_date=None))
+                    await session.commit()
+                await daily_digest(DIGEST_AT)
+            except OperationalError as e:
+                errors["locked" if "locked" in str(e) else "other"] += 1
+                continue
+            latencies.setdefault("digest_tick", []).append(time.perf_counter() - started)
+            await asyncio.sleep(0.5)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        digest_writer(),
+        *(handler_worker(seed) for seed in range(args.workers)),
+    )
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    handler_ops = sum(len(v) for k, v in latencies.items() if k != "digest_tick")
+    print(f"\n=== profile {profile}: {handler_ops / elapsed:.0f} handler ops/s, "
+          f"locked={errors['locked']} other_errors={errors['other']} ===")
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        p95 = values[int(len(values) * 0.95) - 1] if len(values) > 1 else values[0]
+        print(
+            f"{name:<14} n={len(values):>6}"
+            f"  p50={statistics.median(values) * 1000:>8.1f} ms"
+            f"  p95={p95 * 1000:>8.1f} ms"
+        )
+
+
+def main(argv=None) -> None:
+    args = _parse_args(argv)
+
+    if args.single:
+        asyncio.run(_run_single(args))
+        return
+
+    for profile in args.profiles:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.sqlite_profiles_bench", "--single",
+             "--profiles", profile,
+             "--users", str(args.users),
+             "--workers", str(args.workers),
+             "--seconds", str(args.seconds)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Генератор синтетического рабочего пространства для бенчмарков.
+
+Заливает во временную БД N пользователей, у каждого — задачи, заметки,
+проекты, подзадачи и файлы. Дедлайны распределены примерно как в жизни:
+часть задач без дедлайна, часть просрочена, остальные — в ближайшие недели.
+"""
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from app.core.models.user import User
+from app.core.models.task import Task, TaskStatus
+from app.core.models.note import Note
+from app.core.models.project import Project
+from app.core.models.subtask import SubTask
+from app.core.models.task_file import TaskFile
+
+
+@dataclass
+class WorkspaceShape:
+    users: int = 1000
+    tasks_per_user: int = 8
+    notes_per_user: int = 5
+    projects_per_user: int = 2
+    subtasks_per_task: int = 2
+    files_per_task: int = 1
+    # Доля пользователей с дефолтным временем дайджеста 09:00
+    default_slot_share: float = 0.6
+    seed: int = 42
+
+
+# Точка отсчёта бенчмарка: сюда попадает слот 09:00 и часть дедлайнов
+BASE_DAY = date(2025, 3, 10)
+DIGEST_AT = datetime(BASE_DAY.year, BASE_DAY.month, BASE_DAY.day, 9, 0)
+# В 22:59 срабатывают напоминания «за 1 час» по задачам на BASE_DAY
+# и «за 1 день» по задачам на следующий день (дедлайны всегда в 23:59)
+REMINDERS_AT = datetime(BASE_DAY.year, BASE_DAY.month, BASE_DAY.day, 22, 59)
+
+BATCH = 5_000
+
+
+def _due_at(rng: random.Random):
+    roll = rng.random()
+    if roll < 0.4:
+        return None
+    if roll < 0.55:
+        day = BASE_DAY - timedelta(days=rng.randint(1, 30))
+    else:
+        day = BASE_DAY + timedelta(days=rng.randint(0, 21))
+    return datetime(day.year, day.month, day.day, 23, 59)
+
+
+async def _flush(conn, model, rows: list[dict]) -> None:
+    if rows:
+        await conn.execute(insert(model), rows)
+        rows.clear()
+
+
+async def generate_workspace(engine, shape: WorkspaceShape) -> dict[str, int]:
+    """Залить синтетические данные; вернуть число строк по таблицам."""
+    rng = random.Random(shape.seed)
+    counts = {"users": 0, "tasks": 0, "notes": 0, "projects": 0, "subtasks": 0, "task_files": 0}
+    created = datetime(BASE_DAY.year, BASE_DAY.month, BASE_DAY.day) - timedelta(days=60)
+
+    users, tasks, notes, projects, subtasks, files = [], [], [], [], [], []
+    task_id = 0
+    project_id = 0
+
+    async with engine.begin() as conn:
+        for user_id in range(1, shape.users + 1):
+            if rng.random() < shape.default_slot_share:
+                hour, minute = 9, 0
+            else:
+                hour, minute = rng.randint(0, 23), rng.choice((0, 15, 30, 45))
+
+            users.append({
+                "id": user_id,
+                "telegram_id": 10_000_000 + user_id,
+                "first_name": f"user{user_id}",
+                "reminder_hour": hour,
+                "reminder_minute": minute,
+                "reminders_enabled": rng.random() < 0.9,
+                "deadline_reminders_enabled": rng.random() < 0.9,
+                "created_at": created,
+            })
+
+            user_projects = []
+            for _ in range(shape.projects_per_user):
+                project_id += 1
+                user_projects.append(project_id)
+                projects.append({
+                    "id": project_id,
+                    "user_id": user_id,
+                    "name": f"Проект {project_id}",
+                    "description": "Синтетический проект",
+                    "created_at": created + timedelta(minutes=rng.randint(0, 80_000)),
+                })
+
+            for _ in range(shape.tasks_per_user):
+                task_id += 1
+                done_flags = [rng.random() < 0.5 for _ in range(shape.subtasks_per_task)]
+                tasks.append({
+                    "id": task_id,
+                    "user_id": user_id,
+                    "project_id": rng.choice(user_projects) if user_projects and rng.random() < 0.5 else None,
+                    "title": f"Задача {task_id}",
+                    "description": "Описание синтетической задачи",
+                    "status": rng.choice(list(TaskStatus)),
+                    "created_at": created + timedelta(minutes=rng.randint(0, 80_000)),
+                    "due_at": _due_at(rng),
+                    "subtasks_total": len(done_flags),
+                    "subtasks_done": sum(done_flags),
+                })
+                for n, is_done in enumerate(done_flags):
+                    subtasks.append({
+                        "task_id": task_id,
+                        "user_id": user_id,
+                        "title": f"Подзадача {n + 1}",
+                        "is_done": is_done,
+                        "created_at": created,
+                    })
+                for n in range(shape.files_per_task):
+                    files.append({
+                        "task_id": task_id,
+                        "user_id": user_id,
+                        "telegram_file_id": f"file-{task_id}-{n}",
+                        "telegram_unique_id": f"uniq-{task_id}-{n}",
+                        "file_name": f"report_{task_id}_{n}.pdf",
+                        "mime_type": "application/pdf",
+                        "file_size": 100_000,
+                        "created_at": created,
+                    })
+
+            for n in range(shape.notes_per_user):
+                # часть заметок — «со вчера», чтобы попасть в дайджест
+                age = timedelta(hours=rng.randint(1, 20)) if n == 0 else timedelta(days=rng.randint(2, 60))
+                notes.append({
+                    "user_id": user_id,
+                    "title": f"Заметка {n + 1}",
+                    "content": "Текст синтетической заметки " * 3,
+                    "tags": "работа, идеи" if n % 2 else None,
+                    "created_at": DIGEST_AT - age,
+                    "updated_at": DIGEST_AT - age,
+                })
+
+            counts["users"] += 1
+            counts["projects"] += shape.projects_per_user
+            counts["tasks"] += shape.tasks_per_user
+            counts["subtasks"] += shape.tasks_per_user * shape.subtasks_per_task
+            counts["task_files"] += shape.tasks_per_user * shape.files_per_task
+            counts["notes"] += shape.notes_per_user
+
+            if len(tasks) >= BATCH or user_id == shape.users:
+                # порядок важен из-за внешних ключей
+                await _flush(conn, User, users)
+                await _flush(conn, Project, projects)
+                await _flush(conn, Task, tasks)
+                await _flush(conn, SubTask, subtasks)
+                await _flush(conn, TaskFile, files)
+                await _flush(conn, Note, notes)
+
+        # id вставлялись явно — на PostgreSQL надо подвинуть последовательности
+        if conn.dialect.name == "postgresql":
+            for table in ("users", "projects", "tasks"):
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+                ))
+
+    return counts
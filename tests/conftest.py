@@ -0,0 +1,78 @@
+"""
+Общие фикстуры: каждый тест гоняется на SQLite и, если задан
+TEST_DATABASE_URL, ещё и на PostgreSQL.
+
+    TEST_DATABASE_URL=postgresql+asyncpg://postgres@localhost/bot_test pytest
+
+Внимание: схема public в этой базе пересоздаётся перед каждым тестом.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+os.environ.setdefault("BOT_TOKEN", "test")
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+import app.core.db as db
+from app.config import settings
+
+POSTGRES_URL = os.environ.get("TEST_DATABASE_URL")
+
+BACKENDS = [
+    "sqlite",
+    pytest.param(
+        "postgresql",
+        marks=pytest.mark.skipif(not POSTGRES_URL, reason="TEST_DATABASE_URL не задан"),
+    ),
+]
+
+
+@dataclass
+class Database:
+    backend: str
+    engine: AsyncEngine
+    session_maker: async_sessionmaker
+
+    def run(self, scenario: Callable[[], Awaitable[None]]) -> None:
+        """Выполнить сценарий на свежей схеме в своём event loop."""
+        asyncio.run(self._run(scenario))
+
+    async def _run(self, scenario) -> None:
+        try:
+            if self.backend == "postgresql":
+                async with self.engine.begin() as conn:
+                    await conn.execute(text("DROP SCHEMA public CASCADE"))
+                    await conn.execute(text("CREATE SCHEMA public"))
+            await db.init_db()
+            await scenario()
+        finally:
+            await self.engine.dispose()
+
+
+@pytest.fixture(params=BACKENDS)
+def database(request, tmp_path, monkeypatch) -> Database:
+    backend = request.param
+    url = POSTGRES_URL if backend == "postgresql" else f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+
+    engine = db.create_engine_from_settings(settings.model_copy(update={"database_url": url}))
+    session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    # Модули берут engine и async_session_maker через from-import —
+    # подменяем везде, где осела ссылка на глобальные объекты
+    originals = {"engine": db.engine, "async_session_maker": db.async_session_maker}
+    replacements = {"engine": engine, "async_session_maker": session_maker}
+    for module in list(sys.modules.values()):
+        if not getattr(module, "__name__", "").startswith("app."):
+            continue
+        for name, original in originals.items():
+            if getattr(module, name, None) is original:
+                monkeypatch.setattr(module, name, replacements[name])
+
+    return Database(backend, engine, session_maker)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from sqlalchemy import delete, func, select
+
+from app.core import db
+from app.core.migrations import MIGRATIONS, schema_migrations
+from app.core.models.note import Note
+from app.core.models.tag import NoteTag, Tag
+from app.core.models.task import Task, TaskStatus
+from app.core.models.user import User
+from app.core.services.users import get_or_create_user
+
+
+def test_init_db_is_idempotent(database):
+    async def scenario():
+        # Повторный запуск (рестарт бота) ничего не ломает и не применяет заново
+        await db.init_db()
+
+        async with database.session_maker() as session:
+            versions = (await session.execute(select(schema_migrations.c.version))).scalars().all()
+
+        assert sorted(versions) == sorted(m.version for m in MIGRATIONS)
+
+    database.run(scenario)
+
+
+def test_migrations_backfill_existing_rows(database):
+    async def scenario():
+        async with database.session_maker() as session:
+            user = User(telegram_id=1)
+            session.add(user)
+            await session.flush()
+            session.add(Task(user_id=user.id, title="done", status=TaskStatus.DONE))
+            session.add(Task(user_id=user.id, title="open", status=TaskStatus.TODO))
+            session.add(Note(user_id=user.id, title="n", content="c", tags="#Work, дом"))
+            await session.commit()
+
+            # Как будто база пришла из версии до тегов и архива
+            await session.execute(
+                delete(schema_migrations).where(schema_migrations.c.version.in_([5, 7]))
+            )
+            await session.commit()
+
+        await db.init_db()
+
+        async with database.session_maker() as session:
+            completed = dict(
+                (await session.execute(select(Task.title, Task.completed_at))).all()
+            )
+            tags = (
+                await session.execute(
+                    select(Tag.name).join(NoteTag, NoteTag.tag_id == Tag.id)
+                )
+            ).scalars().all()
+
+        assert completed["done"] is not None
+        assert completed["open"] is None
+        assert sorted(tags) == ["work", "дом"]
+
+    database.run(scenario)
+
+
+def test_get_or_create_user_upserts(database):
+    async def scenario():
+        async with database.session_maker() as session:
+            created = await get_or_create_user(session, 42, first_name="Ann", username="ann")
+            await session.commit()
+
+        async with database.session_maker() as session:
+            same = await get_or_create_user(session, 42, first_name="Ann", username="ann")
+            renamed = await get_or_create_user(session, 42, first_name="Anna", username="anna")
+            await session.commit()
+
+            count = (await session.execute(select(func.count()).select_from(User))).scalar()
+
+        assert same.id == created.id == renamed.id
+        assert renamed.first_name == "Anna" and renamed.username == "anna"
+        assert count == 1
+
+    database.run(scenario)
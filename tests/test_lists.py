@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from app.bot.pagination import PAGE_SIZE, fetch_page
+from app.bot.routers.tasks import _tasks_list_query, resolve_task_filter
+from app.core.models.note import Note
+from app.core.models.project import Project
+from app.core.models.task import Task, TaskStatus
+from app.core.models.user import User
+from app.core.services.search import search
+
+NOW = datetime(2025, 3, 10, 12, 0)
+
+
+async def _user(session, telegram_id: int = 1) -> int:
+    user = User(telegram_id=telegram_id)
+    session.add(user)
+    await session.flush()
+    return user.id
+
+
+async def _titles(session, flt, **page_kwargs) -> list[str]:
+    page = await fetch_page(
+        session, flt.stmt, Task, key=flt.key, newest_first=flt.newest_first, **page_kwargs
+    )
+    return [task.title for task in page.items]
+
+
+def test_task_list_keyset_pages(database):
+    async def scenario():
+        async with database.session_maker() as session:
+            user_id = await _user(session)
+            # Одинаковый created_at у пары задач — граница страницы добивается по id
+            session.add_all(
+                Task(user_id=user_id, title=f"t{i:02}", created_at=NOW - timedelta(minutes=i // 2))
+                for i in range(25)
+            )
+            await session.commit()
+
+            seen = []
+            page = await fetch_page(session, _tasks_list_query(user_id), Task)
+            assert not page.has_prev and page.has_next
+            while True:
+                assert len(page.items) <= PAGE_SIZE
+                seen += [task.title for task in page.items]
+                if not page.has_next:
+                    break
+                page = await fetch_page(session, _tasks_list_query(user_id), Task, "next", page.last)
+
+            assert len(seen) == len(set(seen)) == 25
+
+            back = await fetch_page(session, _tasks_list_query(user_id), Task, "prev", page.first)
+            assert [task.title for task in back.items] == seen[-len(page.items) - PAGE_SIZE:-len(page.items)]
+
+    database.run(scenario)
+
+
+def test_task_filters(database):
+    async def scenario():
+        async with database.session_maker() as session:
+            user_id = await _user(session)
+            project = Project(user_id=user_id, name="Работа")
+            deleted = Project(user_id=user_id, name="Старое", deleted_at=NOW)
+            session.add_all([project, deleted])
+            await session.flush()
+
+            session.add_all([
+                Task(user_id=user_id, title="overdue", due_at=NOW - timedelta(days=1)),
+                Task(user_id=user_id, title="today", due_at=NOW + timedelta(hours=3),
+                     status=TaskStatus.IN_PROGRESS, project_id=project.id),
+                Task(user_id=user_id, title="week", due_at=NOW + timedelta(days=3)),
+                Task(user_id=user_id, title="done", status=TaskStatus.DONE, due_at=NOW - timedelta(days=2)),
+                Task(user_id=user_id, title="archived", status=TaskStatus.DONE, archived_at=NOW),
+                Task(user_id=user_id, title="purging", project_id=deleted.id, due_at=NOW),
+            ])
+            await session.commit()
+
+            async def titles(flt: str) -> list[str]:
+                return await _titles(session, await resolve_task_filter(session, user_id, flt, NOW))
+
+            assert await titles("todo") == ["week", "overdue"]
+            assert await titles("prog") == ["today"]
+            assert await titles("done") == ["done"]
+            assert await titles("overdue") == ["overdue"]
+            assert await titles("today") == ["today"]
+            assert await titles("week") == ["today", "week"]
+            assert await titles(f"p{project.id}") == ["today"]
+            assert await titles("arch") == ["archived"]
+
+            # Фильтр по удалённому проекту недоступен, его задач нет в списке
+            assert await resolve_task_filter(session, user_id, f"p{deleted.id}", NOW) is None
+            page = await fetch_page(session, _tasks_list_query(user_id), Task)
+            assert "purging" not in [task.title for task in page.items]
+
+    database.run(scenario)
+
+
+def test_search_by_prefix_and_owner(database):
+    async def scenario():
+        async with database.session_maker() as session:
+            user_id = await _user(session)
+            stranger_id = await _user(session, telegram_id=2)
+            deleted = Project(user_id=user_id, name="Отчётность", deleted_at=NOW)
+            session.add(deleted)
+            await session.flush()
+            session.add_all([
+                Task(user_id=user_id, title="Подготовить отчёт"),
+                Note(user_id=user_id, title="Итоги", content="квартальный отчёт готов"),
+                Project(user_id=user_id, name="Ремонт"),
+                Task(user_id=stranger_id, title="Чужой отчёт"),
+                Task(user_id=user_id, title="Старый отчёт", status=TaskStatus.DONE, archived_at=NOW),
+                # Проект удалён, очистка ещё не прошла — ни он, ни его задачи не ищутся
+                Task(user_id=user_id, title="Отчёт в удалённом проекте", project_id=deleted.id),
+            ])
+            await session.commit()
+
+            hits = await search(session, user_id, "отч")
+            assert sorted(hit.kind for hit in hits) == ["note", "task"]
+            assert {hit.title for hit in hits} == {"Подготовить отчёт", "Итоги"}
+
+            assert [hit.title for hit in await search(session, user_id, "квартал отч")] == ["Итоги"]
+            assert await search(session, stranger_id, "ремонт") == []
+
+    database.run(scenario)
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.bot import outbox
+from app.bot.leader import LeaderLease
+from app.core.models.outbox import OutboxMessage, OutboxStatus
+from app.core.models.scheduler_lease import SchedulerLease
+from app.core.models.user import User
+
+
+class FakePipeline:
+    """send_pipeline без Telegram: запоминает отправки, chat_id из fail_chats «падают»."""
+
+    def __init__(self, fail_chats=()):
+        self.sent: list[int] = []
+        self.fail_chats = set(fail_chats)
+
+    async def send_batch(self, messages, label="batch"):
+        results = []
+        for message in messages:
+            await asyncio.sleep(0)  # даём поработать параллельному drain()
+            ok = message.chat_id not in self.fail_chats
+            if ok:
+                self.sent.append(message.chat_id)
+            results.append(ok)
+        return results, None
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    fake = FakePipeline()
+    monkeypatch.setattr(outbox, "send_pipeline", fake)
+    monkeypatch.setattr(outbox, "leader_lease", LeaderLease())
+    return fake
+
+
+async def _enqueue(session_maker, count: int, key_prefix: str = "k") -> None:
+    async with session_maker() as session:
+        user = User(telegram_id=1)
+        session.add(user)
+        await session.flush()
+        notifications = [
+            outbox.Notification(f"{key_prefix}{i}", user.id, i, "text") for i in range(count)
+        ]
+        await outbox.enqueue_notifications(session, notifications)
+        # Повторная постановка с теми же ключами — без дублей
+        await outbox.enqueue_notifications(session, notifications)
+        await session.commit()
+
+
+async def _statuses(session_maker) -> dict[int, OutboxStatus]:
+    async with session_maker() as session:
+        rows = await session.execute(select(OutboxMessage.chat_id, OutboxMessage.status))
+        return dict(rows.all())
+
+
+def test_lease_has_single_holder(database):
+    async def scenario():
+        first = LeaderLease(ttl=timedelta(seconds=60))
+        second = LeaderLease(ttl=timedelta(seconds=60))
+
+        assert await first.try_acquire()
+        assert not await second.try_acquire()
+        assert await first.try_acquire()  # продление
+
+        # Лидер умер — аренда истекла, её забирает другая реплика
+        async with database.session_maker() as session:
+            await session.execute(
+                update(SchedulerLease).values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+            )
+            await session.commit()
+
+        assert await second.try_acquire()
+        assert not await first.try_acquire()
+        assert second.is_leader and not first.is_leader
+
+    database.run(scenario)
+
+
+def test_drain_delivers_and_retries(database, pipeline):
+    pipeline.fail_chats = {3}
+
+    async def scenario():
+        await _enqueue(database.session_maker, 5)
+
+        dispatcher = outbox.OutboxDispatcher(batch_size=2)
+        assert await dispatcher.drain() == 4
+
+        statuses = await _statuses(database.session_maker)
+        assert statuses == {
+            0: OutboxStatus.DELIVERED,
+            1: OutboxStatus.DELIVERED,
+            2: OutboxStatus.DELIVERED,
+            3: OutboxStatus.PENDING,
+            4: OutboxStatus.DELIVERED,
+        }
+
+        async with database.session_maker() as session:
+            failed = (
+                await session.execute(select(OutboxMessage).where(OutboxMessage.chat_id == 3))
+            ).scalar_one()
+        assert failed.attempts == 1
+        assert failed.next_attempt_at > datetime.now()
+
+        # Ретрай ещё не подошёл — повторной отправки нет
+        assert await dispatcher.drain() == 0
+        assert sorted(pipeline.sent) == [0, 1, 2, 4]
+
+    database.run(scenario)
+
+
+def test_parallel_drains_do_not_send_twice(database, pipeline):
+    async def scenario():
+        await _enqueue(database.session_maker, 120)
+
+        # Два диспетчера со своими блокировками — как две реплики,
+        # которые обе считают себя лидером
+        first = outbox.OutboxDispatcher(batch_size=10)
+        second = outbox.OutboxDispatcher(batch_size=10)
+        delivered = await asyncio.gather(first.drain(), second.drain())
+
+        assert sum(delivered) == 120
+        assert sorted(pipeline.sent) == list(range(120))
+        assert set((await _statuses(database.session_maker)).values()) == {OutboxStatus.DELIVERED}
+
+    database.run(scenario)
+
+
+def test_drain_stops_without_lease(database, pipeline):
+    async def scenario():
+        await _enqueue(database.session_maker, 3)
+
+        # Аренду держит другая реплика — этот процесс ничего не отправляет
+        assert await LeaderLease().try_acquire()
+        assert await outbox.OutboxDispatcher().drain() == 0
+        assert pipeline.sent == []
+
+    database.run(scenario)